@@ -0,0 +1,70 @@
+"""Simulate a popular item being requested by many threads at once (e.g.
+right after it expired from a cache), with a backend query taking 50 ms,
+and compare the number of backend queries and the elapsed time without
+and with request coalescing.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+THREADS = 50
+ROUNDS = 5
+QUERY_TIME = 0.05
+
+
+def make_adapter(coalesce, queries):
+    api = RESTArt()
+
+    @api.register(pk='<int:todo_id>')
+    class Todos(Resource):
+        name = 'todos'
+
+        def read(self, request, todo_id):
+            queries.append(todo_id)
+            time.sleep(QUERY_TIME)
+            return {'id': todo_id, 'name': 'todo #%d' % todo_id}
+
+    Todos.coalesce = coalesce
+    return WSGIAdapter(api)
+
+
+def bench(label, coalesce):
+    queries = []
+    adapter = make_adapter(coalesce, queries)
+    environ = RequestFactory().get('/todos/1').environ
+
+    def start_response(status, headers):
+        pass
+
+    def serve(barrier):
+        barrier.wait()
+        for _ in adapter.wsgi_app(dict(environ), start_response):
+            pass
+
+    started = time.time()
+    for _ in range(ROUNDS):
+        barrier = threading.Event()
+        workers = [threading.Thread(target=serve, args=(barrier,))
+                   for _ in range(THREADS)]
+        for worker in workers:
+            worker.start()
+        barrier.set()
+        for worker in workers:
+            worker.join()
+    elapsed = time.time() - started
+    print('%-16s  %5d backend queries  %7.1f ms per round' % (
+        label, len(queries), elapsed / ROUNDS * 1e3
+    ))
+
+
+if __name__ == '__main__':
+    print('%d concurrent requests per round, %d rounds' % (THREADS, ROUNDS))
+    bench('no coalescing', False)
+    bench('coalescing', True)
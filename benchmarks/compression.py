@@ -0,0 +1,88 @@
+"""Measure the compression middleware on a large index response: the body
+size and time without compression, with each compression level, with a
+streamed body, and with the compressed body cached by ETag.
+"""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.compression import CompressionMiddleware
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+ROWS = 20000
+REPEAT = 20
+
+
+def iter_rows():
+    for i in range(ROWS):
+        yield {'id': i, 'name': 'todo #%d' % i, 'done': i % 2 == 0,
+               'tags': ['work', 'home']}
+
+
+ROWS_LIST = list(iter_rows())
+
+
+def make_api(level):
+    class Middleware(CompressionMiddleware):
+        levels = {'application/json': level}
+
+    api = RESTArt()
+
+    @api.route(uri='/whole', methods=['GET'])
+    class Whole(Resource):
+        name = 'whole'
+        middleware_classes = (Middleware,)
+
+        def read(self, request):
+            return ROWS_LIST
+
+    @api.route(uri='/stream', methods=['GET'])
+    class Stream(Resource):
+        name = 'stream'
+        middleware_classes = (Middleware,)
+
+        def read(self, request):
+            return iter_rows()
+
+    @api.route(uri='/etag', methods=['GET'])
+    class Tagged(Resource):
+        name = 'etag'
+        middleware_classes = (Middleware,)
+
+        def read(self, request):
+            return ROWS_LIST, 200, {'ETag': '"v1"'}
+
+    return api
+
+
+def bench(label, adapter, path, accept_encoding='gzip'):
+    environ = RequestFactory().get(
+        path, headers={'Accept-Encoding': accept_encoding}
+    ).environ
+
+    def start_response(status, headers):
+        pass
+
+    size = 0
+    started = time.time()
+    for _ in range(REPEAT):
+        size = sum(len(chunk)
+                   for chunk in adapter.wsgi_app(dict(environ),
+                                                 start_response))
+    elapsed = (time.time() - started) / REPEAT
+    print('%-22s  %9d bytes  %7.1f ms' % (label, size, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    print('%d rows, %d requests each' % (ROWS, REPEAT))
+    bench('no compression', WSGIAdapter(make_api(6)), '/whole', 'identity')
+    for level in (1, 6, 9):
+        bench('gzip level %d' % level, WSGIAdapter(make_api(level)),
+              '/whole')
+    adapter = WSGIAdapter(make_api(6))
+    bench('gzip level 6, streamed', adapter, '/stream')
+    bench('gzip level 6, cached', adapter, '/etag')
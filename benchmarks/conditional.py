@@ -0,0 +1,89 @@
+"""Compare polling a large index response without validators, with the
+ETag computed from the rendered body (the action still runs and the body
+is still rendered, but only a 304 is sent), and with an `etag` method
+(neither the action nor the renderer runs for a 304).
+"""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+ROWS = 20000
+REPEAT = 20
+
+
+def load_rows():
+    return [{'id': i, 'name': 'todo #%d' % i, 'done': i % 2 == 0,
+             'tags': ['work', 'home']} for i in range(ROWS)]
+
+
+api = RESTArt()
+
+
+@api.route(uri='/plain', methods=['GET'])
+class Plain(Resource):
+    name = 'plain'
+    auto_etag = False
+
+    def read(self, request):
+        return load_rows()
+
+
+@api.route(uri='/auto', methods=['GET'])
+class Auto(Resource):
+    name = 'auto'
+
+    def read(self, request):
+        return load_rows()
+
+
+@api.route(uri='/hook', methods=['GET'])
+class Hook(Resource):
+    name = 'hook'
+
+    def etag(self, request):
+        return 'version-1'
+
+    def read(self, request):
+        return load_rows()
+
+
+def bench(label, adapter, path, if_none_match=None):
+    headers = {'If-None-Match': if_none_match} if if_none_match else {}
+    environ = RequestFactory().get(path, headers=headers).environ
+    statuses = []
+
+    def start_response(status, headers):
+        statuses.append(status)
+
+    size = 0
+    started = time.time()
+    for _ in range(REPEAT):
+        size = sum(len(chunk)
+                   for chunk in adapter.wsgi_app(dict(environ),
+                                                 start_response))
+    elapsed = (time.time() - started) / REPEAT
+    print('%-26s  %-16s  %8d bytes  %7.2f ms' % (label, statuses[-1], size,
+                                                 elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    adapter = WSGIAdapter(api)
+    environ = RequestFactory().get('/auto').environ
+    captured = {}
+
+    def capture(status, headers):
+        captured.update(headers)
+
+    list(adapter.wsgi_app(environ, capture))
+
+    print('%d rows, %d requests each' % (ROWS, REPEAT))
+    bench('no validators', adapter, '/plain')
+    bench('auto ETag, changed', adapter, '/auto', '"stale"')
+    bench('auto ETag, not modified', adapter, '/auto', captured['ETag'])
+    bench('etag method, not modified', adapter, '/hook', '"version-1"')
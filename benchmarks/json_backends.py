@@ -0,0 +1,81 @@
+"""Compare the JSON backends (and the previous stdlib defaults) on
+realistic payloads: encoding a list of records, and decoding the
+resulting body from bytes.
+"""
+
+from __future__ import absolute_import, print_function
+
+import datetime
+import decimal
+import json
+import timeit
+import uuid
+
+from restart.json_backends import (
+    StdlibBackend, OrjsonBackend, UjsonBackend
+)
+
+
+def make_records(count, typed=False):
+    now = datetime.datetime(2016, 3, 1, 12, 30, 45, 123456)
+    records = []
+    for i in range(count):
+        created = now - datetime.timedelta(minutes=i)
+        records.append({
+            'id': i,
+            'uuid': uuid.UUID(int=i) if typed else str(uuid.UUID(int=i)),
+            'name': u'Todo item #%d — caf\xe9' % i,
+            'done': i % 3 == 0,
+            'price': decimal.Decimal('%d.99' % i) if typed else i + 0.99,
+            'created': created if typed else created.isoformat(),
+            'tags': ['work', 'home', 'urgent'][:i % 3 + 1],
+            'owner': {'id': i % 17, 'email': 'user%d@example.com' % i},
+        })
+    return records
+
+
+class LegacyBackend(object):
+    """The JSON handling as it was before the backends."""
+
+    name = 'legacy'
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+def make_backends():
+    backends = [LegacyBackend()]
+    for backend_class in (StdlibBackend, UjsonBackend, OrjsonBackend):
+        try:
+            backends.append(backend_class())
+        except ImportError:
+            print('(%s is not installed)' % backend_class.name)
+    return backends
+
+
+def bench(count, typed, number):
+    records = make_records(count, typed)
+    body = StdlibBackend().dumps(records)
+    print('%d records%s, %d bytes compact' % (
+        count, ' with native types' if typed else '', len(body)
+    ))
+    for backend in make_backends():
+        if typed and isinstance(backend, LegacyBackend):
+            continue
+        dumps = min(timeit.repeat(lambda: backend.dumps(records),
+                                  number=number, repeat=3))
+        loads = min(timeit.repeat(lambda: backend.loads(body),
+                                  number=number, repeat=3))
+        size = len(backend.dumps(records))
+        print('  %-7s  dumps %8.1f us  loads %8.1f us  %7d bytes' % (
+            backend.name, dumps / number * 1e6, loads / number * 1e6, size
+        ))
+
+
+if __name__ == '__main__':
+    bench(10, False, 5000)
+    bench(1000, False, 50)
+    bench(1000, True, 50)
@@ -0,0 +1,55 @@
+"""Compare parsing a large JSON array body with the JSON parser (which
+reads and decodes the whole body at once) and with the streaming JSON
+parser (which decodes the items lazily, as they are consumed): the peak
+memory and the total time.
+"""
+
+from __future__ import absolute_import, print_function
+
+import io
+import time
+import tracemalloc
+
+from restart.parsers import JSONParser, StreamingJSONParser
+
+ROWS = 200000
+
+
+def make_body():
+    row = b'{"id":%d,"name":"todo #%d","done":true,"tags":["work","home"]}'
+    return b'[' + b','.join(row % (i, i) for i in range(ROWS)) + b']'
+
+
+class UnlimitedStreamingJSONParser(StreamingJSONParser):
+    max_body_size = float('inf')
+
+
+def consume(parser_class, body):
+    data = parser_class().parse(io.BytesIO(body), 'application/json',
+                                len(body))
+    count = 0
+    for item in data:
+        count += 1
+    return count
+
+
+def bench(parser_class, body):
+    started = time.time()
+    count = consume(parser_class, body)
+    total = time.time() - started
+
+    # Tracing slows down allocations, so measure the memory separately
+    tracemalloc.start()
+    consume(parser_class, body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-28s  total %7.1f ms  peak %7.1f MB  %d items' % (
+        parser_class.__name__, total * 1e3, peak / 1e6, count
+    ))
+
+
+if __name__ == '__main__':
+    body = make_body()
+    print('%d rows, %.1f MB' % (ROWS, len(body) / 1e6))
+    bench(JSONParser, body)
+    bench(UnlimitedStreamingJSONParser, body)
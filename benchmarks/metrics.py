@@ -0,0 +1,163 @@
+"""Compare recording into a histogram sharded per thread (in memory and
+in a memory-mapped file) with recording into the same histogram guarded
+by a single lock, in one thread and in several threads, measure the cost
+of request metrics per request, and the time to collect the metrics of
+several worker processes.
+"""
+
+from __future__ import absolute_import, print_function
+
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from restart import timing
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.metrics import (
+    Histogram, MetricsRegistry, MmapStore, enable_metrics
+)
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+OBSERVATIONS = 400000
+THREADS = 8
+REQUESTS = 20000
+WORKERS = 4
+ENDPOINTS = 50
+
+
+class LockedHistogram(Histogram):
+    """The same histogram, with a single shard guarded by a lock."""
+
+    def __init__(self, *args, **kwargs):
+        super(LockedHistogram, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.shard = {}
+
+    def observe(self, value, labels=()):
+        with self.lock:
+            counts = self.shard.get(labels)
+            if counts is None:
+                counts = self.shard[labels] = [0] * self._size
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+
+def bench_observe(label, histogram, threads):
+    count = OBSERVATIONS // threads
+
+    def record():
+        observe = histogram.observe
+        for i in range(count):
+            observe(0.01, ('todos',))
+
+    workers = [threading.Thread(target=record) for _ in range(threads)]
+    started = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - started
+    print('%-26s  %8.0f k observations/s' % (
+        label, OBSERVATIONS / elapsed / 1e3
+    ))
+
+
+def bench_requests(label, adapter):
+    environ = RequestFactory().get('/todos/1').environ
+
+    def start_response(status, headers):
+        pass
+
+    started = time.time()
+    for _ in range(REQUESTS):
+        for _ in adapter.wsgi_app(dict(environ), start_response):
+            pass
+    elapsed = time.time() - started
+    print('%-26s  %8.1f us per request' % (label,
+                                           elapsed / REQUESTS * 1e6))
+
+
+def make_api():
+    api = RESTArt()
+
+    @api.register(pk='<int:todo_id>')
+    class Todos(Resource):
+        name = 'todos'
+
+        def read(self, request, todo_id):
+            return {'id': todo_id}
+
+    return api
+
+
+def run_worker(directory, ready, stop):
+    registry = MetricsRegistry(MmapStore(directory))
+    histogram = registry.histogram('h', 'h', ('endpoint',))
+    for i in range(ENDPOINTS * 100):
+        histogram.observe(i / 1e4, ('endpoint-%d' % (i % ENDPOINTS),))
+    ready.set()
+    stop.wait()
+
+
+def bench_collect(directory):
+    ready = [multiprocessing.Event() for _ in range(WORKERS)]
+    stop = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=run_worker,
+                                       args=(directory, event, stop))
+               for event in ready]
+    for worker in workers:
+        worker.start()
+    for event in ready:
+        event.wait()
+    registry = MetricsRegistry(MmapStore(directory))
+    histogram = registry.histogram('h', 'h', ('endpoint',))
+    started = time.time()
+    for _ in range(20):
+        text = registry.expose()
+    elapsed = (time.time() - started) / 20
+    p99 = histogram.quantile(0.99, ('endpoint-0',))
+    stop.set()
+    for worker in workers:
+        worker.join()
+    print('%-26s  %8.1f ms per scrape (%d lines)' % (
+        'collect %d workers' % WORKERS, elapsed * 1e3, text.count('\n')
+    ))
+    print('%-26s  %8.4f s' % ('p99 of endpoint-0', p99))
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    for threads in (1, THREADS):
+        bench_observe('sharded, %d thread(s)' % threads,
+                      Histogram('h', 'h', ('endpoint',)), threads)
+        bench_observe('mmap, %d thread(s)' % threads,
+                      Histogram('h', 'h', ('endpoint',),
+                                store=MmapStore(directory)), threads)
+        bench_observe('locked, %d thread(s)' % threads,
+                      LockedHistogram('h', 'h', ('endpoint',)), threads)
+    shutil.rmtree(directory)
+
+    api = make_api()
+    bench_requests('requests, no metrics', WSGIAdapter(api))
+    metrics = enable_metrics(api, registry=MetricsRegistry())
+    bench_requests('requests, metrics', WSGIAdapter(api))
+    timing.unsubscribe(metrics)
+
+    api = make_api()
+    directory = tempfile.mkdtemp()
+    metrics = enable_metrics(api, registry=MetricsRegistry(
+        MmapStore(directory)
+    ))
+    bench_requests('requests, mmap metrics', WSGIAdapter(api))
+    timing.unsubscribe(metrics)
+    shutil.rmtree(directory)
+
+    directory = tempfile.mkdtemp()
+    bench_collect(directory)
+    shutil.rmtree(directory)
@@ -0,0 +1,67 @@
+"""Compare the per-request cost of selecting a parser and a renderer
+before (a new negotiator scanning the classes linearly) and after
+(a shared negotiator with precomputed lookup tables and a bounded
+Content-Type cache).
+"""
+
+from __future__ import absolute_import, print_function
+
+import timeit
+
+from werkzeug.http import parse_options_header
+
+from restart.negotiator import Negotiator
+from restart.parsers import JSONParser, MultiPartParser, URLEncodedParser
+from restart.renderers import JSONRenderer
+
+
+class LinearNegotiator(object):
+    """The negotiator as it was before the lookup tables."""
+
+    def select_parser(self, parser_classes, content_type):
+        content_type, _ = parse_options_header(content_type)
+        for parser_class in parser_classes:
+            if parser_class.content_type == content_type:
+                return parser_class
+
+    def select_renderer(self, renderer_classes, format_suffix):
+        if not format_suffix:
+            return renderer_classes[0]
+        for renderer_class in renderer_classes:
+            if renderer_class.format_suffix == format_suffix:
+                return renderer_class
+
+
+PARSER_CLASSES = (JSONParser, URLEncodedParser, MultiPartParser)
+RENDERER_CLASSES = (JSONRenderer,)
+CONTENT_TYPES = (
+    'application/json',
+    'application/json; charset=utf-8',
+    'multipart/form-data; boundary=----WebKitFormBoundary7MA4YWxkTrZu0gW',
+)
+
+
+def bench(number=100000):
+    shared = Negotiator()
+
+    def before(content_type):
+        negotiator = LinearNegotiator()
+        negotiator.select_parser(PARSER_CLASSES, content_type)
+        negotiator.select_renderer(RENDERER_CLASSES, 'json')
+
+    def after(content_type):
+        shared.select_parser(PARSER_CLASSES, content_type)
+        shared.select_renderer(RENDERER_CLASSES, 'json')
+
+    for content_type in CONTENT_TYPES:
+        print(content_type)
+        for name, func in (('before', before), ('after', after)):
+            seconds = min(timeit.repeat(lambda: func(content_type),
+                                        number=number, repeat=3))
+            print('  %-6s  %6.2f us/request' % (
+                name, seconds / number * 1e6
+            ))
+
+
+if __name__ == '__main__':
+    bench()
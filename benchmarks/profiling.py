@@ -0,0 +1,126 @@
+"""Measure the cost per request of the profiling middleware, when no
+request is sampled, when one in 100 requests is sampled, and when every
+request is profiled (including writing the profiles). Then measure the
+overhead of the sampling profiler at 100 Hz on requests served by
+several threads, and the cost of each sample.
+"""
+
+from __future__ import absolute_import, print_function
+
+import shutil
+import tempfile
+import threading
+import time
+
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.profiling import ProfilerMiddleware, SamplingProfiler
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+REQUESTS = 5000
+THREADS = 4
+ROUNDS = 5
+THREADED_REQUESTS = 20000
+ROWS = [{'id': i, 'name': 'todo #%d' % i} for i in range(50)]
+
+
+def make_adapter(middleware_classes):
+    api = RESTArt()
+
+    @api.register(pk='<int:todo_id>')
+    class Todos(Resource):
+        name = 'todos'
+
+        def index(self, request):
+            return ROWS
+
+    Todos.middleware_classes = middleware_classes
+    return WSGIAdapter(api)
+
+
+def bench(label, adapter):
+    environ = RequestFactory().get('/todos').environ
+
+    def start_response(status, headers):
+        pass
+
+    started = time.time()
+    for _ in range(REQUESTS):
+        for _ in adapter.wsgi_app(dict(environ), start_response):
+            pass
+    elapsed = time.time() - started
+    print('%-30s  %8.1f us per request' % (label,
+                                           elapsed / REQUESTS * 1e6))
+
+
+def serve_threads(adapter):
+    count = THREADED_REQUESTS // THREADS
+    threads = [threading.Thread(target=serve, args=(adapter, count))
+               for _ in range(THREADS)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return count * THREADS / (time.time() - started)
+
+
+def serve(adapter, count):
+    environ = RequestFactory().get('/todos').environ
+
+    def start_response(status, headers):
+        pass
+
+    for _ in range(count):
+        for _ in adapter.wsgi_app(dict(environ), start_response):
+            pass
+
+
+def bench_sampling(adapter):
+    # Alternate the runs to even out the noise, and compare the medians
+    baseline, profiled = [], []
+    profiler = SamplingProfiler(interval=0.01)
+    for _ in range(ROUNDS):
+        baseline.append(serve_threads(adapter))
+        profiler.start()
+        profiled.append(serve_threads(adapter))
+        profiler.stop()
+    baseline = sorted(baseline)[ROUNDS // 2]
+    profiled = sorted(profiled)[ROUNDS // 2]
+    print('%-30s  %8.0f req/s' % ('%d threads' % THREADS, baseline))
+    print('%-30s  %8.0f req/s  (%+.1f%%)' % (
+        '%d threads, sampling at 100 Hz' % THREADS, profiled,
+        (profiled / baseline - 1) * 100
+    ))
+    print('%-30s  %8d samples, %d stacks' % (
+        '', profiler.samples, len(profiler.get_collapsed().splitlines())
+    ))
+
+    event = threading.Event()
+    profiler = SamplingProfiler(all_threads=True)
+    threads = [threading.Thread(target=event.wait) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    started = time.time()
+    for _ in range(1000):
+        profiler.sample()
+    elapsed = (time.time() - started) / 1000
+    event.set()
+    # The throughputs above vary by a few percent between identical
+    # runs, so the cost of sampling is better read here
+    print('%-30s  %8.1f us per sample (%d threads), %.2f%% of a core at '
+          '100 Hz' % ('sample', elapsed * 1e6, THREADS + 1, elapsed * 1e4))
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    bench('no middleware', make_adapter(()))
+    for sample_every in (0, 100, 1):
+        middleware_class = type('Profiler', (ProfilerMiddleware,), {
+            'sample_every': sample_every, 'directory': directory
+        })
+        bench('profiler, sample_every=%d' % sample_every,
+              make_adapter((middleware_class,)))
+    shutil.rmtree(directory)
+    bench_sampling(make_adapter(()))
@@ -0,0 +1,127 @@
+"""Compare serving identical GETs of a read-heavy resource without and
+with the response cache middleware, in one thread and in several
+threads (which share the sharded cache), and then in several worker
+processes with the in-process and the file cache backends.
+"""
+
+from __future__ import absolute_import, print_function
+
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.cache import FileCache, MemoryCache, ResponseCacheMiddleware
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+ROWS = 1000
+REQUESTS = 2000
+THREADS = 8
+WORKERS = 4
+PAGES = 500
+
+ROWS_LIST = [{'id': i, 'name': 'todo #%d' % i, 'done': i % 2 == 0}
+             for i in range(ROWS)]
+
+
+def make_adapter(middleware_classes, calls=None):
+    api = RESTArt()
+
+    @api.register(pk='<int:todo_id>')
+    class Todos(Resource):
+        name = 'todos'
+
+        def index(self, request):
+            if calls is not None:
+                calls.append(1)
+            page = request.args.get('page')
+            if page is None:
+                return ROWS_LIST
+            return ROWS_LIST[int(page):int(page) + 100]
+
+        def read(self, request, todo_id):
+            return ROWS_LIST[todo_id]
+
+    Todos.middleware_classes = middleware_classes
+    return WSGIAdapter(api)
+
+
+def serve(adapter, paths, count):
+    environs = [RequestFactory().get(path).environ for path in paths]
+
+    def start_response(status, headers):
+        pass
+
+    for i in range(count):
+        for _ in adapter.wsgi_app(dict(environs[i % len(environs)]),
+                                  start_response):
+            pass
+
+
+def bench(label, adapter, paths, threads=1):
+    count = REQUESTS // threads
+    workers = [threading.Thread(target=serve, args=(adapter, paths, count))
+               for _ in range(threads)]
+    started = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - started
+    print('%-34s  %8.0f req/s' % (label, count * threads / elapsed))
+
+
+def run_worker(backend_class, directory, queue):
+    class Middleware(ResponseCacheMiddleware):
+        pass
+
+    if backend_class is FileCache:
+        Middleware.backend_class = lambda size: FileCache(size, directory)
+    else:
+        Middleware.backend_class = backend_class
+    calls = []
+    adapter = make_adapter((Middleware,), calls)
+    paths = ['/todos?page=%d' % i for i in range(PAGES)]
+    started = time.time()
+    serve(adapter, paths, REQUESTS)
+    queue.put((len(calls), time.time() - started))
+
+
+def bench_workers(label, backend_class):
+    directory = tempfile.mkdtemp()
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_worker,
+                                       args=(backend_class, directory, queue))
+               for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    results = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    shutil.rmtree(directory)
+    misses = sum(calls for calls, _ in results)
+    rate = sum(REQUESTS / elapsed for _, elapsed in results)
+    print('%-34s  %8.0f req/s  %5.1f%% hits' % (
+        label, rate, 100.0 * (1 - misses / float(REQUESTS * WORKERS))
+    ))
+
+
+if __name__ == '__main__':
+    index = ['/todos']
+    items = ['/todos/%d' % i for i in range(100)]
+    print('%d requests each, %d rows in the index' % (REQUESTS, ROWS))
+    bench('index, no cache', make_adapter(()), index)
+    bench('index, cache', make_adapter((ResponseCacheMiddleware,)), index)
+    bench('100 items, no cache', make_adapter(()), items)
+    bench('100 items, cache', make_adapter((ResponseCacheMiddleware,)),
+          items)
+    bench('100 items, cache, %d threads' % THREADS,
+          make_adapter((ResponseCacheMiddleware,)), items, THREADS)
+    print(ResponseCacheMiddleware.cache.stats())
+    print('%d workers, %d pages of the index' % (WORKERS, PAGES))
+    bench_workers('%d workers, memory cache' % WORKERS, MemoryCache)
+    bench_workers('%d workers, file cache' % WORKERS, FileCache)
@@ -0,0 +1,60 @@
+"""Compare Werkzeug's `MapAdapter.match()` with the compiled
+:class:`~restart.routing.Router` for APIs with 10, 1,000 and 10,000
+registered resources.
+"""
+
+from __future__ import absolute_import, print_function
+
+import timeit
+
+from werkzeug.routing import Map, Rule as WerkzeugRule
+
+from restart.api import RESTArt
+from restart.resource import Resource
+from restart.routing import Router
+
+
+def make_api(count):
+    api = RESTArt()
+    for i in range(count):
+        resource_class = type('Resource%d' % i, (Resource,),
+                              {'name': 'resource%d' % i})
+        api.register(resource_class, pk='<int:pk>')
+    return api
+
+
+def bench(count, number):
+    api = make_api(count)
+    rule_map = Map([
+        WerkzeugRule(rule.uri, endpoint=endpoint, methods=rule.methods)
+        for endpoint, rule in api.rules.items()
+    ])
+    router = Router(api.rules)
+
+    # Match the last registered resource, which is the worst case
+    # for the linear scan of Werkzeug
+    last = count - 1
+    paths = ('/resource%d' % last, '/resource%d/42' % last)
+
+    adapter = rule_map.bind('localhost')
+
+    def werkzeug_match():
+        for path in paths:
+            adapter.match(path, 'GET')
+
+    def router_match():
+        for path in paths:
+            router.match(path, 'GET')
+
+    for name, func in (('werkzeug', werkzeug_match),
+                       ('router', router_match)):
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print('%6d resources  %-8s  %8.2f us/match' % (
+            count, name, seconds / number / len(paths) * 1e6
+        ))
+
+
+if __name__ == '__main__':
+    bench(10, 10000)
+    bench(1000, 1000)
+    bench(10000, 100)
@@ -0,0 +1,70 @@
+"""Compare rendering a large index response as a whole document (the
+action returns a list) and as a stream (the action returns a generator):
+the peak memory, the time to the first chunk and the total time.
+"""
+
+from __future__ import absolute_import, print_function
+
+import time
+import tracemalloc
+
+from restart.api import RESTArt
+from restart.resource import Resource
+from restart.testing import RequestFactory
+from restart.adapter import WSGIAdapter
+
+ROWS = 100000
+
+
+def iter_rows():
+    for i in range(ROWS):
+        yield {'id': i, 'name': 'todo #%d' % i, 'done': i % 2 == 0,
+               'tags': ['work', 'home']}
+
+
+api = RESTArt()
+
+
+@api.route(uri='/whole', methods=['GET'])
+class Whole(Resource):
+    name = 'whole'
+
+    def read(self, request):
+        return list(iter_rows())
+
+
+@api.route(uri='/stream', methods=['GET'])
+class Stream(Resource):
+    name = 'stream'
+
+    def read(self, request):
+        return iter_rows()
+
+
+def bench(adapter, path):
+    environ = RequestFactory().get(path).environ
+
+    def start_response(status, headers):
+        pass
+
+    tracemalloc.start()
+    started = time.time()
+    body = adapter.wsgi_app(environ, start_response)
+    first, size = None, 0
+    for chunk in body:
+        if first is None:
+            first = time.time() - started
+        size += len(chunk)
+    total = time.time() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-8s  first chunk %7.1f ms  total %7.1f ms  '
+          'peak %7.1f MB  %d bytes' % (path, first * 1e3, total * 1e3,
+                                       peak / 1e6, size))
+
+
+if __name__ == '__main__':
+    adapter = WSGIAdapter(api)
+    print('%d rows' % ROWS)
+    bench(adapter, '/whole')
+    bench(adapter, '/stream')
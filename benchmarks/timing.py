@@ -0,0 +1,56 @@
+"""Measure the overhead of request timing on a tiny endpoint: without
+subscribers (requests are not timed), with the per-endpoint aggregate
+subscribed, and with the Server-Timing header enabled as well.
+"""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+from restart import timing
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.config import config
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+REQUESTS = 20000
+
+api = RESTArt()
+
+
+@api.register(pk='<int:todo_id>')
+class Todos(Resource):
+    name = 'todos'
+
+    def read(self, request, todo_id):
+        return {'id': todo_id, 'name': 'todo #%d' % todo_id}
+
+
+def bench(label, adapter):
+    environ = RequestFactory().get('/todos/1').environ
+
+    def start_response(status, headers):
+        pass
+
+    started = time.time()
+    for _ in range(REQUESTS):
+        for _ in adapter.wsgi_app(dict(environ), start_response):
+            pass
+    elapsed = time.time() - started
+    print('%-28s  %7.1f us per request' % (label,
+                                            elapsed / REQUESTS * 1e6))
+
+
+if __name__ == '__main__':
+    adapter = WSGIAdapter(api)
+    print('%d requests each' % REQUESTS)
+    bench('not timed', adapter)
+    timings = timing.EndpointTimings()
+    timing.subscribe(timings)
+    bench('endpoint timings', adapter)
+    config.SERVER_TIMING = True
+    bench('endpoint timings + header', adapter)
+    for key, stats in sorted(timings.get_stats().items()):
+        print(key, ', '.join('%s %.1f us' % (phase, item['mean'] * 1e6)
+                             for phase, item in sorted(stats.items())))
@@ -0,0 +1,167 @@
+"""Upload 1 GB of files (in several parts of one multipart request) and
+compare the previous Werkzeug-based multipart parsing with the streaming
+multipart parser, spooling to temporary files or hashing on the fly:
+the total time, the throughput and the peak memory (RSS).
+
+The request body is generated on the fly, so it is never held in memory
+by the benchmark itself. Pass the total size in MB as the first argument
+to change it, for example:
+
+    $ PYTHONPATH=. python benchmarks/uploads.py 256
+"""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from werkzeug.formparser import (
+    MultiPartParser as WerkzeugMultiPartParser, default_stream_factory
+)
+from werkzeug.wsgi import LimitedStream
+
+from restart.parsers import MultiPartParser
+from restart.uploads import UploadHandler
+
+BOUNDARY = b'----------benchmarkboundary'
+BLOCK = os.urandom(1024 * 1024)
+PARTS = 8
+
+
+class MultipartBodyStream(object):
+    """A file-like object that generates a multipart body with `parts`
+    files, each of which is `part_size` bytes long.
+    """
+
+    def __init__(self, parts, part_size):
+        self.pieces = self.iter_pieces(parts, part_size)
+        self.buffer = b''
+        self.offset = 0
+
+    def iter_pieces(self, parts, part_size):
+        for index in range(parts):
+            yield (b'--' + BOUNDARY + b'\r\n'
+                   b'Content-Disposition: form-data; name="file%d"; '
+                   b'filename="part%d.bin"\r\n'
+                   b'Content-Type: application/octet-stream\r\n\r\n'
+                   % (index, index))
+            remaining = part_size
+            while remaining:
+                piece = BLOCK[:min(remaining, len(BLOCK))]
+                remaining -= len(piece)
+                yield piece
+            yield b'\r\n'
+        yield b'--' + BOUNDARY + b'--\r\n'
+
+    def _fill(self):
+        try:
+            piece = next(self.pieces)
+        except StopIteration:
+            return False
+        self.buffer = self.buffer[self.offset:] + piece
+        self.offset = 0
+        return True
+
+    def _take(self, end):
+        data = self.buffer[self.offset:end]
+        self.offset = min(end, len(self.buffer))
+        return data
+
+    def read(self, size=-1):
+        if size < 0:
+            while self._fill():
+                pass
+            return self._take(len(self.buffer))
+        while len(self.buffer) - self.offset < size and self._fill():
+            pass
+        return self._take(self.offset + size)
+
+    def readline(self, size=-1):
+        while True:
+            end = self.buffer.find(b'\n', self.offset)
+            if end >= 0:
+                end += 1
+                break
+            if not self._fill():
+                end = len(self.buffer)
+                break
+        if size >= 0:
+            end = min(end, self.offset + size)
+        return self._take(end)
+
+
+def get_content_length(parts, part_size):
+    stream = MultipartBodyStream(parts, 0)
+    overhead = len(stream.read())
+    return overhead + parts * part_size
+
+
+class HashingUploadHandler(UploadHandler):
+
+    def __init__(self, *args, **kwargs):
+        super(HashingUploadHandler, self).__init__(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_chunk(self, chunk):
+        self.sha256.update(chunk)
+
+    def file_complete(self, size):
+        return self.sha256.hexdigest()
+
+
+class HashingMultiPartParser(MultiPartParser):
+    upload_handler_class = HashingUploadHandler
+
+
+def parse_with_werkzeug(stream, content_length):
+    parser = WerkzeugMultiPartParser(default_stream_factory)
+    form, files = parser.parse(stream, BOUNDARY, content_length)
+    return files.to_dict()
+
+
+def parse_with(parser_class):
+    def parse(stream, content_length):
+        content_type = 'multipart/form-data; boundary=%s' % \
+            BOUNDARY.decode('ascii')
+        _, files = parser_class().parse(stream, content_type,
+                                        content_length)
+        return files
+    return parse
+
+
+def run(name, parse, total_mb, queue):
+    part_size = total_mb * 1024 * 1024 // PARTS
+    content_length = get_content_length(PARTS, part_size)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.time()
+    # Wrap the body just as `get_input_stream` does for real requests
+    stream = LimitedStream(MultipartBodyStream(PARTS, part_size),
+                           content_length)
+    files = parse(stream, content_length)
+    total = time.time() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    assert len(files) == PARTS
+    queue.put('%-22s  total %6.2f s  %7.1f MB/s  peak RSS +%6.1f MB' % (
+        name, total, content_length / total / 1e6,
+        (rss_after - rss_before) / 1024.0
+    ))
+
+
+if __name__ == '__main__':
+    total_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    print('%d MB in %d parts' % (total_mb, PARTS))
+    for name, parse in (
+            ('werkzeug (before)', parse_with_werkzeug),
+            ('spooled to disk', parse_with(MultiPartParser)),
+            ('hashed on the fly', parse_with(HashingMultiPartParser))):
+        # Run each one in a fresh process, so that the peak RSS is exact
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run,
+                                          args=(name, parse, total_mb, queue))
+        process.start()
+        print(queue.get())
+        process.join()
@@ -8,11 +8,15 @@ from werkzeug.wrappers import (
     Request as WerkzeugSpecificRequest,
     Response as WerkzeugSpecificResponse
 )
-from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+from werkzeug.wsgi import get_path_info
 
 from .api import Rule
-from .request import WerkzeugRequest
-from .response import WerkzeugResponse
+from .routing import Router
+from .request import WerkzeugRequest, WSGIRequest
+from .timing import (
+    finish_timer, finish_unrouted_timer, route_timer, start_timer
+)
 
 
 class Adapter(object):
@@ -70,6 +74,7 @@ class WerkzeugAdapter(Adapter):
     def __init__(self, *args, **kwargs):
         super(WerkzeugAdapter, self).__init__(*args, **kwargs)
         self.rule_map = WerkzeugMap(self.get_embedded_rules())
+        self.router = Router(self.adapted_rules)
 
     def adapt_handler(self, handler, request, *args, **kwargs):
         """Adapt the request object and the response object for
@@ -83,11 +88,21 @@ class WerkzeugAdapter(Adapter):
                        to the handler.
         """
         adapted_request = WerkzeugRequest(request)
-        response = handler(adapted_request, *args, **kwargs)
-        adapted_response = WerkzeugResponse(
-            response.data, response.status_code, response.headers
-        )
-        return adapted_response.get_specific_response()
+        timer = adapted_request.timer
+        if timer is None:
+            response = handler(adapted_request, *args, **kwargs)
+        else:
+            response = None
+            try:
+                response = handler(adapted_request, *args, **kwargs)
+            finally:
+                finish_timer(timer, response)
+        if response.is_streamed:
+            body = response.iter_body()
+        else:
+            body = response.get_body()
+        return WerkzeugSpecificResponse(body, response.status_code,
+                                        response.headers)
 
     def wsgi_app(self, environ, start_response):
         """The actual Werkzeug-specific WSGI application.
@@ -95,15 +110,25 @@ class WerkzeugAdapter(Adapter):
         See :meth:`~restart.serving.Service.wsgi_app` for the
         meanings of the parameters.
         """
-        request = WerkzeugSpecificRequest(environ)
-        adapter = self.rule_map.bind_to_environ(request.environ)
+        path = '/' + get_path_info(environ).lstrip('/')
+        method = environ.get('REQUEST_METHOD', 'GET').upper()
+        timer = start_timer(method)
         try:
-            endpoint, kwargs = adapter.match()
+            endpoint, kwargs = self.router.match(path, method)
         except NotFound:
             response = WerkzeugSpecificResponse(
                 'The requested URI was not found.', 404
             )
+            if timer is not None:
+                finish_unrouted_timer(timer, 404)
+        except MethodNotAllowed as exc:
+            response = exc.get_response(environ)
+            if timer is not None:
+                finish_unrouted_timer(timer, exc.code)
         else:
+            if timer is not None:
+                route_timer(timer, endpoint, environ)
+            request = WerkzeugSpecificRequest(environ)
             response = self.adapted_rules[endpoint].handler(request, **kwargs)
         return response(environ, start_response)
 
@@ -134,3 +159,122 @@ class WerkzeugAdapter(Adapter):
             for endpoint, rule in iteritems(self.adapted_rules)
         ]
         return rules
+
+
+class WSGIAdapter(Adapter):
+    """The adapter that serves the RESTArt API as a plain WSGI
+    application, whose request objects are built straight from the
+    WSGI environment (see :class:`~restart.request.WSGIRequest`).
+
+    Since there is no framework to embed into, it does not support
+    :meth:`get_embedded_rules`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(WSGIAdapter, self).__init__(*args, **kwargs)
+        self.router = Router(self.adapted_rules)
+
+    def adapt_handler(self, handler, environ, *args, **kwargs):
+        """Adapt the request object for the `handler` function. The
+        rendered :class:`~restart.response.Response` object is returned
+        as it is, and sent by :meth:`wsgi_app` without any intermediate
+        response object.
+
+        :param handler: the handler function to be adapted.
+        :param environ: the WSGI environment.
+        :param args: a list of positional arguments that will be passed
+                     to the handler.
+        :param kwargs: a dictionary of keyword arguments that will be passed
+                       to the handler.
+        """
+        adapted_request = WSGIRequest(environ)
+        timer = adapted_request.timer
+        if timer is None:
+            return handler(adapted_request, *args, **kwargs)
+        response = None
+        try:
+            response = handler(adapted_request, *args, **kwargs)
+        finally:
+            finish_timer(timer, response)
+        return response
+
+    def prepare_response(self, response, environ):
+        """Return a tuple in the form `(status, headers, body)` for the
+        rendered `response`. If the response is streamed, `body` is an
+        iterator of byte chunks and no Content-Length is set (so that
+        the server sends the body in chunked transfer encoding);
+        otherwise `headers` includes a precomputed Content-Length and
+        `body` is bytes.
+
+        :param response: the rendered response object.
+        :param environ: the WSGI environment.
+        """
+        headers = [
+            (key, str(value)) for key, value in iteritems(response.headers)
+            if key.lower() != 'content-length'
+        ]
+        status_code = response.status_code
+        no_body = (status_code < 200 or status_code in (204, 304) or
+                   environ.get('REQUEST_METHOD') == 'HEAD')
+
+        if response.is_streamed:
+            if no_body:
+                # The stream is never consumed, so release it now
+                close = getattr(response.data, 'close', None)
+                if close is not None:
+                    close()
+                return response.status, headers, b''
+            return response.status, headers, response.iter_body()
+
+        body = response.get_body()
+        if status_code < 200 or status_code in (204, 304):
+            # These responses must not include a body
+            body = b''
+        else:
+            headers.append(('Content-Length', str(len(body))))
+            if no_body:
+                body = b''
+        return response.status, headers, body
+
+    def send_response(self, response, environ, start_response):
+        """Start the WSGI response, and return the body iterable, which
+        has a single element unless the response is streamed.
+
+        :param response: the rendered response object.
+        :param environ: the WSGI environment.
+        :param start_response: the WSGI `start_response` callable.
+        """
+        status, headers, body = self.prepare_response(response, environ)
+        start_response(status, headers)
+        if isinstance(body, bytes):
+            return [body]
+        return body
+
+    def wsgi_app(self, environ, start_response):
+        """The actual WSGI application.
+
+        See :meth:`~restart.serving.Service.wsgi_app` for the
+        meanings of the parameters.
+        """
+        path = '/' + get_path_info(environ).lstrip('/')
+        method = environ.get('REQUEST_METHOD', 'GET').upper()
+        timer = start_timer(method)
+        try:
+            endpoint, kwargs = self.router.match(path, method)
+        except NotFound:
+            if timer is not None:
+                finish_unrouted_timer(timer, 404)
+            body = b'The requested URI was not found.'
+            start_response('404 NOT FOUND', [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Content-Length', str(len(body)))
+            ])
+            return [body]
+        except MethodNotAllowed as exc:
+            if timer is not None:
+                finish_unrouted_timer(timer, exc.code)
+            return exc(environ, start_response)
+        if timer is not None:
+            route_timer(timer, endpoint, environ)
+        response = self.adapted_rules[endpoint].handler(environ, **kwargs)
+        return self.send_response(response, environ, start_response)
@@ -11,19 +11,39 @@ class RESTArt(object):
     def __init__(self):
         self._rules = {}
 
-    def _get_handler(self, resource_class, actions):
+    def _get_handler(self, resource_class, methods, actions):
         action_map = config.ACTION_MAP.copy()
         if actions:
             # Override `ACTION_MAP` by `actions`
             action_map.update(actions)
 
+        def reject(request):
+            # Serve `405 Method Not Allowed` without instantiating the
+            # resource, if it would be served the same way otherwise
+            resource_class = handler.resource_class
+            if (handler.actions.get(request.method, True) is None and
+                    resource_class.rejects_directly):
+                return resource_class.make_method_not_allowed_response(
+                    request, handler.allowed_methods
+                )
+
         def handler(request, *args, **kwargs):
-            resource = handler.resource_class(handler.action_map)
+            response = handler.reject(request)
+            if response is not None:
+                return response
+            resource = handler.resource_class(handler.action_map,
+                                              handler.actions)
             return resource.dispatch_request(request, *args, **kwargs)
 
-        # Attach related data to the handler
+        # Attach related data to the handler. The actions are resolved
+        # only once here, instead of on each request.
         handler.resource_class = resource_class
         handler.action_map = action_map
+        handler.actions = resource_class.resolve_actions(action_map, methods)
+        handler.allowed_methods = resource_class.get_allowed_methods(
+            handler.actions
+        )
+        handler.reject = reject
         return handler
 
     @property
@@ -56,7 +76,7 @@ class RESTArt(object):
                 'Endpoint name `%s` already exists' % endpoint
             )
         methods = methods or config.ACTION_MAP.keys()
-        handler = self._get_handler(resource_class, actions)
+        handler = self._get_handler(resource_class, methods, actions)
         self._rules[endpoint] = Rule(uri, methods, handler)
 
     def add_rule_with_format_suffix(self, resource_class, uri, endpoint,
@@ -0,0 +1,589 @@
+"""ASGI support for RESTArt (requires Python 3.5+).
+
+Resource actions and middleware hooks may be either normal functions or
+coroutine functions (`async def`). Coroutine actions are awaited on the
+event loop, while normal actions run in a bounded thread pool (see the
+`ASGI_MAX_WORKERS` configuration option).
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import functools
+import inspect
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from six import iteritems
+from werkzeug.exceptions import (
+    NotFound, MethodNotAllowed, RequestEntityTooLarge, ServiceUnavailable
+)
+from werkzeug.http import HTTP_STATUS_CODES
+from werkzeug.wsgi import get_input_stream, get_path_info
+
+from .adapter import WSGIAdapter
+from .config import config
+from .request import WSGIRequest
+from .response import Response
+from .serving import Service
+from .timing import (
+    ENVIRON_KEY as TIMER_ENVIRON_KEY, clock, finish_timer,
+    finish_unrouted_timer, route_timer, start_timer
+)
+
+
+def make_environ(scope, body):
+    """Make a WSGI environment from the ASGI connection `scope` and
+    the request `body`.
+
+    :param scope: the ASGI connection scope.
+    :param body: the whole request body as bytes.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = '%s,%s' % (environ[key], value)
+        environ[key] = value
+    # The whole body has been received, so its length is always known
+    # (even if the client used chunked transfer encoding)
+    if body or 'CONTENT_LENGTH' in environ:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def make_scope(environ):
+    """Make an ASGI connection scope from the WSGI environment.
+
+    :param environ: the WSGI environment.
+    """
+    headers = []
+    for key, value in iteritems(environ):
+        if key.startswith('HTTP_'):
+            name = key[5:].replace('_', '-').lower()
+        elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH') and value:
+            name = key.replace('_', '-').lower()
+        else:
+            continue
+        headers.append((name.encode('latin-1'), value.encode('latin-1')))
+    protocol = environ.get('SERVER_PROTOCOL', 'HTTP/1.1')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': protocol.split('/', 1)[-1],
+        'method': environ.get('REQUEST_METHOD', 'GET').upper(),
+        'scheme': environ.get('wsgi.url_scheme', 'http'),
+        'path': get_path_info(environ),
+        'query_string': environ.get('QUERY_STRING', '').encode('latin-1'),
+        'root_path': environ.get('SCRIPT_NAME', ''),
+        'headers': headers,
+        'server': (environ.get('SERVER_NAME', 'localhost'),
+                   int(environ.get('SERVER_PORT', 80))),
+    }
+    return scope
+
+
+def get_content_length(scope):
+    """Return the Content-Length of the request in the ASGI connection
+    `scope`, or `None` if it is missing or invalid.
+
+    :param scope: the ASGI connection scope.
+    """
+    for name, value in scope.get('headers', ()):
+        if name == b'content-length':
+            try:
+                return max(0, int(value))
+            except ValueError:
+                return None
+    return None
+
+
+async def read_body(receive, max_size=None):
+    """Read the whole request body from the ASGI `receive` callable.
+
+    :param receive: the ASGI `receive` awaitable callable.
+    :param max_size: the maximum size (in bytes) of the body. If it is
+                     exceeded, :exc:`RequestEntityTooLarge` will be
+                     raised. If set to `None`, the size is unlimited.
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise RequestEntityTooLarge('The request payload is too large')
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+class AsyncSingleFlight(object):
+    """The asynchronous version of :class:`~restart.utils.SingleFlight`,
+    which coalesces concurrent coroutines with the same key on the same
+    event loop.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def run(self, key, func, timeout=None):
+        """Await `func()`, or wait for the call in flight with the same
+        `key`. See :meth:`~restart.utils.SingleFlight.run` for the
+        meanings of the parameters and the return value.
+        """
+        loop = asyncio.get_event_loop()
+        flight_key = (loop, key)
+        flight = self._flights.get(flight_key)
+        if flight is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight),
+                                                timeout)
+            except asyncio.TimeoutError:
+                raise ServiceUnavailable(
+                    'Timed out waiting for an identical request in progress'
+                )
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client disconnected)
+                return await self.run(key, func, timeout)
+            return result, True
+
+        flight = self._flights[flight_key] = loop.create_future()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as exc:
+            flight.set_exception(exc)
+            # Nobody may be waiting for the exception
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            del self._flights[flight_key]
+        return result, False
+
+
+class ASGIAdapter(WSGIAdapter):
+    """The adapter that serves the RESTArt API as an ASGI application.
+
+    The adapter is also a valid WSGI adapter: :meth:`wsgi_app` runs the
+    ASGI application on a private event loop, which is mainly useful for
+    testing (e.g. ``restart.testing.Client(api, ASGIAdapter)``) and for
+    the development server.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ASGIAdapter, self).__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(config.ASGI_MAX_WORKERS)
+        self.flights = AsyncSingleFlight()
+
+    async def adapt_handler(self, handler, environ, *args, **kwargs):
+        """Adapt the request object for the `handler` function, and
+        dispatch the request asynchronously.
+
+        :param handler: the handler function to be adapted.
+        :param environ: the WSGI environment made from the ASGI scope.
+        :param args: a list of positional arguments that will be passed
+                     to the handler.
+        :param kwargs: a dictionary of keyword arguments that will be passed
+                       to the handler.
+        """
+        adapted_request = WSGIRequest(environ)
+        response = handler.reject(adapted_request)
+        if response is not None:
+            return response
+        resource = handler.resource_class(handler.action_map,
+                                          handler.actions)
+        timer = adapted_request.timer
+        if timer is None:
+            return await self.dispatch_request(resource, adapted_request,
+                                               *args, **kwargs)
+        response = None
+        try:
+            response = await self.dispatch_request(resource, adapted_request,
+                                                   *args, **kwargs)
+        finally:
+            finish_timer(timer, response)
+        return response
+
+    async def dispatch_request(self, resource, request, *args, **kwargs):
+        """The asynchronous version of
+        :meth:`~restart.resource.Resource.dispatch_request`.
+
+        :param resource: the resource object.
+        :param request: the request object.
+        :param args: the positional arguments captured from the URI.
+        :param kwargs: the keyword arguments captured from the URI.
+        """
+        negotiator = resource.negotiator
+        resource.format_suffix = kwargs.pop('format', None)
+
+        parser_context = resource.get_parser_context(request, args, kwargs)
+        resource.request = request
+        request.resource = resource
+
+        accept = request.environ.get('HTTP_ACCEPT')
+        try:
+            request.parse(negotiator, resource.parser_classes,
+                          parser_context)
+            rv = await self.perform_action(resource, *args, **kwargs)
+            resource.log_request(request)
+        except Exception as exc:
+            rv = resource.handle_exception(exc)
+            accept = None
+
+        return resource.finalize_response(rv, request, args, kwargs, accept)
+
+    async def perform_action(self, resource, *args, **kwargs):
+        """The asynchronous version of
+        :meth:`~restart.resource.Resource.perform_action`, which awaits
+        coroutine actions and middleware hooks.
+        """
+        request = resource.request
+        request_processors = resource.request_processors
+        response_processors = resource.response_processors
+
+        if not (request_processors or response_processors):
+            rv = await self.check_not_modified(resource, request,
+                                               *args, **kwargs)
+            if rv is not None:
+                return rv
+            action = resource.find_action(request)
+            return await self.call_resource_action(resource, action, request,
+                                                   *args, **kwargs)
+
+        rv = None
+        timer = request.timer
+        started = timer and clock()
+
+        for process_request in request_processors:
+            rv = await self.call_hook(process_request, request)
+            if rv is not None:
+                break
+
+        if timer is not None:
+            timer.record('middleware', started)
+
+        if rv is None:
+            rv = await self.check_not_modified(resource, request,
+                                               *args, **kwargs)
+
+        if rv is None:
+            action = resource.find_action(request)
+            rv = await self.call_resource_action(resource, action, request,
+                                                 *args, **kwargs)
+
+        started = timer and clock()
+        for process_response in response_processors:
+            if not isinstance(rv, Response):
+                rv = resource.make_response(rv)
+            rv = await self.call_hook(process_response, request, rv)
+
+        if timer is not None:
+            timer.record('middleware', started)
+        return rv
+
+    async def check_not_modified(self, resource, request, *args, **kwargs):
+        """The asynchronous version of
+        :meth:`~restart.resource.Resource.check_not_modified`. Like
+        actions, the `etag` and `last_modified` methods may be coroutine
+        functions, and normal ones run in the thread pool.
+        """
+        if not resource.has_validators(request):
+            return None
+        timer = request.timer
+        started = timer and clock()
+        etag = last_modified = None
+        if resource.etag is not None:
+            etag = await self.call_action(resource.etag, request,
+                                          *args, **kwargs)
+        if resource.last_modified is not None:
+            last_modified = await self.call_action(resource.last_modified,
+                                                   request, *args, **kwargs)
+        if timer is not None:
+            timer.record('validate', started)
+        return resource.make_not_modified(request, etag, last_modified)
+
+    async def call_resource_action(self, resource, action, request, *args,
+                                   **kwargs):
+        """The asynchronous version of
+        :meth:`~restart.resource.Resource.call_action`, which coalesces
+        the identical requests in progress on the event loop (see
+        :attr:`~restart.resource.Resource.coalesce`).
+        """
+        key = resource.get_coalescing_key(request)
+        if key is None:
+            return await self.invoke_action(action, request, *args, **kwargs)
+
+        async def produce():
+            rv = await self.invoke_action(action, request, *args, **kwargs)
+            return resource.share_result(rv, request, args, kwargs)
+
+        (response, snapshot), shared = await self.flights.run(
+            (resource.__class__, key), produce,
+            resource.get_coalescing_timeout()
+        )
+        if not shared:
+            return response
+        if snapshot is None:
+            return await self.invoke_action(action, request, *args, **kwargs)
+        return resource.make_shared_response(snapshot)
+
+    async def invoke_action(self, action, request, *args, **kwargs):
+        """The asynchronous version of
+        :meth:`~restart.resource.Resource.invoke_action`.
+        """
+        timer = request.timer
+        if timer is None:
+            return await self.call_action(action, request, *args, **kwargs)
+        parse = timer.phases.get('parse', 0)
+        started = clock()
+        try:
+            return await self.call_action(action, request, *args, **kwargs)
+        finally:
+            timer.record('action', started)
+            timer.add('action', parse - timer.phases.get('parse', 0))
+
+    async def call_hook(self, hook, *args):
+        """Call the middleware `hook`, which is awaited if it returns
+        an awaitable object.
+        """
+        rv = hook(*args)
+        if inspect.isawaitable(rv):
+            rv = await rv
+        return rv
+
+    async def call_action(self, action, *args, **kwargs):
+        """Call the `action`. Coroutine actions are awaited directly,
+        while normal actions run in the thread pool.
+        """
+        if asyncio.iscoroutinefunction(action):
+            return await action(*args, **kwargs)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(action, *args, **kwargs)
+        )
+
+    async def asgi_app(self, scope, receive, send):
+        """The actual ASGI application.
+
+        :param scope: the ASGI connection scope.
+        :param receive: the ASGI `receive` awaitable callable.
+        :param send: the ASGI `send` awaitable callable.
+        """
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        timer = start_timer(scope['method'])
+        try:
+            endpoint, kwargs = self.router.match(scope['path'],
+                                                 scope['method'])
+        except NotFound:
+            if timer is not None:
+                finish_unrouted_timer(timer, 404)
+            await self.send(send, 404,
+                            [('Content-Type', 'text/plain; charset=utf-8')],
+                            b'The requested URI was not found.')
+            return
+        except MethodNotAllowed as exc:
+            if timer is not None:
+                finish_unrouted_timer(timer, exc.code)
+            environ = make_environ(scope, b'')
+            await self.send(send, exc.code, exc.get_headers(environ),
+                            exc.get_body(environ).encode('utf-8'))
+            return
+
+        if timer is not None:
+            route_timer(timer, endpoint)
+
+        # The whole body is buffered, so its size is always limited to
+        # avoid buffering an unbounded payload (the body of a known length
+        # is rejected before reading it)
+        max_size = config.REQUEST_MAX_CHUNKED_SIZE
+        content_length = get_content_length(scope)
+        try:
+            if content_length is not None and content_length > max_size:
+                raise RequestEntityTooLarge(
+                    'The request payload is too large')
+            body = await read_body(receive, max_size)
+        except RequestEntityTooLarge as exc:
+            environ = make_environ(scope, b'')
+            if timer is not None:
+                finish_timer(timer, Response(b'', exc.code))
+            await self.send(send, exc.code, exc.get_headers(environ),
+                            exc.get_body(environ).encode('utf-8'))
+            return
+        environ = make_environ(scope, body)
+        if timer is not None:
+            environ[TIMER_ENVIRON_KEY] = timer
+        response = await self.adapted_rules[endpoint].handler(environ,
+                                                              **kwargs)
+        _, headers, body = self.prepare_response(response, environ)
+        if isinstance(body, bytes):
+            await self.send(send, response.status_code, headers, body,
+                            has_length=True)
+        else:
+            await self.send_stream(send, response.status_code, headers,
+                                   body)
+
+    async def send(self, send, status_code, headers, body,
+                   has_length=False):
+        """Send the response through the ASGI `send` callable."""
+        headers = [
+            (key.encode('latin-1'), value.encode('latin-1'))
+            for key, value in headers
+        ]
+        if not has_length:
+            headers.append((b'Content-Length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status_code,
+                    'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def send_stream(self, send, status_code, headers, chunks):
+        """Send the streamed response through the ASGI `send` callable.
+        The chunks are produced in the thread pool, since producing them
+        may block (e.g. by reading rows from a database).
+        """
+        headers = [
+            (key.encode('latin-1'), value.encode('latin-1'))
+            for key, value in headers
+        ]
+        await send({'type': 'http.response.start', 'status': status_code,
+                    'headers': headers})
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next,
+                                                   chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+        finally:
+            chunks.close()
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def wsgi_app(self, environ, start_response):
+        """Run the ASGI application on a private event loop, and
+        translate the result into a WSGI response.
+
+        See :meth:`~restart.serving.Service.wsgi_app` for the
+        meanings of the parameters.
+        """
+        scope = make_scope(environ)
+        body = get_input_stream(environ).read()
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body,
+                    'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.asgi_app(scope, receive, send))
+        finally:
+            loop.close()
+
+        start, body_messages = messages[0], messages[1:]
+        status_code = start['status']
+        status = '%d %s' % (
+            status_code, HTTP_STATUS_CODES.get(status_code, 'unknown').upper()
+        )
+        headers = [
+            (key.decode('latin-1'), value.decode('latin-1'))
+            for key, value in start['headers']
+        ]
+        start_response(status, headers)
+        return [b''.join(message.get('body', b'')
+                         for message in body_messages)]
+
+
+class ASGIService(Service):
+    """The service class for serving the RESTArt API as an ASGI
+    application.
+
+    :param api: the RESTArt API.
+    :param adapter_class: the class that is used to adapt the api object.
+                          See :class:`~restart.asgi.ASGIAdapter` for
+                          more information.
+    """
+
+    def __init__(self, api, adapter_class=ASGIAdapter):
+        super(ASGIService, self).__init__(api, adapter_class)
+
+    def asgi_app(self, scope, receive, send):
+        """The actual ASGI application.
+
+        :param scope: the ASGI connection scope.
+        :param receive: the ASGI `receive` awaitable callable.
+        :param send: the ASGI `send` awaitable callable.
+        """
+        return self.adapter.asgi_app(scope, receive, send)
+
+    def __call__(self, scope, receive, send):
+        """Make the ASGIService object itself to be an ASGI application.
+
+        See :meth:`asgi_app` for the meanings of the parameters.
+        """
+        return self.asgi_app(scope, receive, send)
+
+    def run(self, host=None, port=None, debug=None, **options):
+        """Runs the API on a local Uvicorn server.
+
+        :param host: the hostname to listen on. Defaults to `'127.0.0.1'`.
+        :param port: the port of the webserver. Defaults to `5000`.
+        :param debug: if given, enable or disable debug mode.
+        :param options: the options to be forwarded to `uvicorn.run`.
+        """
+        try:
+            import uvicorn
+        except ImportError:
+            raise RuntimeError('Running an ASGI service requires Uvicorn '
+                               '(pip install uvicorn)')
+        if debug:
+            options.setdefault('log_level', 'debug')
+        uvicorn.run(self, host=host or '127.0.0.1', port=port or 5000,
+                    **options)
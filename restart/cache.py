@@ -0,0 +1,659 @@
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import hmac
+import os
+import struct
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from six import iteritems
+from six.moves import cPickle as pickle
+from werkzeug.utils import import_string
+
+from .config import config
+from .response import Response
+from .utils import locked_cached_classproperty
+
+# `time.monotonic` is not available on Python 2
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+def _get_user_id():
+    """Return the user id of the current process, or :attr:`None` on
+    platforms without one (e.g. Windows).
+    """
+    getuid = getattr(os, 'getuid', None)
+    return getuid() if getuid is not None else None
+
+
+class BaseCache(object):
+    """The base class of cache backends.
+
+    Besides plain keys, a backend keeps a generation token for each
+    namespace. Callers include the token of a namespace in their keys,
+    so that all the keys of the namespace are invalidated at once by
+    :meth:`bump`.
+
+    :param max_size: the budget (in bytes) of the cache.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+    def get(self, key):
+        """Return the value for `key`, or :attr:`None` if `key` is not
+        in the cache or has expired.
+
+        :param key: a hashable key.
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value, size, ttl=None):
+        """Set the value for `key`, evicting other items if the budget of
+        the cache is exceeded.
+
+        :param key: a hashable key.
+        :param value: the value to be cached.
+        :param size: the size (in bytes) of `value`. The value is not
+                     cached if `size` exceeds the budget.
+        :param ttl: the number of seconds before the value expires. If
+                    :attr:`None`, the value never expires.
+        """
+        raise NotImplementedError()
+
+    def delete(self, key):
+        """Remove `key` from the cache, if it is in the cache.
+
+        :param key: a hashable key.
+        """
+        raise NotImplementedError()
+
+    def clear(self):
+        """Remove all items from the cache."""
+        raise NotImplementedError()
+
+    def stats(self):
+        """Return a dictionary of the counters of the cache: `hits`,
+        `misses`, `evictions`, `items` and `size` (in bytes).
+        """
+        raise NotImplementedError()
+
+    def generation(self, namespace):
+        """Return the current generation token (a string) of
+        `namespace`.
+
+        :param namespace: the name of the namespace.
+        """
+        raise NotImplementedError()
+
+    def bump(self, namespace):
+        """Replace the generation token of `namespace` with a new one,
+        which invalidates all keys made with the old token.
+
+        :param namespace: the name of the namespace.
+        """
+        raise NotImplementedError()
+
+
+class _Shard(object):
+    """A shard of :class:`MemoryCache`, which has its own lock."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = Lock()
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class MemoryCache(BaseCache):
+    """A thread-safe in-process cache with TTLs, least-recently-used
+    eviction and a memory budget. With several worker processes, each
+    process has its own cache (see :class:`FileCache`).
+
+    The keys are spread over several shards by their hashes, and each
+    shard has its own lock and its own share of the memory budget, so
+    concurrent requests for different keys rarely wait for each other.
+
+    :param max_size: the memory budget (in bytes), which is compared
+                     with the sum of the sizes given to :meth:`set`.
+    :param shards: the number of shards.
+    """
+
+    def __init__(self, max_size, shards=16):
+        super(MemoryCache, self).__init__(max_size)
+        self.shards = tuple(_Shard(max_size // shards)
+                            for _ in range(shards))
+        self._generations = {}
+        self._generations_lock = Lock()
+
+    def _get_shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key):
+        shard = self._get_shard(key)
+        with shard.lock:
+            item = shard.items.pop(key, None)
+            if item is None:
+                shard.misses += 1
+                return None
+            value, size, expires = item
+            if expires is not None and expires <= _monotonic():
+                shard.size -= size
+                shard.misses += 1
+                return None
+            # Move the item to the most recently used end
+            shard.items[key] = item
+            shard.hits += 1
+            return value
+
+    def set(self, key, value, size, ttl=None):
+        # The least recently used items of the same shard are evicted,
+        # and each shard has its own share of the budget
+        shard = self._get_shard(key)
+        if size > shard.max_size:
+            return
+        expires = None if ttl is None else _monotonic() + ttl
+        with shard.lock:
+            old = shard.items.pop(key, None)
+            if old is not None:
+                shard.size -= old[1]
+            shard.items[key] = (value, size, expires)
+            shard.size += size
+            while shard.size > shard.max_size:
+                _, (_, evicted_size, _) = shard.items.popitem(last=False)
+                shard.size -= evicted_size
+                shard.evictions += 1
+
+    def delete(self, key):
+        shard = self._get_shard(key)
+        with shard.lock:
+            item = shard.items.pop(key, None)
+            if item is not None:
+                shard.size -= item[1]
+
+    def clear(self):
+        for shard in self.shards:
+            with shard.lock:
+                shard.items.clear()
+                shard.size = 0
+
+    def stats(self):
+        stats = dict(hits=0, misses=0, evictions=0, items=0, size=0)
+        for shard in self.shards:
+            with shard.lock:
+                stats['hits'] += shard.hits
+                stats['misses'] += shard.misses
+                stats['evictions'] += shard.evictions
+                stats['items'] += len(shard.items)
+                stats['size'] += shard.size
+        return stats
+
+    def generation(self, namespace):
+        try:
+            return self._generations[namespace]
+        except KeyError:
+            with self._generations_lock:
+                return self._generations.setdefault(namespace,
+                                                    uuid.uuid4().hex)
+
+    def bump(self, namespace):
+        with self._generations_lock:
+            self._generations[namespace] = uuid.uuid4().hex
+
+
+class FileCache(BaseCache):
+    """A cache stored as files in a local directory, which is shared by
+    all the processes using the same directory (e.g. the pre-forked
+    workers of a service), so that a response cached by one worker is
+    served by all of them.
+
+    Each item is a file named by the hash of its key and written
+    atomically (to a temporary file, which is then renamed), so readers
+    never take a lock or wait for other processes, and they never see a
+    partially written item. Generation tokens are stored as files too,
+    so :meth:`bump` in one process invalidates the keys in all of them.
+
+    The budget is compared with the total size of the item files. Every
+    time roughly a sixteenth of the budget has been written by a
+    process, the least recently used files (by modification time, which
+    is updated on each hit) are removed until the total size is within
+    the budget again. The `hits`, `misses` and `evictions` counters
+    returned by :meth:`stats` are those of the current process.
+
+    Keys must have a stable :func:`repr` (e.g. tuples of strings and
+    numbers), and values must be picklable. Use a distinct directory for
+    each service sharing the machine.
+
+    Since the values are unpickled, anyone able to write to the directory
+    could run code in the processes using the cache. The directory is
+    created with mode `0o700`, and it is refused (with a
+    :exc:`RuntimeError`) if it is owned by another user or writable by
+    the group or others. If a `secret` is given, the items are signed
+    with HMAC-SHA256 too, and the items with a wrong signature are
+    ignored.
+
+    :param max_size: the disk budget (in bytes).
+    :param directory: the directory of the cache, which is created if
+                      needed. If not specified, the `RESPONSE_CACHE_DIR`
+                      configuration option will be used.
+    :param secret: the key used to sign the items. If not specified, the
+                   `RESPONSE_CACHE_SECRET` configuration option will be
+                   used.
+    """
+
+    #: The header of an item file: the expiration time (a UNIX
+    #: timestamp, or `0` if the item never expires).
+    header = struct.Struct('!d')
+
+    #: The size of the signatures of the items (if signed).
+    signature_size = hashlib.sha256().digest_size
+
+    #: The number of seconds after which an orphaned temporary file
+    #: (left by a crashed writer) is removed.
+    temp_file_timeout = 60
+
+    def __init__(self, max_size, directory=None, secret=None):
+        super(FileCache, self).__init__(max_size)
+        if directory is None:
+            directory = config.RESPONSE_CACHE_DIR or os.path.join(
+                tempfile.gettempdir(), 'restart-cache-%s' % _get_user_id()
+            )
+        if secret is None:
+            secret = config.RESPONSE_CACHE_SECRET
+        if secret is not None and not isinstance(secret, bytes):
+            secret = secret.encode('utf-8')
+        self.directory = directory
+        self.secret = secret
+        self.items_dir = os.path.join(directory, 'items')
+        self.generations_dir = os.path.join(directory, 'generations')
+        for path in (directory, self.items_dir, self.generations_dir):
+            try:
+                os.makedirs(path, 0o700)
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            self.check_directory(path)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._written = 0
+
+    def check_directory(self, path):
+        """Raise a :exc:`RuntimeError` if the directory `path` is owned by
+        another user or writable by the group or others.
+
+        :param path: the path of the directory.
+        """
+        user_id = _get_user_id()
+        if user_id is None:  # Windows
+            return
+        stat = os.stat(path)
+        if stat.st_uid != user_id or stat.st_mode & 0o022:
+            raise RuntimeError(
+                'The cache directory %r must be owned by the current user '
+                'and not be writable by the group or others' % path
+            )
+
+    def _sign(self, data):
+        return hmac.new(self.secret, data, hashlib.sha256).digest()
+
+    def _get_path(self, directory, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(directory, digest)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(prefix='.', dir=self.items_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(temp_path, path)
+        except BaseException:
+            self._unlink(temp_path)
+            raise
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def _count(self, name, delta=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def get(self, key):
+        path = self._get_path(self.items_dir, key)
+        data = self._read(path)
+        if data is not None:
+            expires, = self.header.unpack_from(data)
+            if not expires or expires > time.time():
+                payload = data[self.header.size:]
+                if self.secret is not None:
+                    signature = payload[:self.signature_size]
+                    payload = payload[self.signature_size:]
+                    if not hmac.compare_digest(signature,
+                                               self._sign(payload)):
+                        payload = None
+                try:
+                    value = payload and pickle.loads(payload)
+                except Exception:
+                    value = None
+                if value is not None:
+                    # Mark the item as recently used
+                    try:
+                        os.utime(path, None)
+                    except OSError:
+                        pass
+                    self._count('hits')
+                    return value
+            self._unlink(path)
+        self._count('misses')
+        return None
+
+    def set(self, key, value, size, ttl=None):
+        if size > self.max_size:
+            return
+        expires = 0 if ttl is None else time.time() + ttl
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if self.secret is not None:
+            payload = self._sign(payload) + payload
+        data = self.header.pack(expires) + payload
+        self._write(self._get_path(self.items_dir, key), data)
+
+        with self.lock:
+            self._written += len(data)
+            cull = self._written >= self.max_size // 16
+            if cull:
+                self._written = 0
+        if cull:
+            self.cull()
+
+    def delete(self, key):
+        self._unlink(self._get_path(self.items_dir, key))
+
+    def _list_items(self):
+        """Return a list of `(mtime, size, path)` tuples of the item
+        files, removing orphaned temporary files on the way.
+        """
+        items = []
+        now = time.time()
+        for name in os.listdir(self.items_dir):
+            path = os.path.join(self.items_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.startswith('.'):
+                if stat.st_mtime + self.temp_file_timeout < now:
+                    self._unlink(path)
+                continue
+            items.append((stat.st_mtime, stat.st_size, path))
+        return items
+
+    def cull(self):
+        """Remove the least recently used items until the total size of
+        the cache is within the budget.
+        """
+        items = self._list_items()
+        size = sum(item_size for _, item_size, _ in items)
+        items.sort()
+        for _, item_size, path in items:
+            if size <= self.max_size:
+                break
+            if self._unlink(path):
+                self._count('evictions')
+            size -= item_size
+
+    def clear(self):
+        for _, _, path in self._list_items():
+            self._unlink(path)
+
+    def stats(self):
+        items = self._list_items()
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        evictions=self.evictions, items=len(items),
+                        size=sum(size for _, size, _ in items))
+
+    def generation(self, namespace):
+        path = self._get_path(self.generations_dir, namespace)
+        token = self._read(path)
+        if not token:
+            return self.bump(namespace)
+        return token.decode('ascii')
+
+    def bump(self, namespace):
+        token = uuid.uuid4().hex
+        path = self._get_path(self.generations_dir, namespace)
+        self._write(path, token.encode('ascii'))
+        return token
+
+
+class CachedResponse(Response):
+    """The response served from the cache, whose data has been rendered
+    already.
+    """
+
+    is_rendered = True
+
+
+class ResponseCacheMiddleware(object):
+    """The middleware used to cache the rendered responses of GET (and
+    HEAD) requests, so that repeated requests are answered without
+    calling the actions or rendering the responses again.
+
+    The responses are keyed by the resource, the request path, the query
+    arguments, the format suffix, the `Accept` header and the values of
+    the request headers listed in the Vary header of the cached response
+    (which is stored per key). Only 200 responses that are not
+    streamed are cached, unless they have a `Cache-Control` of
+    `no-store`, `no-cache` or `private`, or a `Set-Cookie` header.
+    Requests carrying credentials (see :attr:`private_headers`) are
+    neither answered from nor stored in the cache, as required of shared
+    caches by RFC 7234 (section 3.2).
+
+    The cached responses of a resource live for
+    :attr:`~restart.resource.Resource.cache_ttl` seconds, and they are
+    all invalidated by a successful POST, PUT, PATCH or DELETE request
+    to the same resource (for example, creating an item invalidates
+    the cached list).
+
+    The cache is shared by all resources. Its backend is the
+    `RESPONSE_CACHE_BACKEND` configuration option: the in-process
+    :class:`MemoryCache` by default, or :class:`FileCache` to share the
+    cached responses between worker processes. Its budget is the
+    `RESPONSE_CACHE_MAX_SIZE` configuration option. Since middlewares
+    are called in reverse order on the rendered responses, list this
+    middleware after :class:`~restart.compression.CompressionMiddleware`
+    (if any) to cache the uncompressed bodies. Example::
+
+        MIDDLEWARE_CLASSES = (
+            'my_middlewares.AuthMiddleware',
+            'restart.compression.CompressionMiddleware',
+            'restart.cache.ResponseCacheMiddleware',
+        )
+    """
+
+    #: The cache backend class (a subclass of :class:`BaseCache`). If
+    #: :attr:`None`, the `RESPONSE_CACHE_BACKEND` configuration option
+    #: will be used.
+    backend_class = None
+
+    #: The request methods whose successful responses invalidate the
+    #: cached responses of the resource.
+    invalidating_methods = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+    #: The values of the `Cache-Control` header that prevent caching.
+    uncacheable_directives = frozenset(['no-store', 'no-cache', 'private'])
+
+    #: The request headers whose presence bypasses the cache, since the
+    #: responses may differ per user. Resources whose responses list
+    #: these headers in their Vary headers may set it to an empty tuple
+    #: to cache them per user.
+    private_headers = ('Authorization', 'Cookie')
+
+    @locked_cached_classproperty(name='_cache')
+    def cache(cls):
+        """The cache backend object shared by all resources."""
+        backend_class = cls.backend_class or \
+            import_string(config.RESPONSE_CACHE_BACKEND)
+        return backend_class(config.RESPONSE_CACHE_MAX_SIZE)
+
+    def get_ttl(self, resource):
+        """Return the TTL (in seconds) of the cached responses of
+        `resource`, or `0` if they should not be cached.
+
+        :param resource: the resource object.
+        """
+        ttl = getattr(resource, 'cache_ttl', None)
+        if ttl is None:
+            ttl = config.RESPONSE_CACHE_TTL
+        return ttl
+
+    def get_generation(self, name):
+        """Return the current generation of the resource named `name`,
+        which changes whenever its cached responses are invalidated.
+
+        :param name: the name of the resource.
+        """
+        return self.cache.generation(name)
+
+    def invalidate(self, name):
+        """Invalidate all cached responses of the resource named `name`.
+        The stale responses are never served again, and they are evicted
+        in time, as the least recently used ones.
+
+        :param name: the name of the resource.
+        """
+        self.cache.bump(name)
+
+    def get_base_key(self, request):
+        """Return the part of the cache key of `request` that is known
+        before the response: the resource, the request method (since the
+        response to HEAD has no body), the request path, the query
+        arguments, the format suffix and the `Accept` header (which
+        select the renderer).
+
+        :param request: the request object.
+        """
+        resource = request.resource
+        name = resource.name
+        args = tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in iteritems(request.args)
+        ))
+        return (name, self.get_generation(name), request.method,
+                request.path, args, resource.format_suffix,
+                request.environ.get('HTTP_ACCEPT'))
+
+    def get_key(self, request, base_key, vary):
+        """Return the cache key of `request`, which includes the values
+        of the request headers listed in `vary`.
+
+        :param request: the request object.
+        :param base_key: the key returned by :meth:`get_base_key`.
+        :param vary: the lowercase names of the request headers.
+        """
+        environ = request.environ
+        values = tuple(
+            environ.get('HTTP_' + header.upper().replace('-', '_'))
+            for header in vary
+        )
+        return base_key + (vary, values)
+
+    def is_private(self, request):
+        """Whether `request` carries any of the :attr:`private_headers`.
+
+        :param request: the request object.
+        """
+        environ = request.environ
+        return any(
+            'HTTP_' + header.upper().replace('-', '_') in environ
+            for header in self.private_headers
+        )
+
+    def process_request(self, request):
+        """Return the cached response for `request`, if any."""
+        if request.method not in ('GET', 'HEAD') or \
+                not self.get_ttl(request.resource) or \
+                self.is_private(request):
+            return None
+        # The Vary headers are stored along with the responses, since
+        # they may differ between the resources (and their actions)
+        base_key = self.get_base_key(request)
+        vary = self.cache.get(('vary',) + base_key)
+        if vary is None:
+            return None
+        entry = self.cache.get(self.get_key(request, base_key, vary))
+        if entry is None:
+            return None
+        status_code, headers, body = entry
+        return CachedResponse(body, status_code, dict(headers))
+
+    def is_cacheable(self, response):
+        """Whether the rendered `response` can be cached.
+
+        :param response: the rendered response object.
+        """
+        if (response.status_code != 200 or response.is_streamed or
+                isinstance(response, CachedResponse)):
+            return False
+        headers = response.headers
+        if 'Set-Cookie' in headers:
+            return False
+        directives = set(
+            directive.split('=', 1)[0].strip().lower()
+            for directive in headers.get('Cache-Control', '').split(',')
+        )
+        return not directives & self.uncacheable_directives
+
+    def process_rendered_response(self, request, response):
+        """Cache the rendered `response` of a GET (or HEAD) request, or
+        invalidate the cached responses on a successful write.
+        """
+        method = request.method
+        if method in self.invalidating_methods:
+            if 200 <= response.status_code < 300:
+                self.invalidate(request.resource.name)
+            return response
+
+        ttl = self.get_ttl(request.resource)
+        if method not in ('GET', 'HEAD') or not ttl or \
+                self.is_private(request) or not self.is_cacheable(response):
+            return response
+
+        vary = tuple(sorted(
+            name.strip().lower()
+            for name in response.headers.get('Vary', '').split(',')
+            if name.strip()
+        ))
+        if '*' in vary:
+            return response
+
+        body = response.get_body()
+        response.data = body
+        headers = dict(response.headers)
+        size = len(body) + sum(len(key) + len(str(value))
+                               for key, value in iteritems(headers))
+        base_key = self.get_base_key(request)
+        self.cache.set(('vary',) + base_key, vary, len(repr(vary)), ttl)
+        self.cache.set(self.get_key(request, base_key, vary),
+                       (response.status_code, headers, body), size, ttl)
+        return response
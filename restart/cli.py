@@ -14,7 +14,8 @@ from .serving import Service
 @click.argument('entrypoint', required=True)
 @click.option('--adapter', '-a', default='restart.adapter.WerkzeugAdapter',
               help='The adapter class used to adapt RESTArt to a '
-                   'specific framework. Defaults to '
+                   'specific framework (e.g. `restart.adapter.WSGIAdapter` '
+                   'for plain WSGI). Defaults to '
                    '`restart.adapter.WerkzeugAdapter`.')
 @click.option('--host', '-h', default='127.0.0.1',
               help='The hostname to listen on. Set this to `0.0.0.0` to '
@@ -26,7 +27,12 @@ from .serving import Service
               help='Enable or disable debug mode. Defaults to `False`.')
 @click.option('--level', '-l', default='INFO',
               help='The logging level. Defaults to `INFO`.')
-def main(entrypoint, adapter, host, port, debug, level):
+@click.option('--profile-stacks', default=None, type=click.Path(),
+              help='Sample the stacks of the requests in progress with the '
+                   'sampling profiler, and write them in the collapsed-stack '
+                   'format (for flame graphs) to this file on exit. Not '
+                   'available in debug mode.')
+def main(entrypoint, adapter, host, port, debug, level, profile_stacks):
     if '.' not in sys.path:
         sys.path.insert(0, '.')
 
@@ -46,10 +52,29 @@ def main(entrypoint, adapter, host, port, debug, level):
             'of `restart.adapter.Adapter`' % str(adapter)
         )
 
+    if debug and profile_stacks is not None:
+        # The reloader of the debug mode serves the requests in a child
+        # process, so only its parent process would be profiled
+        raise RuntimeError(
+            'The option `--profile-stacks` is not available in debug mode'
+        )
+
     # Change the level of the global logger
     from .logging import global_logger
     global_logger.setLevel(level)
 
     # Run the API as a service
     service = Service(api, adapter_class)
-    service.run(host, port, debug)
+    if profile_stacks is None:
+        service.run(host, port, debug)
+        return
+
+    from .profiling import SamplingProfiler
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        service.run(host, port, debug)
+    finally:
+        profiler.stop()
+        with open(profile_stacks, 'w') as f:
+            f.write(profiler.get_collapsed())
@@ -0,0 +1,358 @@
+from __future__ import absolute_import
+
+import io
+import zlib
+
+from six import text_type
+
+from .config import config
+from .exceptions import (
+    BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+)
+from .response import add_vary
+from .utils import BoundedCache
+
+
+#: The `wbits` arguments of :func:`zlib.decompressobj` for the supported
+#: content encodings. Both gzip and zlib streams are accepted for `gzip`
+#: (with automatic header detection), while raw deflate streams (sent by
+#: some clients for `deflate`) are detected on the first chunk.
+DECOMPRESSION_WBITS = {
+    'gzip': 32 + zlib.MAX_WBITS,
+    'x-gzip': 32 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+class DecompressingStream(io.RawIOBase):
+    """A read-only file-like object, which decompresses `stream` on the
+    fly. At most `size` bytes are decompressed for each read, so the
+    memory used is bounded no matter how large the decompressed payload
+    is.
+
+    :param stream: the compressed stream.
+    :param encoding: the content encoding of `stream`, which must be one
+                     of the keys of :data:`DECOMPRESSION_WBITS`.
+    :param max_size: the maximum size (in bytes) of the decompressed
+                     payload. If it is exceeded,
+                     :exc:`~werkzeug.exceptions.RequestEntityTooLarge`
+                     will be raised. If set to `None`, the size is
+                     unlimited.
+    :param chunk_size: the size (in bytes) of each read from `stream`.
+    """
+
+    def __init__(self, stream, encoding, max_size=None, chunk_size=65536):
+        self.stream = stream
+        self.encoding = encoding
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._decompressor = zlib.decompressobj(
+            DECOMPRESSION_WBITS[encoding]
+        )
+        self._pending = b''
+        self._started = False
+        self._finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._decompress(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        return size
+
+    def _decompress(self, size):
+        while not self._finished:
+            if self._decompressor.unconsumed_tail:
+                compressed = self._decompressor.unconsumed_tail
+            elif self._pending:
+                compressed, self._pending = self._pending, b''
+            else:
+                compressed = self.stream.read(self.chunk_size)
+                if not compressed:
+                    self._finish()
+                    break
+
+            try:
+                data = self._decompressor.decompress(compressed, size)
+            except zlib.error:
+                if self._started or self.encoding != 'deflate':
+                    raise BadRequest('Compressed data is invalid')
+                # Retry as a raw deflate stream (without the zlib header)
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                data = self._decompressor.decompress(compressed, size)
+            self._started = True
+
+            unused_data = self._decompressor.unused_data
+            if unused_data:
+                if not self.encoding.endswith('gzip'):
+                    raise BadRequest('Compressed data is invalid')
+                # Concatenated gzip members are decompressed in order
+                self._pending = unused_data
+                self._decompressor = zlib.decompressobj(
+                    DECOMPRESSION_WBITS[self.encoding]
+                )
+
+            if data:
+                self.size += len(data)
+                if self.max_size is not None and self.size > self.max_size:
+                    raise RequestEntityTooLarge(
+                        'The decompressed request payload is too large'
+                    )
+                return data
+        return b''
+
+    def _finish(self):
+        self._finished = True
+        # `eof` is not available on Python 2
+        if not getattr(self._decompressor, 'eof', True) or \
+                self._decompressor.flush():
+            raise BadRequest('Compressed data is incomplete')
+
+
+def decompress_stream(stream, content_encoding, max_size=None):
+    """Return a buffered file-like object, which reads the request payload
+    from `stream` and decodes it according to `content_encoding`. If no
+    decoding is needed (e.g. the content encoding is `identity`),
+    `stream` itself is returned.
+
+    :param stream: the request stream.
+    :param content_encoding: the value of the Content-Encoding header,
+                             which lists the encodings in the order they
+                             were applied.
+    :param max_size: the maximum size (in bytes) of the decompressed
+                     payload. If not specified, the
+                     `REQUEST_MAX_DECOMPRESSED_SIZE` configuration option
+                     will be used.
+    """
+    if max_size is None:
+        max_size = config.REQUEST_MAX_DECOMPRESSED_SIZE
+
+    encodings = [encoding.strip().lower()
+                 for encoding in content_encoding.split(',')]
+    for encoding in reversed(encodings):
+        if encoding in ('', 'identity'):
+            continue
+        if encoding not in DECOMPRESSION_WBITS:
+            raise UnsupportedMediaType(
+                'Unsupported content encoding "%s" in request' % encoding
+            )
+        stream = io.BufferedReader(
+            DecompressingStream(stream, encoding, max_size)
+        )
+    return stream
+
+
+#: The `wbits` arguments of :func:`zlib.compressobj` for the supported
+#: content codings of responses, in order of preference.
+COMPRESSION_WBITS = (
+    ('gzip', 16 + zlib.MAX_WBITS),
+    ('deflate', zlib.MAX_WBITS),
+)
+
+
+class CompressionMiddleware(object):
+    """The middleware used to compress response bodies with gzip or
+    deflate, according to the Accept-Encoding header of the request.
+
+    Only the responses whose content types have compression levels (see
+    :attr:`levels`) are compressed, and `Accept-Encoding` is added to
+    their Vary header. Bodies smaller than :attr:`minimum_size` are sent
+    as they are, while streamed bodies are always compressed chunk by
+    chunk, without being buffered. Since a compressed body is a
+    different representation, a strong ETag is made weak.
+
+    The compressed bodies of responses with strong ETags are cached, so
+    repeated requests for an unchanged representation are compressed
+    only once.
+
+    Example::
+
+        MIDDLEWARE_CLASSES = (
+            'restart.compression.CompressionMiddleware',
+        )
+    """
+
+    #: The minimum size (in bytes) of a response body to be compressed.
+    #: If :attr:`None`, the `COMPRESSION_MIN_SIZE` configuration option
+    #: will be used.
+    minimum_size = None
+
+    #: A dictionary mapping content types (`'type/subtype'` or
+    #: `'type/*'`) to compression levels (from 1 to 9). If :attr:`None`,
+    #: the `COMPRESSION_LEVELS` configuration option will be used.
+    levels = None
+
+    #: The maximum number of compressed bodies (and raw Accept-Encoding
+    #: strings) memoized.
+    cache_size = 128
+
+    #: The maximum size (in bytes) of a compressed body to be cached.
+    cache_max_item_size = 1024 * 1024
+
+    def __init__(self):
+        self._accept_cache = BoundedCache(self.cache_size)
+        self._body_cache = BoundedCache(self.cache_size)
+
+    def select_encoding(self, accept_encoding):
+        """Return the most preferred content coding acceptable according
+        to `accept_encoding`, or :attr:`None` if none of them is
+        acceptable. The result is memoized for each distinct
+        `accept_encoding` string.
+
+        :param accept_encoding: the value of the Accept-Encoding header.
+        """
+        selected = self._accept_cache.get(accept_encoding)
+        if selected is not None:
+            return selected or None
+
+        qualities = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.partition(';')
+            quality = 1
+            for param in params.split(';'):
+                key, _, value = param.partition('=')
+                if key.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0
+            qualities[coding.strip().lower()] = quality
+
+        selected, selected_quality = '', 0
+        for coding, _ in COMPRESSION_WBITS:
+            # A specific coding takes precedence over the wildcard
+            quality = qualities.get(coding, qualities.get('*', 0))
+            if quality > selected_quality:
+                selected, selected_quality = coding, quality
+        self._accept_cache.set(accept_encoding, selected)
+        return selected or None
+
+    def get_level(self, content_type):
+        """Return the compression level for `content_type`, or `0` if
+        the content type should not be compressed.
+
+        :param content_type: the value of the Content-Type header.
+        """
+        levels = self.levels
+        if levels is None:
+            levels = config.COMPRESSION_LEVELS
+        mimetype = content_type.split(';', 1)[0].strip().lower()
+        level = levels.get(mimetype)
+        if level is None:
+            level = levels.get(mimetype.split('/', 1)[0] + '/*')
+        return level or 0
+
+    def make_compressor(self, encoding, level):
+        """Return a compression object for `encoding`.
+
+        :param encoding: the content coding.
+        :param level: the compression level.
+        """
+        wbits = dict(COMPRESSION_WBITS)[encoding]
+        return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, body, encoding, level):
+        """Compress the whole `body` (bytes).
+
+        :param body: the response body.
+        :param encoding: the content coding.
+        :param level: the compression level.
+        """
+        compressor = self.make_compressor(encoding, level)
+        return compressor.compress(body) + compressor.flush()
+
+    def compress_stream(self, chunks, encoding, level):
+        """Compress the streamed body incrementally. Each chunk is flushed
+        as soon as it is compressed, so the client receives data at the
+        same pace as it is produced.
+
+        :param chunks: the iterator of body chunks (bytes or text).
+        :param encoding: the content coding.
+        :param level: the compression level.
+        """
+        compressor = self.make_compressor(encoding, level)
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, text_type):
+                    chunk = chunk.encode('utf-8')
+                data = (compressor.compress(chunk) +
+                        compressor.flush(zlib.Z_SYNC_FLUSH))
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def process_rendered_response(self, request, response):
+        """Compress the rendered `response` if possible.
+
+        :param request: the request object.
+        :param response: the rendered response object.
+        """
+        headers = response.headers
+        status_code = response.status_code
+        if (status_code < 200 or status_code in (204, 304) or
+                'Content-Encoding' in headers):
+            return response
+
+        level = self.get_level(headers.get('Content-Type', ''))
+        if not level:
+            return response
+        add_vary(headers, 'Accept-Encoding')
+
+        encoding = self.select_encoding(
+            request.environ.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+
+        etag = headers.get('ETag')
+        if etag and etag.startswith('W/'):
+            etag = None
+        if response.is_streamed:
+            response.data = self.compress_stream(response.data, encoding,
+                                                 level)
+        else:
+            body = response.get_body()
+            minimum_size = self.minimum_size
+            if minimum_size is None:
+                minimum_size = config.COMPRESSION_MIN_SIZE
+            if len(body) < minimum_size:
+                return response
+            response.data = self.compress_cached(request, response, body,
+                                                 encoding, level, etag)
+
+        if etag:
+            headers['ETag'] = 'W/' + etag
+        headers['Content-Encoding'] = encoding
+        headers.pop('Content-Length', None)
+        return response
+
+    def compress_cached(self, request, response, body, encoding, level,
+                        etag):
+        """Compress `body`, reusing the compressed bytes cached for the
+        same strong `etag` of the same resource (if any).
+
+        :param request: the request object.
+        :param response: the rendered response object.
+        :param body: the response body.
+        :param encoding: the content coding.
+        :param level: the compression level.
+        :param etag: the strong ETag of the response, or :attr:`None`.
+        """
+        if not etag:
+            return self.compress(body, encoding, level)
+
+        key = (request.uri, response.headers.get('Content-Type'), etag,
+               encoding, level)
+        compressed = self._body_cache.get(key)
+        if compressed is None:
+            compressed = self.compress(body, encoding, level)
+            if len(compressed) <= self.cache_max_item_size:
+                self._body_cache.set(key, compressed)
+        return compressed
@@ -34,6 +34,160 @@ RENDERER_CLASSES = (
     'restart.renderers.JSONRenderer',
 )
 
+#: The JSON backend used by the JSON parser and renderer, which must be
+#: `'auto'`, `'orjson'`, `'ujson'` or `'json'` (the standard library).
+#: If set to `'auto'` (or if the specified backend is not installed),
+#: the fastest installed one will be used. The faster backends are
+#: opt-in, since their output may differ slightly (e.g. `orjson`
+#: serializes NaN as `null`).
+JSON_BACKEND = 'json'
+
+#: The minimum number of bytes buffered before a chunk is sent, when
+#: the JSON renderer streams an iterator (e.g. a generator) as an array.
+JSON_STREAM_FLUSH_SIZE = 65536
+
+#: The maximum size (in bytes) of the request payload accepted by the
+#: streaming JSON parser.
+JSON_MAX_BODY_SIZE = 100 * 1024 * 1024
+
+#: The maximum nesting depth of arrays and objects accepted by the
+#: streaming JSON parser.
+JSON_MAX_DEPTH = 64
+
+#: The maximum length (in bytes) of a string accepted by the streaming
+#: JSON parser.
+JSON_MAX_STRING_LENGTH = 1024 * 1024
+
+
+# -- Request payload --
+
+#: The maximum size (in bytes) of a request payload whose length is
+#: unknown in advance (i.e. sent with chunked transfer encoding). The
+#: ASGI service, which buffers the whole payload, also applies it to the
+#: payload whose length is known.
+REQUEST_MAX_CHUNKED_SIZE = 100 * 1024 * 1024
+
+#: The maximum size (in bytes) of a compressed request payload (see the
+#: Content-Encoding header) after decompression.
+REQUEST_MAX_DECOMPRESSED_SIZE = 100 * 1024 * 1024
+
+
+# -- Conditional requests --
+
+#: Add ETags computed from the rendered bodies to the responses of GET
+#: and HEAD requests, and answer 304 (Not Modified) if they match the
+#: If-None-Match headers of the requests.
+AUTO_ETAG = True
+
+
+# -- Response compression --
+
+#: The minimum size (in bytes) of a response body to be compressed by
+#: the compression middleware.
+COMPRESSION_MIN_SIZE = 1024
+
+#: The compression levels (from 1 to 9) used by the compression
+#: middleware, by content type (`'type/subtype'` or `'type/*'`). The
+#: responses of other content types are not compressed.
+COMPRESSION_LEVELS = {
+    'application/json': 6,
+    'application/javascript': 6,
+    'application/xml': 6,
+    'text/*': 6,
+}
+
+
+# -- Response cache --
+
+#: The default number of seconds the responses are cached by the response
+#: cache middleware (see also `Resource.cache_ttl`).
+RESPONSE_CACHE_TTL = 60
+
+#: The budget (in bytes) of the response cache, which is shared by all
+#: resources.
+RESPONSE_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+#: The backend class of the response cache: `'restart.cache.MemoryCache'`
+#: (one cache per process) or `'restart.cache.FileCache'` (shared by the
+#: processes using the same directory).
+RESPONSE_CACHE_BACKEND = 'restart.cache.MemoryCache'
+
+#: The directory of the file cache backend, which must be owned by the
+#: current user and not be writable by the group or others. If set to
+#: `None`, the `restart-cache-<uid>` directory in the default directory
+#: of the `tempfile` module will be used.
+RESPONSE_CACHE_DIR = None
+
+#: The key used to sign the items of the file cache backend with
+#: HMAC-SHA256. If set to `None`, the items are not signed.
+RESPONSE_CACHE_SECRET = None
+
+
+# -- Request coalescing --
+
+#: The maximum number of seconds a coalesced request (see
+#: `Resource.coalesce`) waits for the identical request in progress.
+COALESCE_TIMEOUT = 10
+
+
+# -- Timing --
+
+#: Add the Server-Timing header, with the durations of the phases of
+#: the request (see `restart.timing.PHASES`), to the responses.
+SERVER_TIMING = False
+
+
+# -- Metrics --
+
+#: The directory of the memory-mapped metrics files of the worker
+#: processes (see `restart.metrics.MmapStore`). If set to `None`, the
+#: metrics are kept in the memory of each process.
+METRICS_DIR = None
+
+
+# -- Profiling --
+
+#: Profile one in every N requests of each resource with the profiling
+#: middleware (see `restart.profiling.ProfilerMiddleware`). If set to
+#: `0`, requests are only profiled on demand.
+PROFILER_SAMPLE_EVERY = 0
+
+#: The secret key of the signed headers used to ask for the profiling
+#: of requests, or for the sampled stacks. If set to `None`, requests
+#: cannot be profiled on demand, and the sampled stacks are not exported.
+PROFILER_SECRET = None
+
+#: The directory of the profiles. If set to `None`, the
+#: `restart-profiles` directory in the default temporary directory will
+#: be used.
+PROFILER_DIR = None
+
+#: The number of seconds between the samples of the sampling profiler
+#: (see `restart.profiling.SamplingProfiler`).
+SAMPLING_PROFILER_INTERVAL = 0.01
+
+
+# -- Uploads --
+
+#: The upload handler class used for each file in multipart requests.
+UPLOAD_HANDLER_CLASS = 'restart.uploads.SpooledUploadHandler'
+
+#: The maximum size (in bytes) of an uploaded file kept in memory by the
+#: default upload handler. Larger files are spooled to temporary files.
+UPLOAD_SPOOL_SIZE = 512 * 1024
+
+#: The directory of the temporary files for uploads. If set to `None`,
+#: the default directory of the `tempfile` module will be used.
+UPLOAD_TEMP_DIR = None
+
+#: The maximum size (in bytes) of an uploaded file. If set to `None`,
+#: the size is unlimited.
+UPLOAD_MAX_FILE_SIZE = None
+
+#: The maximum size (in bytes) of a non-file field in multipart requests,
+#: which is held in memory. If set to `None`, the size is unlimited.
+UPLOAD_MAX_FIELD_SIZE = 1024 * 1024
+
 
 # -- Logger --
 
@@ -57,3 +211,10 @@ LOGGER_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 #: The middleware classes used to alter RESTArt's requests and responses.
 MIDDLEWARE_CLASSES = ()
+
+
+# -- ASGI --
+
+#: The maximum number of threads used to run synchronous actions
+#: under the ASGI adapter.
+ASGI_MAX_WORKERS = 10
@@ -0,0 +1,225 @@
+from __future__ import absolute_import
+
+import datetime
+import decimal
+import json
+import uuid
+from threading import Lock
+
+from .config import config
+
+
+class TypeEncoderRegistry(object):
+    """The registry of encoders for the types that are not natively
+    supported by JSON. The encoder for each concrete type is resolved
+    once (along the type's MRO) and then cached.
+
+    Example::
+
+        from restart.json_backends import type_encoders
+
+        @type_encoders.register(Money)
+        def encode_money(money):
+            return {'amount': str(money.amount), 'currency': money.currency}
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._encoders = {}
+        self._cache = {}
+
+    def register(self, type_, encoder=None):
+        """Register `encoder` for `type_` (and its subclasses). Can also
+        be used as a decorator if `encoder` is not specified.
+
+        :param type_: the type to be encoded.
+        :param encoder: a function that converts an object of `type_`
+                        into a JSON serializable object.
+        """
+        if encoder is None:
+            def decorator(encoder):
+                self.register(type_, encoder)
+                return encoder
+            return decorator
+
+        with self.lock:
+            self._encoders[type_] = encoder
+            # The resolved encoders of subclasses may change
+            self._cache.clear()
+
+    def resolve(self, type_):
+        """Return the encoder for `type_`, or :attr:`None` if no encoder
+        is registered for it or its base classes.
+        """
+        try:
+            return self._cache[type_]
+        except KeyError:
+            pass
+
+        for base in type_.__mro__:
+            encoder = self._encoders.get(base)
+            if encoder is not None:
+                break
+        else:
+            encoder = None
+        self._cache[type_] = encoder
+        return encoder
+
+    def default(self, obj):
+        """Encode `obj`, which is suitable to be passed as the `default`
+        argument of JSON encoders.
+
+        :param obj: the object that is not natively JSON serializable.
+        """
+        encoder = self.resolve(type(obj))
+        if encoder is None:
+            raise TypeError('%r is not JSON serializable' % obj)
+        return encoder(obj)
+
+
+#: The global registry of type encoders used by all JSON backends.
+type_encoders = TypeEncoderRegistry()
+type_encoders.register(datetime.datetime, lambda obj: obj.isoformat())
+type_encoders.register(datetime.date, lambda obj: obj.isoformat())
+type_encoders.register(datetime.time, lambda obj: obj.isoformat())
+type_encoders.register(decimal.Decimal, str)
+type_encoders.register(uuid.UUID, str)
+type_encoders.register(set, list)
+type_encoders.register(frozenset, list)
+
+
+class JSONBackend(object):
+    """The base JSON backend class.
+
+    :param encoders: the registry of type encoders. If not specified,
+                     the global :data:`type_encoders` will be used.
+    """
+
+    #: The name of the backend.
+    name = None
+
+    def __init__(self, encoders=None):
+        self.encoders = encoders or type_encoders
+
+    def dumps(self, obj):
+        """Serialize `obj` into compact JSON bytes (UTF-8 encoded)."""
+        raise NotImplementedError()
+
+    def loads(self, data):
+        """Deserialize `data` (bytes) into Python objects. Raise
+        :exc:`ValueError` if `data` is not valid JSON.
+        """
+        raise NotImplementedError()
+
+
+class StdlibBackend(JSONBackend):
+    """The JSON backend based on the standard library."""
+
+    name = 'json'
+
+    def __init__(self, *args, **kwargs):
+        super(StdlibBackend, self).__init__(*args, **kwargs)
+        self.encoder = json.JSONEncoder(separators=(',', ':'),
+                                        ensure_ascii=False,
+                                        default=self.encoders.default)
+
+    def dumps(self, obj):
+        return self.encoder.encode(obj).encode('utf-8')
+
+    def loads(self, data):
+        try:
+            return json.loads(data)
+        except TypeError:
+            # Python 3.5 and earlier versions only accept text
+            return json.loads(data.decode('utf-8'))
+
+
+class OrjsonBackend(JSONBackend):
+    """The JSON backend based on `orjson`. The datetime, date and time
+    objects and the dataclass instances, which `orjson` serializes
+    natively, are passed to the type encoders instead, so that they are
+    serialized the same way by all backends.
+
+    The objects that `orjson` cannot serialize (e.g. named tuples and
+    integers beyond 64 bits) are serialized by the standard library
+    instead. Note that `orjson` serializes NaN and infinite floats as
+    `null`, unlike the standard library.
+    """
+
+    name = 'orjson'
+
+    def __init__(self, *args, **kwargs):
+        super(OrjsonBackend, self).__init__(*args, **kwargs)
+        import orjson
+        self.orjson = orjson
+        self.option = (orjson.OPT_NON_STR_KEYS |
+                       orjson.OPT_PASSTHROUGH_DATETIME |
+                       orjson.OPT_PASSTHROUGH_DATACLASS)
+        self.fallback = StdlibBackend(self.encoders)
+
+    def dumps(self, obj):
+        try:
+            return self.orjson.dumps(obj, default=self.encoders.default,
+                                     option=self.option)
+        except TypeError:
+            return self.fallback.dumps(obj)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class UjsonBackend(JSONBackend):
+    """The JSON backend based on `ujson` (version 5.0 or later). The
+    objects that `ujson` cannot serialize (e.g. integers beyond 64 bits)
+    are serialized by the standard library instead.
+    """
+
+    name = 'ujson'
+
+    def __init__(self, *args, **kwargs):
+        super(UjsonBackend, self).__init__(*args, **kwargs)
+        import ujson
+        self.ujson = ujson
+        self.fallback = StdlibBackend(self.encoders)
+
+    def dumps(self, obj):
+        try:
+            data = self.ujson.dumps(obj, ensure_ascii=False,
+                                    escape_forward_slashes=False,
+                                    default=self.encoders.default)
+        except (TypeError, OverflowError):
+            return self.fallback.dumps(obj)
+        return data.encode('utf-8')
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+
+#: The available backend classes, in order of preference.
+BACKEND_CLASSES = (OrjsonBackend, UjsonBackend, StdlibBackend)
+
+
+def get_backend(name=None):
+    """Return a JSON backend object.
+
+    :param name: the name of the preferred backend, which must be
+                 `'auto'`, `'orjson'`, `'ujson'` or `'json'`. If the
+                 preferred backend is not installed, the first installed
+                 one in :data:`BACKEND_CLASSES` is used instead, and the
+                 standard library is always available. If not specified,
+                 the `JSON_BACKEND` configuration option will be used.
+    """
+    name = name or config.JSON_BACKEND
+    names = [backend_class.name for backend_class in BACKEND_CLASSES]
+    assert name in names + ['auto'], \
+        'JSON backend must be one of %s' % str(tuple(names + ['auto']))
+
+    backend_classes = [
+        backend_class for backend_class in BACKEND_CLASSES
+        if backend_class.name == name
+    ] + list(BACKEND_CLASSES)
+    for backend_class in backend_classes:
+        try:
+            return backend_class()
+        except ImportError:
+            continue
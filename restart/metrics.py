@@ -0,0 +1,859 @@
+from __future__ import absolute_import
+
+import errno
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock, current_thread, local
+
+from six import iteritems
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from . import timing
+from .config import config
+from .resource import Resource
+from .response import Response
+from .utils import locked_cached_property
+
+#: The default upper bounds (in seconds) of the buckets of latency
+#: histograms.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+#: The content type of the Prometheus text exposition format.
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The layout of the metrics files of :class:`MmapStore`: a header with
+# the number of bytes used, followed by entries, each of which is the
+# length of a JSON-encoded key, the number of values, the key, and the
+# 8-byte aligned values. The key is the shard ID, the name, the labels
+# and whether the series is live (i.e. dropped with its process)
+_USED = struct.Struct('<Q')
+_ENTRY = struct.Struct('<II')
+_VALUE = struct.Struct('<d')
+_INITIAL_FILE_SIZE = 64 * 1024
+_FILENAME_RE = re.compile(r'^metrics-(\d+)\.db$')
+_RETIRED_FILENAME = 'metrics-retired.json'
+_LOCK_FILENAME = 'metrics.lock'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def _escape_label_value(value):
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, _escape_label_value(str(value)))
+        for name, value in zip(names, values)
+    )
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+def _merge(totals, key, values):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(values)
+    else:
+        for i, value in enumerate(values):
+            total[i] += value
+
+
+def _group_by_name(totals):
+    collected = {}
+    for (name, labels), values in iteritems(totals):
+        collected.setdefault(name, {})[labels] = values
+    return collected
+
+
+class _Shard(dict):
+    """The series recorded by one thread into a :class:`MemoryStore`."""
+
+    def add_series(self, key, size, live=False):
+        series = self[key] = [0] * size
+        return series
+
+
+class MemoryStore(object):
+    """Store the values of metrics in the memory of the process, without
+    locks: each thread records into its own shard, and the shards are
+    summed when the values are collected. The shards of finished threads
+    are folded into the collected values, so short-lived threads do not
+    make collecting slower.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._local = local()
+        self._shards = []
+        self._retired = {}
+
+    def get_shard(self):
+        """Return the shard of the current thread: a dictionary mapping
+        `(name, labels)` tuples to the mutable sequences of the values
+        of series, whose `add_series(key, size, live=False)` method adds
+        a series of `size` zero values. The values of live series (e.g.
+        gauges) are only meaningful while the recording process lives.
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self.lock:
+                self._shards.append((current_thread(), shard))
+            return shard
+
+    def collect(self):
+        """Return a dictionary mapping the names of metrics to
+        dictionaries, which map tuples of label values to the lists of
+        the values of series, summed over all shards.
+        """
+        with self.lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                    continue
+                # The thread does not record any more
+                for key, values in iteritems(shard):
+                    _merge(self._retired, key, values)
+            self._shards = alive
+
+            totals = dict((key, list(values))
+                          for key, values in iteritems(self._retired))
+            for _, shard in alive:
+                # Copying a dictionary is atomic in CPython, so it does
+                # not race with the thread inserting new series
+                for key, values in iteritems(shard.copy()):
+                    _merge(totals, key, values)
+        return _group_by_name(totals)
+
+
+class _MetricsFile(object):
+    """The memory-mapped metrics file of a process. Entries are only
+    appended, and the header is updated once an entry is written, so
+    other processes can read the file at any time.
+    """
+
+    def __init__(self, path):
+        self.lock = Lock()
+        # Any existing file was left by a dead process with the same PID
+        self._file = open(path, 'w+b')
+        self._size = _INITIAL_FILE_SIZE
+        self._file.truncate(self._size)
+        self.mmap = mmap.mmap(self._file.fileno(), self._size)
+        self._used = _USED.size
+        _USED.pack_into(self.mmap, 0, self._used)
+        self._offsets = {}
+        self._old_mmaps = []
+
+    def allocate(self, key, size):
+        """Return the offset of the `size` values of `key`, adding an
+        entry for it if needed.
+        """
+        with self.lock:
+            offset = self._offsets.get(key)
+            if offset is not None:
+                return offset
+            data = json.dumps(key).encode('utf-8')
+            start = self._used + _ENTRY.size
+            offset = start + len(data)
+            offset += -offset % 8
+            used = offset + _VALUE.size * size
+            while used > self._size:
+                self._grow()
+            self.mmap[start:start + len(data)] = data
+            for i in range(size):
+                _VALUE.pack_into(self.mmap, offset + _VALUE.size * i, 0.0)
+            _ENTRY.pack_into(self.mmap, self._used, len(data), size)
+            _USED.pack_into(self.mmap, 0, used)
+            self._used = used
+            self._offsets[key] = offset
+            return offset
+
+    def _grow(self):
+        # Other threads may still write through the old mapping, which
+        # shares its pages with the new one, so it is kept open
+        self._old_mmaps.append(self.mmap)
+        self._size *= 2
+        self._file.truncate(self._size)
+        self.mmap = mmap.mmap(self._file.fileno(), self._size)
+
+
+def _read_metrics_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _USED.size:
+        return []
+    used = min(_USED.unpack_from(data, 0)[0], len(data))
+    entries = []
+    position = _USED.size
+    while position < used:
+        length, size = _ENTRY.unpack_from(data, position)
+        start = position + _ENTRY.size
+        key = json.loads(data[start:start + length].decode('utf-8'))
+        offset = start + length
+        offset += -offset % 8
+        values = struct.unpack_from('<%dd' % size, data, offset)
+        entries.append((key, values))
+        position = offset + _VALUE.size * size
+    return entries
+
+
+class _MmapSeries(object):
+    """The values of a series in the metrics file of a process."""
+
+    __slots__ = ('file', 'offsets')
+
+    def __init__(self, metrics_file, offset, size):
+        self.file = metrics_file
+        self.offsets = [offset + _VALUE.size * i for i in range(size)]
+
+    def __getitem__(self, index):
+        return _VALUE.unpack_from(self.file.mmap, self.offsets[index])[0]
+
+    def __setitem__(self, index, value):
+        _VALUE.pack_into(self.file.mmap, self.offsets[index], value)
+
+
+class _MmapShard(dict):
+    """The series of one thread in the metrics file of its process. The
+    values of each series are only written by the thread owning it.
+    """
+
+    def __init__(self, metrics_file, shard_id, pid):
+        super(_MmapShard, self).__init__()
+        self.file = metrics_file
+        self.id = shard_id
+        self.pid = pid
+
+    def add_series(self, key, size, live=False):
+        offset = self.file.allocate((self.id,) + key + (live,), size)
+        series = self[key] = _MmapSeries(self.file, offset, size)
+        return series
+
+
+class MmapStore(object):
+    """Store the values of metrics in memory-mapped files, one per
+    process, in `directory`, so that the values can be collected across
+    all the worker processes of a service.
+
+    Each thread of a process records into its own series in the file
+    without locks (the series of finished threads are reused by new
+    threads). Collecting the values sums the files of all live
+    processes. The files of dead ones are removed, once the values of
+    their counters and histograms are merged into a file of retired
+    values, so that those values never go backwards (the values of
+    gauges are dropped). Since the liveness of processes is checked with
+    signals, dead processes are only detected on POSIX systems.
+
+    :param directory: the directory of the metrics files, which is
+                      created if needed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = Lock()
+        self._local = local()
+        self._pid = None
+        self._file = None
+        self._owners = []
+        self._free_ids = []
+        self._next_id = 0
+
+    def get_path(self, pid):
+        """Return the path of the metrics file of the process `pid`."""
+        return os.path.join(self.directory, 'metrics-%d.db' % pid)
+
+    def _get_file(self, pid):
+        if self._pid != pid:
+            # The first use in this process (which may have been forked
+            # from a process using the store already)
+            if not os.path.isdir(self.directory):
+                try:
+                    os.makedirs(self.directory)
+                except OSError:
+                    if not os.path.isdir(self.directory):
+                        raise
+            path = self.get_path(pid)
+            if os.path.exists(path):
+                # Left by a dead process with the same PID
+                with self._lock_directory():
+                    self._retire([path])
+            self._file = _MetricsFile(path)
+            self._pid = pid
+            self._owners = []
+            self._free_ids = []
+            self._next_id = 0
+        return self._file
+
+    def get_shard(self):
+        """Return the shard of the current thread. See
+        :meth:`MemoryStore.get_shard`.
+        """
+        pid = os.getpid()
+        shard = getattr(self._local, 'shard', None)
+        if shard is not None and shard.pid == pid:
+            return shard
+        with self.lock:
+            metrics_file = self._get_file(pid)
+            alive = []
+            for thread, shard_id in self._owners:
+                if thread.is_alive():
+                    alive.append((thread, shard_id))
+                else:
+                    self._free_ids.append(shard_id)
+            self._owners = alive
+            if self._free_ids:
+                shard_id = self._free_ids.pop()
+            else:
+                shard_id = self._next_id
+                self._next_id += 1
+            self._owners.append((current_thread(), shard_id))
+        shard = self._local.shard = _MmapShard(metrics_file, shard_id, pid)
+        return shard
+
+    def _lock_directory(self):
+        """Return a lock file, which excludes the other processes from
+        the files of the directory until it is closed.
+        """
+        lock_file = open(os.path.join(self.directory, _LOCK_FILENAME), 'ab')
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return lock_file
+
+    def _read_retired(self):
+        try:
+            with open(os.path.join(self.directory, _RETIRED_FILENAME),
+                      'rb') as f:
+                entries = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError):
+            return {}
+        return dict(((name, tuple(labels)), values)
+                    for name, labels, values in entries)
+
+    def _retire(self, paths):
+        """Merge the values of the counters and histograms in the files
+        of dead processes into the retired values, and remove the files.
+        The directory must be locked.
+        """
+        retired = self._read_retired()
+        for path in paths:
+            try:
+                entries = _read_metrics_file(path)
+            except (IOError, OSError):
+                # Retired by another process
+                continue
+            for (_, name, labels, live), values in entries:
+                if not live:
+                    _merge(retired, (name, tuple(labels)), values)
+
+        data = json.dumps([[name, labels, values] for (name, labels), values
+                           in iteritems(retired)]).encode('utf-8')
+        fd, temp_path = tempfile.mkstemp(prefix='.', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(temp_path,
+                      os.path.join(self.directory, _RETIRED_FILENAME))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def collect(self):
+        """Return the values summed over the files of all live processes
+        and the retired values. See :meth:`MemoryStore.collect`.
+        """
+        if not os.path.isdir(self.directory):
+            return {}
+        pid = os.getpid()
+        with self.lock, self._lock_directory():
+            paths = []
+            dead_paths = []
+            for filename in os.listdir(self.directory):
+                match = _FILENAME_RE.match(filename)
+                if match is None:
+                    continue
+                path = os.path.join(self.directory, filename)
+                file_pid = int(match.group(1))
+                if file_pid != pid and not _is_alive(file_pid):
+                    dead_paths.append(path)
+                else:
+                    paths.append(path)
+            if dead_paths:
+                self._retire(dead_paths)
+
+            totals = self._read_retired()
+            for path in paths:
+                try:
+                    entries = _read_metrics_file(path)
+                except (IOError, OSError):
+                    continue
+                for (_, name, labels, _), values in entries:
+                    _merge(totals, (name, tuple(labels)), values)
+
+        for values in totals.values():
+            for i, value in enumerate(values):
+                if value.is_integer():
+                    values[i] = int(value)
+        return _group_by_name(totals)
+
+
+class Metric(object):
+    """The base class of metrics, whose values are recorded without
+    locks into a store (see :class:`MemoryStore` and
+    :class:`MmapStore`).
+
+    :param name: the name of the metric.
+    :param documentation: the help text of the metric.
+    :param labelnames: the names of the labels of the metric. The
+                       values of the labels are passed as a tuple (in the
+                       same order) when recording.
+    :param store: the store of the values. If not specified, a new
+                  :class:`MemoryStore` will be used.
+    """
+
+    #: The Prometheus type of the metric.
+    type = None
+
+    # The number of values of a series
+    _size = 1
+
+    # Whether the values of a series are dropped with the process
+    # recording them (see :class:`MmapStore`)
+    _live = False
+
+    def __init__(self, name, documentation, labelnames=(), store=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.store = MemoryStore() if store is None else store
+
+    def _get_series(self, labels):
+        shard = self.store.get_shard()
+        key = (self.name, labels)
+        series = shard.get(key)
+        if series is None:
+            series = shard.add_series(key, self._size, self._live)
+        return series
+
+    def touch(self, labels=()):
+        """Make the series of `labels` exported (with zero values) even
+        if nothing has been recorded for it.
+
+        :param labels: the tuple of label values.
+        """
+        self._get_series(labels)
+
+    def collect(self, samples=None):
+        """Return a dictionary mapping tuples of label values to the
+        values summed over all threads (and processes, depending on the
+        store).
+
+        :param samples: the values of the metric collected from the
+                        store. If not specified, they will be collected.
+        """
+        if samples is None:
+            samples = self.store.collect().get(self.name, {})
+        return dict((labels, values[0])
+                    for labels, values in iteritems(samples))
+
+    def expose(self, samples=None):
+        """Return the lines of the metric samples in the Prometheus text
+        exposition format.
+
+        :param samples: see :meth:`collect`.
+        """
+        return [
+            '%s%s %s' % (self.name, _format_labels(self.labelnames, labels),
+                         _format_value(value))
+            for labels, value in sorted(iteritems(self.collect(samples)))
+        ]
+
+
+class Counter(Metric):
+    """A metric whose values only go up (e.g. the number of requests).
+    See :class:`Metric` for the meanings of the parameters.
+    """
+
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        """Increase the value of the series of `labels` by `amount`.
+
+        :param labels: the tuple of label values.
+        :param amount: a non-negative amount.
+        """
+        self._get_series(labels)[0] += amount
+
+
+class Gauge(Metric):
+    """A metric whose values go up and down (e.g. the number of requests
+    in progress). Since the values are sharded per thread, a gauge can
+    only be changed by relative amounts. See :class:`Metric` for the
+    meanings of the parameters.
+    """
+
+    type = 'gauge'
+
+    _live = True
+
+    def inc(self, labels=(), amount=1):
+        """Increase the value of the series of `labels` by `amount`.
+
+        :param labels: the tuple of label values.
+        :param amount: the amount.
+        """
+        self._get_series(labels)[0] += amount
+
+    def dec(self, labels=(), amount=1):
+        """Decrease the value of the series of `labels` by `amount`.
+
+        :param labels: the tuple of label values.
+        :param amount: the amount.
+        """
+        self._get_series(labels)[0] -= amount
+
+
+class Histogram(Metric):
+    """A metric which counts observed values (e.g. request durations) in
+    fixed buckets, and also records their count and sum.
+
+    :param name: the name of the metric.
+    :param documentation: the help text of the metric.
+    :param labelnames: the names of the labels of the metric.
+    :param buckets: the upper bounds of the buckets, in increasing order.
+                    The `+Inf` bucket is always added.
+    :param store: the store of the values.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, store=None):
+        super(Histogram, self).__init__(name, documentation, labelnames,
+                                        store)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        # The values of a series are the non-cumulative bucket counts
+        # (with the `+Inf` bucket), the sum and the count
+        self._size = len(self.buckets) + 3
+
+    def observe(self, value, labels=()):
+        """Record `value` in the series of `labels`.
+
+        :param value: the observed value.
+        :param labels: the tuple of label values.
+        """
+        counts = self._get_series(labels)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def collect(self, samples=None):
+        """Return a dictionary mapping tuples of label values to lists of
+        the non-cumulative bucket counts (with the `+Inf` bucket), the
+        sum and the count. See :meth:`Metric.collect`.
+        """
+        if samples is None:
+            samples = self.store.collect().get(self.name, {})
+        return dict((labels, list(values))
+                    for labels, values in iteritems(samples))
+
+    def quantile(self, q, labels=(), samples=None):
+        """Estimate the `q` quantile (e.g. `0.99`) of the series of
+        `labels`, by interpolating linearly within its bucket (as the
+        `histogram_quantile` function of Prometheus does). Return
+        :attr:`None` if nothing has been observed.
+
+        :param q: the quantile, from 0 to 1.
+        :param labels: the tuple of label values.
+        :param samples: see :meth:`Metric.collect`.
+        """
+        counts = self.collect(samples).get(labels)
+        if not counts or not counts[-1]:
+            return None
+        rank = q * counts[-1]
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        # In the `+Inf` bucket
+        return self.buckets[-1]
+
+    def expose(self, samples=None):
+        lines = []
+        labelnames = self.labelnames + ('le',)
+        bounds = self.buckets + (float('inf'),)
+        for labels, value in sorted(iteritems(self.collect(samples))):
+            cumulative = 0
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    self.name,
+                    _format_labels(labelnames,
+                                   labels + (_format_value(bound),)),
+                    cumulative
+                ))
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append('%s_sum%s %s' % (self.name, suffix,
+                                          _format_value(float(value[-2]))))
+            lines.append('%s_count%s %d' % (self.name, suffix, value[-1]))
+        return lines
+
+
+class MetricsRegistry(object):
+    """A collection of metrics, which can be exported in the Prometheus
+    text exposition format.
+
+    :param store: the store of the values of the metrics created by the
+                  registry. If not specified, a :class:`MmapStore` will
+                  be used if the `METRICS_DIR` configuration option is
+                  set (so that the metrics are collected across worker
+                  processes), or a :class:`MemoryStore` otherwise.
+    """
+
+    def __init__(self, store=None):
+        self.lock = Lock()
+        self._metrics = OrderedDict()
+        if store is not None:
+            self.store = store
+
+    @locked_cached_property
+    def store(self):
+        if config.METRICS_DIR is not None:
+            return MmapStore(config.METRICS_DIR)
+        return MemoryStore()
+
+    def register(self, metric):
+        """Register `metric`, and return it. If a metric with the same
+        name is registered already, it is returned instead, provided
+        that it has the same type and labels.
+
+        :param metric: the :class:`Metric` object.
+        """
+        with self.lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if (type(existing) is not type(metric) or
+                existing.labelnames != metric.labelnames):
+            raise ValueError('Metric `%s` is already registered with a '
+                             'different type or labels' % metric.name)
+        return existing
+
+    def counter(self, name, documentation, labelnames=()):
+        """Register and return a :class:`Counter`."""
+        return self.register(Counter(name, documentation, labelnames,
+                                     self.store))
+
+    def gauge(self, name, documentation, labelnames=()):
+        """Register and return a :class:`Gauge`."""
+        return self.register(Gauge(name, documentation, labelnames,
+                                   self.store))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=DEFAULT_BUCKETS):
+        """Register and return a :class:`Histogram`."""
+        return self.register(Histogram(name, documentation, labelnames,
+                                       buckets, self.store))
+
+    def get(self, name):
+        """Return the metric named `name`, or :attr:`None`."""
+        return self._metrics.get(name)
+
+    def expose(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self.lock:
+            metrics = list(self._metrics.values())
+        # Collect each store once, since collecting a `MmapStore` reads
+        # the files of all processes
+        collected = {}
+        lines = []
+        for metric in metrics:
+            values = collected.get(id(metric.store))
+            if values is None:
+                values = collected[id(metric.store)] = metric.store.collect()
+            lines.append('# HELP %s %s' % (
+                metric.name,
+                metric.documentation.replace('\\', '\\\\')
+                .replace('\n', '\\n')
+            ))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            lines.extend(metric.expose(values.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+#: The default registry.
+default_registry = MetricsRegistry()
+
+
+class RequestMetrics(object):
+    """A timing subscriber (see :func:`restart.timing.subscribe`), which
+    records the following metrics of requests, labelled by endpoint:
+
+    - `restart_requests_total`: the number of requests, by endpoint,
+      method and status code.
+    - `restart_request_errors_total`: the number of requests answered
+      with 4xx or 5xx status codes, by endpoint and status code.
+    - `restart_requests_in_flight`: the number of requests in progress.
+    - `restart_request_duration_seconds`: a histogram of the durations
+      of requests, until their responses are ready to be sent.
+
+    The requests matching no URI rule (answered with 404 or 405 by the
+    router) are recorded under the endpoint
+    :data:`~restart.timing.UNROUTED_ENDPOINT` (`-`).
+
+    :param registry: the :class:`MetricsRegistry` object. If not
+                     specified, :data:`default_registry` will be used.
+    :param api: the RESTArt API. If specified, the series of all its
+                endpoints are exported from the start.
+    :param buckets: the buckets of the latency histogram.
+    """
+
+    def __init__(self, registry=None, api=None, buckets=DEFAULT_BUCKETS):
+        if registry is None:
+            registry = default_registry
+        self.requests = registry.counter(
+            'restart_requests_total', 'The number of requests.',
+            ('endpoint', 'method', 'status')
+        )
+        self.errors = registry.counter(
+            'restart_request_errors_total',
+            'The number of requests answered with 4xx or 5xx status codes.',
+            ('endpoint', 'status')
+        )
+        self.in_flight = registry.gauge(
+            'restart_requests_in_flight',
+            'The number of requests in progress.', ('endpoint',)
+        )
+        self.latency = registry.histogram(
+            'restart_request_duration_seconds',
+            'The durations of requests in seconds.', ('endpoint',), buckets
+        )
+        if api is not None:
+            self.touch(api)
+
+    def touch(self, api):
+        """Export the series of all endpoints of `api` from the start.
+
+        :param api: the RESTArt API.
+        """
+        for endpoint in api.rules:
+            self.in_flight.touch((endpoint,))
+            self.latency.touch((endpoint,))
+
+    def start(self, timer):
+        """Count the routed request in progress."""
+        self.in_flight.inc((timer.endpoint,))
+
+    def __call__(self, timer):
+        """Record the finished request."""
+        endpoint = timer.endpoint
+        status = str(timer.status_code)
+        self.in_flight.dec((endpoint,))
+        self.requests.inc((endpoint, timer.method, status))
+        if timer.status_code >= 400:
+            self.errors.inc((endpoint, status))
+        self.latency.observe(timer.total, (endpoint,))
+
+
+class MetricsResource(Resource):
+    """The resource exporting the metrics of :attr:`registry` in the
+    Prometheus text exposition format. See :func:`enable_metrics`.
+    """
+
+    name = 'metrics'
+
+    #: The :class:`MetricsRegistry` object. If :attr:`None`,
+    #: :data:`default_registry` will be used.
+    registry = None
+
+    auto_etag = False
+    cache_ttl = 0
+
+    def read(self, request):
+        registry = self.registry or default_registry
+        response = Response(registry.expose().encode('utf-8'), 200,
+                            {'Content-Type': CONTENT_TYPE})
+        response.is_rendered = True
+        return response
+
+
+# The :class:`RequestMetrics` objects subscribed by `enable_metrics`, by
+# registry
+_enabled = weakref.WeakKeyDictionary()
+_enabled_lock = Lock()
+
+
+def enable_metrics(api, uri='/metrics', registry=None):
+    """Record the metrics of the requests to `api` (see
+    :class:`RequestMetrics`), and export them through a
+    :class:`MetricsResource` registered at `uri`. Example::
+
+        from restart.api import RESTArt
+        from restart.metrics import enable_metrics
+
+        api = RESTArt()
+        ...
+        enable_metrics(api)
+
+    Return the :class:`RequestMetrics` object, which is subscribed to
+    the timers of requests (see :func:`restart.timing.subscribe`). It is
+    created once per registry, so that calling this function again (e.g.
+    for another API) does not record the requests twice.
+
+    :param api: the RESTArt API.
+    :param uri: the URI of the metrics resource.
+    :param registry: the :class:`MetricsRegistry` object. If not
+                     specified, :data:`default_registry` will be used.
+    """
+    if registry is None:
+        registry = default_registry
+    if MetricsResource.name not in api.rules:
+        resource_class = type('MetricsResource', (MetricsResource,),
+                              {'registry': registry})
+        api.route(resource_class, uri=uri, methods=['GET'])
+    with _enabled_lock:
+        metrics = _enabled.get(registry)
+        if metrics is None:
+            metrics = _enabled[registry] = RequestMetrics(registry, api)
+        else:
+            metrics.touch(api)
+        timing.subscribe(metrics)
+    return metrics
@@ -3,10 +3,111 @@ from __future__ import absolute_import
 from werkzeug.http import parse_options_header
 
 from . import exceptions
+from .utils import BoundedCache
 
 
 class Negotiator(object):
-    """The class used to select the proper parser and renderer."""
+    """The class used to select the proper parser and renderer.
+
+    A negotiator object is meant to be shared across requests. For each
+    tuple of parser classes (or renderer classes), it precomputes a lookup
+    dictionary on first use, and it memoizes the classes selected for the
+    raw Content-Type (or Accept) strings in bounded caches.
+    """
+
+    #: The maximum number of raw Content-Type (or Accept) strings
+    #: memoized for each tuple of parser (or renderer) classes.
+    cache_size = 128
+
+    def __init__(self):
+        self._parser_tables = {}
+        self._renderer_tables = {}
+        self._accept_cache = BoundedCache(self.cache_size)
+
+    def _get_table(self, tables, classes, make_table):
+        try:
+            return tables[classes]
+        except KeyError:
+            table = tables[classes] = make_table(classes)
+            return table
+        except TypeError:
+            # Unhashable classes (e.g. a list) can not be cached
+            return make_table(classes)
+
+    def _make_parser_table(self, parser_classes):
+        by_content_type = {}
+        for parser_class in parser_classes:
+            by_content_type.setdefault(parser_class.content_type,
+                                       parser_class)
+        return by_content_type, BoundedCache(self.cache_size)
+
+    def _make_renderer_table(self, renderer_classes):
+        by_format_suffix = {}
+        for renderer_class in renderer_classes:
+            by_format_suffix.setdefault(renderer_class.format_suffix,
+                                        renderer_class)
+        return by_format_suffix, BoundedCache(self.cache_size)
+
+    def parse_accept(self, accept):
+        """Parse the Accept header into a list of `(mimetype, quality)`
+        media ranges. The result is memoized for each distinct `accept`
+        string in a bounded cache.
+
+        :param accept: the value of the Accept header.
+        """
+        media_ranges = self._accept_cache.get(accept)
+        if media_ranges is not None:
+            return media_ranges
+
+        media_ranges = []
+        for item in accept.split(','):
+            mimetype, options = parse_options_header(item)
+            if not mimetype:
+                continue
+            if mimetype == '*':
+                mimetype = '*/*'
+            try:
+                quality = min(max(float(options.get('q', 1)), 0), 1)
+            except ValueError:
+                quality = 1
+            media_ranges.append((mimetype.lower(), quality))
+
+        self._accept_cache.set(accept, media_ranges)
+        return media_ranges
+
+    def _get_quality(self, media_ranges, content_type):
+        """Return the quality of `content_type`, which is the quality of
+        the most specific media range matching it, or :attr:`None` if no
+        media range matches it.
+        """
+        main_type = content_type.split('/', 1)[0] + '/*'
+        best = None
+        for mimetype, quality in media_ranges:
+            if mimetype == content_type:
+                specificity = 2
+            elif mimetype == main_type:
+                specificity = 1
+            elif mimetype == '*/*':
+                specificity = 0
+            else:
+                continue
+            if best is None or specificity > best[0]:
+                best = (specificity, quality)
+        return best and best[1]
+
+    def _select_by_accept(self, renderer_classes, accept):
+        media_ranges = self.parse_accept(accept)
+        if not media_ranges:
+            return renderer_classes[0] if renderer_classes else None
+
+        selected, selected_quality = None, 0
+        for renderer_class in renderer_classes:
+            quality = self._get_quality(media_ranges,
+                                        renderer_class.content_type.lower())
+            # On ties, prefer the renderer class listed first
+            if quality and quality > selected_quality:
+                selected, selected_quality = renderer_class, quality
+        return selected
 
     def select_parser(self, parser_classes, content_type):
         """Select the proper parser class.
@@ -14,38 +115,70 @@ class Negotiator(object):
         :param parser_classes: the parser classes to select from.
         :param content_type: the target content type.
         """
-        content_type, _ = parse_options_header(content_type)
+        by_content_type, cache = self._get_table(
+            self._parser_tables, parser_classes, self._make_parser_table
+        )
 
-        for parser_class in parser_classes:
-            if parser_class.content_type == content_type:
-                return parser_class
+        parser_class = cache.get(content_type)
+        if parser_class is not None:
+            return parser_class
 
-        raise exceptions.UnsupportedMediaType(
-            'Unsupported content type "%s" in request' % content_type
-        )
+        mimetype, options = parse_options_header(content_type)
+        parser_class = by_content_type.get(mimetype)
+        if parser_class is None:
+            raise exceptions.UnsupportedMediaType(
+                'Unsupported content type "%s" in request' % mimetype
+            )
+
+        # Multipart boundaries are unique per request, so there is no
+        # point in caching them
+        if 'boundary' not in options:
+            cache.set(content_type, parser_class)
+        return parser_class
 
-    def select_renderer(self, renderer_classes, format_suffix):
+    def select_renderer(self, renderer_classes, format_suffix, accept=None):
         """Select the proper renderer class.
 
-        Note:
-            For simplicity, the content-negotiation here is only based
-            on the format suffix specified in the request uri. The more
-            standard (and also complex) Accept header is ignored.
+        The format suffix specified in the request uri takes precedence
+        over the Accept header. If neither is specified, the first
+        renderer class is selected.
 
         :param renderer_classes: the renderer classes to select from.
         :param format_suffix: the format suffix of the request uri.
+        :param accept: the value of the Accept header of the request.
         """
-        # If no format suffix is specified, select the first renderer
+        if format_suffix:
+            by_format_suffix, _ = self._get_table(
+                self._renderer_tables, renderer_classes,
+                self._make_renderer_table
+            )
+            try:
+                return by_format_suffix[format_suffix]
+            except KeyError:
+                raise exceptions.NotFound(
+                    'The requested resource with format '
+                    '".%s" is not found' % format_suffix
+                )
+
+        # If no Accept header is specified, select the first renderer
         # class (if provided), or raise a NotAcceptable error.
-        if not format_suffix:
+        if not accept:
             if renderer_classes:
                 return renderer_classes[0]
             else:
                 raise exceptions.NotAcceptable()
 
-        for renderer_class in renderer_classes:
-            if renderer_class.format_suffix == format_suffix:
-                return renderer_class
-
-        raise exceptions.NotFound('The requested resource with format '
-                                  '".%s" is not found' % format_suffix)
+        _, cache = self._get_table(
+            self._renderer_tables, renderer_classes,
+            self._make_renderer_table
+        )
+        renderer_class = cache.get(accept)
+        if renderer_class is None:
+            renderer_class = self._select_by_accept(renderer_classes, accept)
+            if renderer_class is None:
+                raise exceptions.NotAcceptable(
+                    'None of the media types in the Accept header '
+                    '"%s" is available' % accept
+                )
+            cache.set(accept, renderer_class)
+        return renderer_class
@@ -1,13 +1,16 @@
 from __future__ import absolute_import
 
-import json
+import re
 
-from werkzeug.formparser import MultiPartParser as WerkzeugMultiPartParser
-from werkzeug.formparser import default_stream_factory
+from werkzeug.datastructures import Headers
 from werkzeug.http import parse_options_header
 from werkzeug.urls import url_decode_stream
+from werkzeug.utils import import_string
 
-from .exceptions import BadRequest
+from .config import config
+from .exceptions import BadRequest, RequestEntityTooLarge
+from .json_backends import get_backend
+from .utils import locked_cached_classproperty
 
 
 class Parser(object):
@@ -34,6 +37,13 @@ class JSONParser(Parser):
     #: The content type bound to this parser.
     content_type = 'application/json'
 
+    @locked_cached_classproperty(name='_backend')
+    def backend(cls):
+        """The JSON backend specified by the `JSON_BACKEND` configuration
+        option. See :func:`~restart.json_backends.get_backend`.
+        """
+        return get_backend()
+
     def parse(self, stream, content_type, content_length, context=None):
         """Parse the `stream` as JSON.
 
@@ -43,22 +53,408 @@ class JSONParser(Parser):
         :param context: a dictionary containing extra context data
                         that can be useful for parsing.
         """
-        data = stream.read().decode('utf-8')
+        # The bytes are passed to the decoder directly
+        data = stream.read()
         try:
-            return json.loads(data)
+            return self.backend.loads(data)
         except ValueError:
             raise BadRequest('JSON data is invalid')
 
 
+_JSON_STRING = br'"[^"\\]*(?:\\.[^"\\]*)*"'
+
+
+def _make_run_regex(levels):
+    """Make a regular expression which matches a run of bytes without any
+    structural character outside of strings and containers. Complete
+    strings, and complete containers nested up to `levels` deep, are
+    skipped as a whole.
+    """
+    body = br'(?:[^"\[\]{}]|' + _JSON_STRING + br')*'
+    for _ in range(levels - 1):
+        body = (br'(?:[^"\[\]{}]|' + _JSON_STRING +
+                br'|[\[{]' + body + br'[\]}])*')
+    if levels:
+        run = (br'(?:[^"\[\]{},]|' + _JSON_STRING +
+               br'|[\[{]' + body + br'[\]}])*')
+    else:
+        run = br'(?:[^"\[\]{},]|' + _JSON_STRING + br')*'
+    return re.compile(run)
+
+
+class _JSONScanner(object):
+    """An incremental scanner that tracks the structure of a JSON document
+    fed in chunks, without decoding it. It enforces the nesting depth and
+    string length limits, and optionally splits the top-level array into
+    the raw bytes of its items.
+
+    Brackets are only matched at the levels tracked by the scanner, since
+    the nested containers skipped by :attr:`run_regexes` are validated
+    when the raw bytes are decoded.
+    """
+
+    #: The regular expressions made by :func:`_make_run_regex`, indexed
+    #: by the number of levels that can be skipped.
+    run_regexes = [_make_run_regex(levels) for levels in range(9)]
+    string_re = re.compile(_JSON_STRING)
+    closers = {b'[': b']', b'{': b'}'}
+
+    def __init__(self, max_depth, max_string_length, split_array=False):
+        self.max_depth = max_depth
+        self.max_string_length = max_string_length
+        self.split_array = split_array
+        self.stack = []
+        self.closed = False
+        self.count = 0
+        self.tail = b''
+        self.pending = []
+
+    def _check_strings(self, data, start, end):
+        # The run is long, so check the length of each string in it
+        for match in self.string_re.finditer(data, start, end):
+            if match.end() - match.start() - 2 > self.max_string_length:
+                raise BadRequest('JSON string is too long')
+
+    def _emit(self, items, data, start, end, last=False):
+        self.pending.append(data[start:end])
+        item = b''.join(self.pending)
+        self.pending = []
+        if item.strip():
+            items.append(item)
+            self.count += 1
+        elif not last or self.count:
+            raise BadRequest('JSON data is invalid')
+
+    def feed(self, chunk):
+        """Scan `chunk`, and return a list of the raw items of the
+        top-level array completed in it (if splitting is enabled).
+        """
+        if self.closed:
+            if chunk.strip():
+                raise BadRequest('JSON data is invalid')
+            return []
+
+        data = self.tail + chunk if self.tail else chunk
+        self.tail = b''
+        items = []
+        pos = start = 0
+        end = len(data)
+        split_array = self.split_array
+        stack = self.stack
+        run_regexes = self.run_regexes
+        max_levels = len(run_regexes) - 1
+        while True:
+            # Skip as many levels as the remaining depth allows, except
+            # for the top-level array to be split
+            if split_array and not stack:
+                levels = 0
+            else:
+                levels = min(max_levels, self.max_depth - len(stack))
+            run_end = run_regexes[levels].match(data, pos).end()
+            if run_end - pos > self.max_string_length:
+                self._check_strings(data, pos, run_end)
+            if run_end == end:
+                break
+            char = data[run_end:run_end + 1]
+            if char == b'"':
+                # An incomplete string, which is scanned again along
+                # with the next chunk
+                if end - run_end > self.max_string_length + 1:
+                    raise BadRequest('JSON string is too long')
+                self.tail = data[run_end:]
+                end = run_end
+                break
+
+            pos = run_end + 1
+            if char == b',':
+                if split_array and len(stack) == 1:
+                    self._emit(items, data, start, run_end)
+                    start = pos
+            elif char in self.closers:
+                stack.append(self.closers[char])
+                if len(stack) > self.max_depth:
+                    raise BadRequest('JSON data is nested too deeply')
+                if split_array and len(stack) == 1:
+                    start = pos
+            elif not stack or stack.pop() != char:
+                raise BadRequest('JSON data is invalid')
+            elif split_array and not stack:
+                self._emit(items, data, start, run_end, last=True)
+                self.closed = True
+                if data[pos:].strip():
+                    raise BadRequest('JSON data is invalid')
+                return items
+
+        self.pending.append(data[start:end])
+        return items
+
+    def finish(self):
+        """Check that the document is complete, and return the remaining
+        raw bytes (the whole document if splitting is disabled).
+        """
+        if self.stack or self.tail or \
+                (self.split_array and not self.closed):
+            raise BadRequest('JSON data is invalid')
+        return b''.join(self.pending)
+
+
+class StreamingJSONParser(JSONParser):
+    """The parser class for JSON data, which reads the request stream in
+    chunks and enforces limits on the body size, the nesting depth and
+    the string length as early as possible (before the data is decoded).
+
+    If the payload is a top-level array, each of its items is decoded
+    separately, so the whole payload is never held in memory at once.
+    The parsed data is then an iterator which decodes the items lazily,
+    as the action consumes them (see :attr:`lazy`).
+
+    Select it for a resource through `parser_classes`::
+
+        class Imports(Resource):
+            name = 'imports'
+
+            parser_classes = (StreamingJSONParser,)
+
+            def create(self, request):
+                for row in request.data:
+                    save(row)
+
+    Exceeding the body size results in a `413 Request Entity Too Large`
+    error, and any other violation results in a `400 Bad Request` error.
+    Note that when the items are decoded lazily, these errors are raised
+    from the iteration in the action.
+    """
+
+    #: The number of bytes read from the stream at a time.
+    chunk_size = 65536
+
+    #: Whether the items of a top-level array are decoded lazily. If set
+    #: to `False`, they are decoded eagerly into a list.
+    lazy = True
+
+    #: The maximum size of the request payload in bytes. If :attr:`None`,
+    #: the `JSON_MAX_BODY_SIZE` configuration option will be used.
+    max_body_size = None
+
+    #: The maximum nesting depth of arrays and objects. If :attr:`None`,
+    #: the `JSON_MAX_DEPTH` configuration option will be used.
+    max_depth = None
+
+    #: The maximum length of a string (keys included) in bytes, as
+    #: encoded in the payload. If :attr:`None`, the
+    #: `JSON_MAX_STRING_LENGTH` configuration option will be used.
+    max_string_length = None
+
+    def _get_limit(self, name):
+        limit = getattr(self, name.lower())
+        if limit is None:
+            limit = getattr(config, 'JSON_' + name)
+        return limit
+
+    def iter_chunks(self, stream, content_length):
+        """Read the `stream` in chunks, and raise
+        :exc:`~werkzeug.exceptions.RequestEntityTooLarge` as soon as the
+        maximum body size is exceeded.
+
+        :param stream: the stream to be read.
+        :param content_length: the content length of the request payload.
+        """
+        max_body_size = self._get_limit('MAX_BODY_SIZE')
+        if content_length is not None and content_length > max_body_size:
+            raise RequestEntityTooLarge()
+
+        size = 0
+        while True:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_body_size:
+                raise RequestEntityTooLarge()
+            yield chunk
+
+    def parse(self, stream, content_type, content_length, context=None):
+        """Parse the `stream` as JSON incrementally.
+
+        :param stream: the stream to be parsed.
+        :param content_type: the content type of the request payload.
+        :param content_length: the content length of the request payload.
+        :param context: a dictionary containing extra context data
+                        that can be useful for parsing.
+        """
+        chunks = self.iter_chunks(stream, content_length)
+
+        # Peek at the first significant byte to find out whether the
+        # payload is a top-level array
+        for chunk in chunks:
+            head = chunk.lstrip()
+            if head:
+                break
+        else:
+            raise BadRequest('JSON data is invalid')
+
+        scanner = _JSONScanner(self._get_limit('MAX_DEPTH'),
+                               self._get_limit('MAX_STRING_LENGTH'),
+                               split_array=head.startswith(b'['))
+        if scanner.split_array:
+            items = self.iter_items(scanner, head, chunks)
+            return items if self.lazy else list(items)
+
+        scanner.feed(head)
+        for chunk in chunks:
+            scanner.feed(chunk)
+        return self.decode(scanner.finish())
+
+    def iter_items(self, scanner, head, chunks):
+        """Decode the items of the top-level array one by one."""
+        for raw_item in scanner.feed(head):
+            yield self.decode(raw_item)
+        for chunk in chunks:
+            for raw_item in scanner.feed(chunk):
+                yield self.decode(raw_item)
+        scanner.finish()
+
+    def decode(self, data):
+        """Decode `data` (bytes) with the JSON backend."""
+        try:
+            return self.backend.loads(data)
+        except ValueError:
+            raise BadRequest('JSON data is invalid')
+
+
+def _iter_multipart(stream, boundary, chunk_size, max_header_size):
+    """Read the multipart encoded `stream` in chunks, and generate the
+    events of its parts, in the form ``('headers', headers)``,
+    ``('data', chunk)`` or ``('end', None)``. Each part produces exactly
+    one `headers` event, any number of `data` events and one `end` event.
+
+    The body is never buffered: the content of each part is passed on as
+    soon as it is known not to contain (the beginning of) a delimiter.
+    """
+    separator = b'\r\n--' + boundary
+    keep = len(separator) - 1
+
+    # Prepend a line break, so that the first delimiter (which is not
+    # preceded by one) can be found in the same way as the others
+    buf = b'\r\n'
+    eof = False
+    in_part = False
+    need_more = True
+    while True:
+        if need_more:
+            chunk = stream.read(chunk_size)
+            if chunk:
+                buf += chunk
+            else:
+                eof = True
+
+        need_more = True
+        index = buf.find(separator)
+        if index == -1:
+            if eof:
+                raise BadRequest('Multipart data is incomplete')
+            # Keep the tail, which may be the beginning of a delimiter
+            if len(buf) > keep:
+                if in_part:
+                    yield 'data', buf[:-keep]
+                buf = buf[-keep:]
+            continue
+
+        # The rest of the delimiter line, which must be complete
+        line_start = index + len(separator)
+        line_end = buf.find(b'\r\n', line_start)
+        if buf[line_start:line_start + 2] != b'--' and line_end == -1:
+            if eof:
+                raise BadRequest('Multipart data is incomplete')
+            continue
+
+        if in_part:
+            if index:
+                yield 'data', buf[:index]
+            yield 'end', None
+        if buf[line_start:line_start + 2] == b'--':
+            # The close delimiter, and the epilogue is ignored
+            return
+        if buf[line_start:line_end].strip(b' \t'):
+            raise BadRequest('Multipart data is invalid')
+        buf = buf[line_end + 2:]
+
+        # The headers of the part
+        while True:
+            if buf.startswith(b'\r\n'):
+                header_end, lines = 2, []
+                break
+            index = buf.find(b'\r\n\r\n')
+            if index != -1:
+                header_end, lines = index + 4, buf[:index].split(b'\r\n')
+                break
+            if len(buf) > max_header_size:
+                raise BadRequest('Multipart headers are too large')
+            if eof:
+                raise BadRequest('Multipart data is incomplete')
+            chunk = stream.read(chunk_size)
+            if chunk:
+                buf += chunk
+            else:
+                eof = True
+        buf = buf[header_end:]
+        # The next delimiter may be in the buffer already
+        need_more = False
+
+        items = []
+        for line in lines:
+            line = line.decode('utf-8', 'replace')
+            if line[:1] in (' ', '\t') and items:
+                # An obsolete folded line continues the previous header
+                key, value = items[-1]
+                items[-1] = (key, value + ' ' + line.strip())
+                continue
+            key, sep, value = line.partition(':')
+            if not sep:
+                raise BadRequest('Multipart headers are invalid')
+            items.append((key.strip(), value.strip()))
+        yield 'headers', Headers(items)
+        in_part = True
+
+
 class MultiPartParser(Parser):
     """The parser class for multipart form data, which may
-    include file data."""
+    include file data.
+
+    The request stream is read in chunks, and the content of each file
+    is passed on to an upload handler (see
+    :class:`~restart.uploads.UploadHandler`) as soon as it is read, so
+    an upload is never held in memory in full. By default, small files
+    are kept in memory and larger ones are spooled to temporary files
+    (see :class:`~restart.uploads.SpooledUploadHandler`).
+    """
 
     #: The content type bound to this parser.
     content_type = 'multipart/form-data'
 
+    #: The number of bytes read from the stream at a time.
+    chunk_size = 65536
+
+    #: The maximum size of the headers of a part, in bytes.
+    max_header_size = 16384
+
+    #: The upload handler class used for each file. If :attr:`None`, the
+    #: `UPLOAD_HANDLER_CLASS` configuration option will be used.
+    upload_handler_class = None
+
+    #: The maximum size of a file in bytes. If :attr:`None`, the
+    #: `UPLOAD_MAX_FILE_SIZE` configuration option will be used.
+    max_file_size = None
+
+    #: The maximum size of a non-file field in bytes. If :attr:`None`,
+    #: the `UPLOAD_MAX_FIELD_SIZE` configuration option will be used.
+    max_field_size = None
+
     def parse(self, stream, content_type, content_length, context=None):
-        """Parse the `stream` as a multipart encoded form.
+        """Parse the `stream` as a multipart encoded form. Only the first
+        of the parts with the same name is kept, and the upload handlers
+        of the others are aborted (as are all upload handlers, if the
+        parsing fails).
 
         :param stream: the stream to be parsed.
         :param content_type: the content type of the request payload.
@@ -66,10 +462,6 @@ class MultiPartParser(Parser):
         :param context: a dictionary containing extra context data
                         that can be useful for parsing.
         """
-        if content_length is None:
-            raise BadRequest('MultiPartParser.parse() requires '
-                             '`content_length` argument')
-
         _, options = parse_options_header(content_type)
         boundary = options.get('boundary')
         if boundary is None:
@@ -77,12 +469,73 @@ class MultiPartParser(Parser):
                              'in Content-Type header')
         boundary = boundary.encode('ascii')
 
-        parser = WerkzeugMultiPartParser(default_stream_factory)
+        handler_class = self.upload_handler_class or \
+            import_string(config.UPLOAD_HANDLER_CLASS)
+        max_file_size = self.max_file_size
+        if max_file_size is None:
+            max_file_size = config.UPLOAD_MAX_FILE_SIZE
+        max_field_size = self.max_field_size
+        if max_field_size is None:
+            max_field_size = config.UPLOAD_MAX_FIELD_SIZE
+
+        form, files = {}, {}
+        handler = field = None
+        # The handlers of the files kept in `files`
+        handlers = []
+        events = _iter_multipart(stream, boundary, self.chunk_size,
+                                 self.max_header_size)
         try:
-            form, files = parser.parse(stream, boundary, content_length)
-            return form.to_dict(), files.to_dict()
-        except ValueError:
-            raise BadRequest('Multipart data is invalid')
+            for event, value in events:
+                if event == 'data':
+                    size += len(value)
+                    if handler is None:
+                        if (max_field_size is not None and
+                                size > max_field_size):
+                            raise RequestEntityTooLarge()
+                        field.append(value)
+                        continue
+                    if max_file_size is not None and size > max_file_size:
+                        raise RequestEntityTooLarge()
+                    handler.receive_chunk(value)
+                elif event == 'headers':
+                    headers = value
+                    disposition, options = parse_options_header(
+                        headers.get('Content-Disposition', '')
+                    )
+                    name = options.get('name')
+                    filename = options.get('filename')
+                    if disposition != 'form-data' or name is None:
+                        raise BadRequest('Multipart data is invalid')
+                    if filename is None:
+                        field = []
+                    else:
+                        handler = handler_class(name, filename,
+                                                headers.get('Content-Type'),
+                                                headers, context)
+                    size = 0
+                elif handler is None:
+                    _, options = parse_options_header(
+                        headers.get('Content-Type', '')
+                    )
+                    charset = options.get('charset', 'utf-8')
+                    form.setdefault(name, b''.join(field).decode(
+                        charset, 'replace'
+                    ))
+                    field = None
+                else:
+                    if name in files:
+                        handler.abort()
+                    else:
+                        files[name] = handler.file_complete(size)
+                        handlers.append(handler)
+                    handler = None
+        except Exception:
+            if handler is not None:
+                handlers.append(handler)
+            for handler in handlers:
+                handler.abort()
+            raise
+        return form, files
 
 
 class URLEncodedParser(Parser):
@@ -0,0 +1,572 @@
+from __future__ import absolute_import
+
+import cProfile
+import errno
+import hashlib
+import hmac
+import itertools
+import os
+import pstats
+import re
+import sys
+import tempfile
+import time
+import weakref
+from threading import Event, Lock, Thread
+
+from six import iteritems, text_type
+from six.moves._thread import get_ident
+
+from . import timing
+from .config import config
+from .exceptions import Forbidden
+from .logging import global_logger
+from .resource import Resource
+from .response import Response
+
+#: The request header used to ask for the profiling of a request. Its
+#: value must be made by :func:`make_profile_token`. The response of a
+#: profiled request has the same header, whose value is the filename of
+#: the profile.
+PROFILE_HEADER = 'X-Restart-Profile'
+
+#: The key of the profile of a request in the WSGI environment.
+ENVIRON_KEY = 'restart.profile'
+
+# The profiles enabled by the middlewares, mapped to the identifiers of
+# their threads and weak references to their requests. The profile of a
+# request garbage collected before its profile was saved (because an
+# exception escaped) has leaked.
+_enabled = {}
+_enabled_lock = Lock()
+
+
+def _disable_leaked_profiles():
+    """Disable the profiles leaked in the current thread."""
+    ident = get_ident()
+    with _enabled_lock:
+        leaked = [profile for profile, (thread, ref) in iteritems(_enabled)
+                  if thread == ident and ref() is None]
+        for profile in leaked:
+            del _enabled[profile]
+    for profile in leaked:
+        profile.disable()
+
+
+def _sign(secret, message):
+    if isinstance(secret, text_type):
+        secret = secret.encode('utf-8')
+    return hmac.new(secret, message.encode('ascii'),
+                    hashlib.sha256).hexdigest()
+
+
+def make_profile_token(secret, timestamp=None):
+    """Return a value of the :data:`PROFILE_HEADER` header, which is
+    signed with `secret`. Example::
+
+        $ python -c "from restart.profiling import make_profile_token; \\
+                     print(make_profile_token('secret'))"
+        1792310400:0c5f...
+        $ curl -H 'X-Restart-Profile: 1792310400:0c5f...' ...
+
+    :param secret: the secret key (see the `PROFILER_SECRET`
+                   configuration option).
+    :param timestamp: the UNIX timestamp of the token. If not specified,
+                      the current time will be used.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    timestamp = str(int(timestamp))
+    return '%s:%s' % (timestamp, _sign(secret, timestamp))
+
+
+def check_profile_token(token, secret, max_age, now=None):
+    """Whether `token` was made by :func:`make_profile_token` with
+    `secret`, at most `max_age` seconds ago.
+
+    :param token: the value of the :data:`PROFILE_HEADER` header.
+    :param secret: the secret key.
+    :param max_age: the maximum age (in seconds) of the token.
+    :param now: the current UNIX timestamp. If not specified, the
+                current time will be used.
+    """
+    try:
+        timestamp, signature = token.split(':', 1)
+        issued = int(timestamp)
+    except ValueError:
+        return False
+    if now is None:
+        now = time.time()
+    if abs(now - issued) > max_age:
+        return False
+    return hmac.compare_digest(_sign(secret, timestamp), str(signature))
+
+
+class RollingProfile(object):
+    """The merged profile of the latest requests of an endpoint. The
+    profiles are merged in generations of `window` profiles, and the
+    merged profile covers the current generation and the previous one
+    (i.e. the latest `window` to `2 * window` profiles).
+
+    :param window: the number of profiles in each generation.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._previous = None
+        self._current = None
+        self._count = 0
+
+    def add(self, profile):
+        """Merge `profile` (a :class:`cProfile.Profile` object)."""
+        if self._count >= self.window:
+            self._previous, self._current = self._current, None
+            self._count = 0
+        if self._current is None:
+            self._current = pstats.Stats(profile)
+        else:
+            self._current.add(profile)
+        self._count += 1
+
+    def get_stats(self):
+        """Return the merged :class:`pstats.Stats` object."""
+        stats = pstats.Stats()
+        stats.add(*[item for item in (self._previous, self._current)
+                    if item is not None])
+        return stats
+
+
+class ProfilerMiddleware(object):
+    """The middleware used to profile requests with :mod:`cProfile`: one
+    in every :attr:`sample_every` requests of each resource, and the
+    requests carrying a :data:`PROFILE_HEADER` header signed with
+    :attr:`secret` (see :func:`make_profile_token`). Requests are
+    profiled from the first `process_request` method to the last
+    `process_rendered_response` method, so the profiles include the
+    actions, the other middlewares and the rendering.
+
+    The profile of each request is written to :attr:`directory` as
+    `<endpoint>.<timestamp>.<pid>.prof` (the endpoint is the name of the
+    resource if requests are not timed, see :mod:`restart.timing`), and
+    only the latest :attr:`max_dumps` profiles of each endpoint are
+    kept. Each process also keeps a rolling merged profile of each
+    endpoint (see :class:`RollingProfile`) in the
+    `<endpoint>.merged.<pid>.prof` file. The files can be read with
+    :mod:`pstats` or tools such as snakeviz, and the merged profiles of
+    several processes can be combined::
+
+        import glob, pstats
+
+        stats = pstats.Stats(*glob.glob('/tmp/restart-profiles/'
+                                        'todos_list.merged.*.prof'))
+        stats.sort_stats('cumulative').print_stats(20)
+
+    Since :mod:`cProfile` only profiles the current thread, under the
+    ASGI adapter the synchronous actions (which run in a thread pool)
+    are not profiled, while the other requests served by the event loop
+    meanwhile are. A request is not profiled if another profile is
+    active in its thread (e.g. the one of a concurrent request served by
+    the event loop). Example::
+
+        MIDDLEWARE_CLASSES = (
+            'restart.profiling.ProfilerMiddleware',
+        )
+    """
+
+    #: Profile one in every `sample_every` requests of each resource. If
+    #: `0`, requests are only profiled on demand. If :attr:`None`, the
+    #: `PROFILER_SAMPLE_EVERY` configuration option will be used.
+    sample_every = None
+
+    #: The secret key of the signed :data:`PROFILE_HEADER` headers. If
+    #: :attr:`None`, the `PROFILER_SECRET` configuration option will be
+    #: used.
+    secret = None
+
+    #: The maximum age (in seconds) of the signed headers.
+    token_max_age = 300
+
+    #: The directory of the profiles. If :attr:`None`, the
+    #: `PROFILER_DIR` configuration option will be used.
+    directory = None
+
+    #: The number of the latest profiles kept for each endpoint.
+    max_dumps = 100
+
+    #: The number of profiles in each generation of the rolling merged
+    #: profiles.
+    merge_window = 100
+
+    def __init__(self):
+        self.lock = Lock()
+        self._counter = itertools.count(1)
+        self._merged = {}
+
+    def get_directory(self):
+        """Return the directory of the profiles."""
+        return self.directory or config.PROFILER_DIR or os.path.join(
+            tempfile.gettempdir(), 'restart-profiles'
+        )
+
+    def is_requested(self, request):
+        """Whether `request` carries a valid signed
+        :data:`PROFILE_HEADER` header.
+
+        :param request: the request object.
+        """
+        token = request.environ.get('HTTP_X_RESTART_PROFILE')
+        if token is None:
+            return False
+        secret = self.secret or config.PROFILER_SECRET
+        return bool(secret) and check_profile_token(token, secret,
+                                                    self.token_max_age)
+
+    def is_sampled(self):
+        """Whether the current request is sampled."""
+        sample_every = self.sample_every
+        if sample_every is None:
+            sample_every = config.PROFILER_SAMPLE_EVERY
+        # `next` on a counter is atomic in CPython
+        return bool(sample_every) and \
+            next(self._counter) % sample_every == 0
+
+    def get_endpoint(self, request):
+        """Return the endpoint used to name the profile of `request`.
+
+        :param request: the request object.
+        """
+        timer = request.timer
+        if timer is not None and timer.endpoint is not None:
+            endpoint = timer.endpoint
+        else:
+            endpoint = request.resource.name
+        return re.sub(r'[^\w-]', '_', endpoint)
+
+    def process_request(self, request):
+        """Start profiling `request` if it is requested or sampled, and
+        no other profile is active in the current thread.
+        """
+        if _enabled:
+            _disable_leaked_profiles()
+
+        requested = self.is_requested(request)
+        if not (requested or self.is_sampled()):
+            return None
+        if sys.getprofile() is not None:
+            # Enabling the profile would silently replace the active one
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this thread (Python 3.12+)
+            return None
+        with _enabled_lock:
+            _enabled[profile] = (get_ident(), weakref.ref(request))
+        request.environ[ENVIRON_KEY] = (profile, requested)
+        return None
+
+    def process_rendered_response(self, request, response):
+        """Stop profiling `request`, and save its profile."""
+        item = request.environ.pop(ENVIRON_KEY, None)
+        if item is None:
+            return response
+        profile, requested = item
+        profile.disable()
+        with _enabled_lock:
+            _enabled.pop(profile, None)
+        try:
+            path = self.save(profile, self.get_endpoint(request))
+        except Exception:
+            global_logger.exception('Failed to save the profile of %s %s'
+                                    % (request.method, request.path))
+        else:
+            if requested:
+                response.headers[PROFILE_HEADER] = os.path.basename(path)
+        return response
+
+    def save(self, profile, endpoint):
+        """Write `profile` to a new file, merge it into the rolling
+        merged profile of `endpoint`, and return the path of the file.
+
+        :param profile: the :class:`cProfile.Profile` object.
+        :param endpoint: the endpoint of the profiled request.
+        """
+        directory = self.get_directory()
+        try:
+            os.makedirs(directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        now = time.time()
+        pid = os.getpid()
+        timestamp = '%s.%06dZ' % (time.strftime('%Y%m%dT%H%M%S',
+                                                time.gmtime(now)),
+                                  now % 1 * 1e6)
+        path = os.path.join(directory, '%s.%s.%d.prof' % (endpoint,
+                                                          timestamp, pid))
+        profile.dump_stats(path)
+        self.prune(directory, endpoint)
+
+        with self.lock:
+            merged = self._merged.get(endpoint)
+            if merged is None:
+                merged = self._merged[endpoint] = \
+                    RollingProfile(self.merge_window)
+            merged.add(profile)
+            stats = merged.get_stats()
+        merged_path = os.path.join(directory, '%s.merged.%d.prof'
+                                   % (endpoint, pid))
+        fd, temp_path = tempfile.mkstemp(prefix='.', dir=directory)
+        os.close(fd)
+        try:
+            stats.dump_stats(temp_path)
+            os.rename(temp_path, merged_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return path
+
+    def prune(self, directory, endpoint):
+        """Remove the profiles of `endpoint` except the latest
+        :attr:`max_dumps` ones.
+
+        :param directory: the directory of the profiles.
+        :param endpoint: the endpoint.
+        """
+        pattern = re.compile(r'^%s\.\d{8}T\d{6}\.\d{6}Z\.\d+\.prof$'
+                             % re.escape(endpoint))
+        filenames = sorted(filename for filename in os.listdir(directory)
+                           if pattern.match(filename))
+        for filename in filenames[:-self.max_dumps or None]:
+            try:
+                os.unlink(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+
+class SamplingProfiler(object):
+    """A statistical profiler, whose thread samples the stacks of the
+    threads serving requests every :attr:`interval` seconds, and counts
+    them by the endpoints being served. It adds no work to requests, so
+    it is cheap enough to run continuously (see
+    `benchmarks/profiling.py`), and the counts are exported in the
+    collapsed-stack format of flame graph tools (see
+    :meth:`get_collapsed`). Example::
+
+        from restart.profiling import SamplingProfiler
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        ...
+        with open('stacks.txt', 'w') as f:
+            f.write(profiler.get_collapsed())
+
+    The threads serving requests, and their endpoints, are found in the
+    sampled stacks: the frames of the `wsgi_app` (or `asgi_app`) methods
+    of adapters hold the endpoints in their `endpoint` variables. Under
+    the ASGI adapter, the synchronous actions run in a thread pool, so
+    they are only sampled with `all_threads`.
+
+    :param interval: the number of seconds between samples. If not
+                     specified, the `SAMPLING_PROFILER_INTERVAL`
+                     configuration option will be used.
+    :param all_threads: whether to sample all threads, including those
+                        not serving requests (attributed to the `-`
+                        endpoint, as are requests not routed yet).
+    """
+
+    #: The maximum number of frames of a sampled stack, from the
+    #: innermost one.
+    max_depth = 128
+
+    #: The names of the adapter methods whose frames hold the endpoints
+    #: of the requests in their `endpoint` variables.
+    endpoint_functions = frozenset(['wsgi_app', 'asgi_app'])
+
+    def __init__(self, interval=None, all_threads=False):
+        if interval is None:
+            interval = config.SAMPLING_PROFILER_INTERVAL
+        self.interval = interval
+        self.all_threads = all_threads
+        self.lock = Lock()
+        #: The number of samples taken.
+        self.samples = 0
+        self._stacks = {}
+        # The labels of frames by the identifiers of their code objects,
+        # which are kept alive (so that the identifiers are not reused),
+        # and whether the frames hold endpoints
+        self._labels = {}
+        self._thread = None
+        self._stopped = Event()
+
+    def start(self):
+        """Start the sampling thread, if it is not running."""
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = Thread(target=self._run,
+                                  name='restart-sampling-profiler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread, and wait for it to exit."""
+        with self.lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopped.set()
+        thread.join()
+
+    def _run(self):
+        ident = get_ident()
+        deadline = timing.clock()
+        while True:
+            deadline += self.interval
+            now = timing.clock()
+            if deadline < now:
+                # Skip the samples missed (e.g. while the process was
+                # suspended)
+                deadline = now
+            if self._stopped.wait(deadline - now):
+                break
+            try:
+                self.sample(exclude=ident)
+            except Exception:
+                global_logger.exception('Exception in sampling profiler')
+
+    def _describe(self, code):
+        filename = code.co_filename.replace(';', ',')
+        label = '%s (%s:%d)' % (code.co_name, filename, code.co_firstlineno)
+        holds_endpoint = (code.co_name in self.endpoint_functions and
+                          'endpoint' in code.co_varnames)
+        return code, label, holds_endpoint
+
+    def sample(self, exclude=None):
+        """Sample the stacks of the threads once.
+
+        :param exclude: the identifier of a thread not to be sampled.
+        """
+        labels = self._labels
+        max_depth = self.max_depth
+        keys = []
+        for ident, frame in iteritems(sys._current_frames()):
+            if ident == exclude:
+                continue
+            codes = []
+            endpoint = None
+            serving = False
+            while frame is not None and len(codes) < max_depth:
+                code = frame.f_code
+                code_id = id(code)
+                item = labels.get(code_id)
+                if item is None:
+                    item = labels[code_id] = self._describe(code)
+                if item[2] and not serving:
+                    # The innermost adapter frame serves the request
+                    serving = True
+                    endpoint = frame.f_locals.get('endpoint')
+                codes.append(code_id)
+                frame = frame.f_back
+            if serving or self.all_threads:
+                keys.append((endpoint or '-', tuple(codes)))
+        # The frames of other threads are not referenced any more
+
+        with self.lock:
+            stacks = self._stacks
+            for key in keys:
+                stacks[key] = stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def get_collapsed(self):
+        """Return the sampled stacks in the collapsed-stack format: a
+        line for each distinct stack, with the endpoint and the frames
+        (from the outermost one) separated by semicolons, followed by the
+        number of samples. The output can be rendered with tools such as
+        `flamegraph.pl` or speedscope.
+        """
+        with self.lock:
+            stacks = list(iteritems(self._stacks))
+        labels = self._labels
+        lines = sorted(
+            '%s %d' % (';'.join([endpoint] + [labels[code_id][1]
+                                              for code_id in reversed(codes)]),
+                       count)
+            for (endpoint, codes), count in stacks
+        )
+        return ''.join(line + '\n' for line in lines)
+
+    def reset(self):
+        """Discard the sampled stacks."""
+        with self.lock:
+            self._stacks.clear()
+            self.samples = 0
+
+
+class StacksResource(Resource):
+    """The resource exporting the stacks sampled by :attr:`profiler` in
+    the collapsed-stack format. The requests must carry a
+    :data:`PROFILE_HEADER` header signed with the `PROFILER_SECRET`
+    configuration option (see :func:`make_profile_token`), so they are
+    all forbidden if it is not set. See :func:`enable_sampling_profiler`.
+    """
+
+    name = 'stacks'
+
+    #: The :class:`SamplingProfiler` object.
+    profiler = None
+
+    #: The maximum age (in seconds) of the signed headers.
+    token_max_age = 300
+
+    auto_etag = False
+    cache_ttl = 0
+
+    def read(self, request):
+        secret = config.PROFILER_SECRET
+        token = request.environ.get('HTTP_X_RESTART_PROFILE', '')
+        if not (secret and
+                check_profile_token(token, secret, self.token_max_age)):
+            raise Forbidden()
+        response = Response(self.profiler.get_collapsed().encode('utf-8'),
+                            200, {'Content-Type': 'text/plain; '
+                                                  'charset=utf-8'})
+        response.is_rendered = True
+        return response
+
+
+def enable_sampling_profiler(api, uri='/profile/stacks', interval=None,
+                             all_threads=False):
+    """Start a :class:`SamplingProfiler`, and export its sampled stacks
+    through a :class:`StacksResource` registered at `uri`. Example::
+
+        from restart.api import RESTArt
+        from restart.profiling import enable_sampling_profiler
+
+        api = RESTArt()
+        ...
+        enable_sampling_profiler(api)
+
+    Then, with the `PROFILER_SECRET` configuration option set, render
+    for example a flame graph of the requests served::
+
+        $ TOKEN=$(python -c "from restart.profiling import *; \\
+            print(make_profile_token('<secret>'))")
+        $ curl -H "X-Restart-Profile: $TOKEN" \\
+            http://localhost:5000/profile/stacks | flamegraph.pl > stacks.svg
+
+    Return the started :class:`SamplingProfiler` object.
+
+    :param api: the RESTArt API.
+    :param uri: the URI of the stacks resource.
+    :param interval: see :class:`SamplingProfiler`.
+    :param all_threads: see :class:`SamplingProfiler`.
+    """
+    profiler = SamplingProfiler(interval, all_threads)
+    resource_class = type('StacksResource', (StacksResource,),
+                          {'profiler': profiler})
+    api.route(resource_class, uri=uri, methods=['GET'])
+    profiler.start()
+    return profiler
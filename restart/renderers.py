@@ -1,6 +1,13 @@
 from __future__ import absolute_import
 
-import json
+try:
+    from collections.abc import Iterator, KeysView, ValuesView, ItemsView
+except ImportError:  # Python 2
+    from collections import Iterator, KeysView, ValuesView, ItemsView
+
+from .config import config
+from .json_backends import get_backend
+from .utils import locked_cached_classproperty
 
 
 class Renderer(object):
@@ -13,7 +20,8 @@ class Renderer(object):
     format_suffix = None
 
     def render(self, data, context=None):
-        """Render `data`.
+        """Render `data` into text or bytes. Text is encoded in UTF-8
+        when the response is sent.
 
         :param data: the data to be rendered.
         :param context: a dictionary containing extra context data
@@ -31,11 +39,57 @@ class JSONRenderer(Renderer):
     #: The format suffix bound to this renderer.
     format_suffix = 'json'
 
+    #: The types of data rendered as a stream of JSON array chunks.
+    streaming_types = (Iterator, KeysView, ValuesView, ItemsView)
+
+    #: The minimum number of bytes buffered before a chunk is emitted
+    #: while streaming. If :attr:`None`, the `JSON_STREAM_FLUSH_SIZE`
+    #: configuration option will be used.
+    flush_size = None
+
+    @locked_cached_classproperty(name='_backend')
+    def backend(cls):
+        """The JSON backend specified by the `JSON_BACKEND` configuration
+        option. See :func:`~restart.json_backends.get_backend`.
+        """
+        return get_backend()
+
     def render(self, data, context=None):
-        """Render `data` into JSON.
+        """Render `data` into compact JSON bytes. If `data` is an iterator
+        (e.g. a generator) or a dictionary view (e.g. `dict.values()`),
+        it is rendered lazily by :meth:`render_stream` instead.
 
         :param data: the data to be rendered.
         :param context: a dictionary containing extra context data
                         that can be useful for rendering.
         """
-        return json.dumps(data)
+        if isinstance(data, self.streaming_types):
+            return self.render_stream(data)
+        return self.backend.dumps(data)
+
+    def render_stream(self, items):
+        """Render `items` into a JSON array incrementally. Return an
+        iterator of byte chunks, each of which is at least
+        :attr:`flush_size` bytes long (except the last one), so that
+        the whole array is never held in memory at once.
+
+        Since the response has been started when the chunks are
+        consumed, an error raised by `items` aborts the response.
+
+        :param items: an iterable of the items to be rendered.
+        """
+        dumps = self.backend.dumps
+        flush_size = self.flush_size or config.JSON_STREAM_FLUSH_SIZE
+
+        chunks, size = [b'['], 1
+        separator = b''
+        for item in items:
+            chunk = separator + dumps(item)
+            separator = b','
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= flush_size:
+                yield b''.join(chunks)
+                chunks, size = [], 0
+        chunks.append(b']')
+        yield b''.join(chunks)
@@ -1,8 +1,18 @@
 from __future__ import absolute_import
 
-from werkzeug.wsgi import get_content_length
+from six import iteritems
+from werkzeug.http import parse_authorization_header
+from werkzeug.urls import url_decode
+from werkzeug.wsgi import (
+    get_content_length, get_current_url, get_input_stream,
+    get_path_info, get_query_string
+)
 
-from .utils import locked_cached_property
+from .compression import decompress_stream
+from .config import config
+from .exceptions import LengthRequired
+from .timing import ENVIRON_KEY as TIMER_ENVIRON_KEY, clock
+from .utils import SizeLimitedStream, locked_cached_property
 
 
 class Request(object):
@@ -11,13 +21,19 @@ class Request(object):
     :param initial_request: the initial request, which is framework-specific.
     """
 
+    #: The resource object handling the request, which is set by
+    #: :meth:`~restart.resource.Resource.dispatch_request`.
+    resource = None
+
     def __init__(self, initial_request):
         self.initial_request = initial_request
 
     def parse(self, negotiator, parser_classes, parser_context=None):
-        """Return a request object with the data parsed, which is a
-        dictionary. If the request payload is empty, the parsed data
-        will be an empty dictionary.
+        """Return a request object with the data to be parsed. The request
+        payload is not parsed until :attr:`data` or :attr:`files` is
+        accessed for the first time (see :meth:`load`), so requests whose
+        payloads are never used (e.g. those rejected by middlewares) do
+        not pay for parsing.
 
         :param negotiator: the negotiator object used to select
                            the proper parser, which will be used
@@ -28,21 +44,85 @@ class Request(object):
         :param parser_context: a dictionary containing extra context
                                data that can be useful to the parser.
         """
-        if self.content_length:
+        if self.content_length or self.is_chunked:
+            self._parser_args = (negotiator, parser_classes, parser_context)
+        return self
+
+    def load(self):
+        """Parse the request payload with the parser arguments captured
+        by :meth:`parse`, if it has not been parsed yet. If the request
+        payload is empty, the parsed data will be an empty dictionary.
+
+        Errors raised by the parser (e.g.
+        :exc:`~werkzeug.exceptions.BadRequest`) propagate to the code
+        that accesses :attr:`data` or :attr:`files`, and are raised again
+        on every subsequent access.
+
+        If the length of the request payload is unknown in advance (see
+        :attr:`is_chunked`), the payload is parsed in streaming fashion
+        until the end of the stream. This requires the WSGI server to
+        terminate the input stream at the end of the payload (and to set
+        `wsgi.input_terminated`), otherwise
+        :exc:`~werkzeug.exceptions.LengthRequired` is raised. Besides,
+        :exc:`~werkzeug.exceptions.RequestEntityTooLarge` is raised if it
+        is larger than the `REQUEST_MAX_CHUNKED_SIZE` configuration
+        option. If the request payload is compressed (see
+        :attr:`content_encoding`), it is decompressed on the fly while
+        being parsed. In both cases, the parser gets `None` as the
+        content length.
+        """
+        error = self.__dict__.get('_parse_error')
+        if error is not None:
+            raise error
+
+        parser_args = self.__dict__.pop('_parser_args', None)
+        if parser_args is None:
+            return
+
+        negotiator, parser_classes, parser_context = parser_args
+        timer = self.timer
+        started = timer and clock()
+        try:
             parser_class = negotiator.select_parser(
                 parser_classes, self.content_type
             )
             parser = parser_class()
-            result = parser.parse(self.stream, self.content_type,
-                                  self.content_length, parser_context)
-            if isinstance(result, tuple):
-                assert len(result) == 2, \
-                        'Expected a two-tuple of (data, files)'
-                self._data, self._files = result
-            else:
-                self._data = result
-                self._files = {}
-        return self
+            stream, content_length = self.stream, self.content_length
+            if content_length is None:
+                if not self.environ.get('wsgi.input_terminated'):
+                    # Reading past the end of the payload would block
+                    raise LengthRequired()
+                stream = SizeLimitedStream(stream,
+                                           config.REQUEST_MAX_CHUNKED_SIZE)
+            if self.content_encoding:
+                stream = decompress_stream(stream, self.content_encoding)
+                if stream is not self.stream:
+                    # The decompressed size is unknown in advance
+                    content_length = None
+            result = parser.parse(stream, self.content_type,
+                                  content_length, parser_context)
+        except Exception as exc:
+            # The stream has been consumed, so it can not be parsed again
+            self._parse_error = exc
+            raise
+        finally:
+            if timer is not None:
+                timer.record('parse', started)
+        if isinstance(result, tuple):
+            assert len(result) == 2, \
+                    'Expected a two-tuple of (data, files)'
+            self._data, self._files = result
+        else:
+            self._data = result
+            self._files = {}
+
+    @property
+    def is_parsed(self):
+        """Whether the request payload has been parsed successfully (or
+        there is no payload to be parsed).
+        """
+        return not ('_parser_args' in self.__dict__ or
+                    '_parse_error' in self.__dict__)
 
     def __str__(self):
         return "<{} [{} '{}']>".format(self.__class__.__name__,
@@ -50,6 +130,13 @@ class Request(object):
 
     __repr__ = __str__
 
+    @locked_cached_property
+    def timer(self):
+        """The :class:`~restart.timing.Timer` object of the request, or
+        :attr:`None` if the request is not timed.
+        """
+        return self.environ.get(TIMER_ENVIRON_KEY)
+
     @locked_cached_property
     def content_type(self):
         """The content type of the request payload."""
@@ -60,15 +147,36 @@ class Request(object):
         """The content length of the request payload."""
         return get_content_length(self.environ)
 
-    @locked_cached_property(name='_data')
+    @locked_cached_property
+    def is_chunked(self):
+        """Whether the request payload is sent with chunked transfer
+        encoding, in which case its length is unknown in advance.
+        """
+        if self.content_length is not None:
+            return False
+        transfer_encoding = self.environ.get('HTTP_TRANSFER_ENCODING', '')
+        return 'chunked' in transfer_encoding.lower()
+
+    @locked_cached_property
+    def content_encoding(self):
+        """The content encoding of the request payload (for example
+        `'gzip'`), or `None` if the payload is not encoded.
+        """
+        return self.environ.get('HTTP_CONTENT_ENCODING')
+
+    @property
     def data(self):
-        """The parsed request payload."""
-        return {}
+        """The parsed request payload, which is parsed on first access."""
+        if not self.is_parsed:
+            self.load()
+        return self.__dict__.setdefault('_data', {})
 
-    @locked_cached_property(name='_files')
+    @property
     def files(self):
-        """The uploaded request files."""
-        return {}
+        """The uploaded request files, which are parsed on first access."""
+        if not self.is_parsed:
+            self.load()
+        return self.__dict__.setdefault('_files', {})
 
     @locked_cached_property(name='_stream')
     def stream(self):
@@ -214,3 +322,68 @@ class WerkzeugRequest(Request):
         request object.
         """
         return self.initial_request.environ
+
+
+class WSGIRequest(Request):
+    """The request class built straight from the WSGI environment,
+    without any intermediate framework-specific request object.
+
+    :param initial_request: the WSGI environment.
+    """
+
+    def get_stream(self):
+        """Get the request stream from the WSGI environment. The stream
+        is limited to the content length to avoid reading past the end
+        of the request payload. If the content length is unknown (e.g.
+        the payload is sent with chunked transfer encoding), the input
+        stream is returned unchanged only if the WSGI server terminates
+        it at the end of the payload (see `wsgi.input_terminated`), and
+        an empty stream is returned otherwise.
+        """
+        return get_input_stream(self.initial_request)
+
+    def get_method(self):
+        """Get the request method from the WSGI environment."""
+        return self.initial_request.get('REQUEST_METHOD', 'GET').upper()
+
+    def get_uri(self):
+        """Get the request URI from the WSGI environment."""
+        return get_current_url(self.initial_request)
+
+    def get_path(self):
+        """Get the request path from the WSGI environment."""
+        return '/' + get_path_info(self.initial_request).lstrip('/')
+
+    def get_args(self):
+        """Get the request URI parameters from the WSGI environment."""
+        query_string = get_query_string(self.initial_request)
+        args = {
+            k: v if len(v) > 1 else v[0]
+            for k, v in url_decode(query_string).lists()
+        }
+        return args
+
+    def get_auth(self):
+        """Get the request authorization data from the WSGI environment."""
+        return parse_authorization_header(
+            self.initial_request.get('HTTP_AUTHORIZATION')
+        )
+
+    def get_scheme(self):
+        """Get the request scheme from the WSGI environment."""
+        return self.initial_request['wsgi.url_scheme']
+
+    def get_headers(self):
+        """Get the request headers from the WSGI environment."""
+        headers = {}
+        for key, value in iteritems(self.initial_request):
+            if key.startswith('HTTP_') and key not in \
+                    ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                headers[key[5:].replace('_', '-').title()] = value
+            elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                headers[key.replace('_', '-').title()] = value
+        return headers
+
+    def get_environ(self):
+        """Get the WSGI environment."""
+        return self.initial_request
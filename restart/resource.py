@@ -1,18 +1,33 @@
 from __future__ import absolute_import
 
+try:
+    from collections.abc import Iterator
+except ImportError:  # Python 2
+    from collections import Iterator
+
+import copy
+
+from six import iteritems
+from werkzeug.http import http_date, quote_etag
 from werkzeug.utils import import_string
 
 from .config import config
+from .logging import global_logger
 from .negotiator import Negotiator
-from .response import Response
+from .renderers import JSONRenderer
+from .response import Response, is_not_modified
+from .timing import clock
 from . import exceptions
-from .utils import locked_cached_classproperty
+from .utils import SingleFlight, locked_cached_classproperty
 
 
 class Resource(object):
     """The core class that represents a REST resource.
 
     :param action_map: the mapping of request methods to resource actions.
+    :param actions: the action table resolved from `action_map` by
+                    :meth:`resolve_actions`. If not specified, it will be
+                    resolved on instantiation.
     """
 
     #: The name of the resource.
@@ -30,14 +45,177 @@ class Resource(object):
         for renderer_class in config.RENDERER_CLASSES
     )
 
+    #: The renderer classes used for rendering the error messages of
+    #: HTTP exceptions (see :meth:`handle_exception`).
+    error_renderer_classes = (JSONRenderer,)
+
+    #: The methods called on requests whose actions are not implemented.
+    #: If a subclass overrides any of them, such requests are dispatched
+    #: normally instead of being answered by
+    #: :meth:`make_method_not_allowed_response`.
+    rejection_methods = ('dispatch_request', 'find_action',
+                         'http_method_not_allowed', 'handle_exception',
+                         'finalize_response', 'log_message', 'logger')
+
     #: The class used to select the proper parser or renderer
     negotiator_class = Negotiator
 
     #: The resource-level middleware classes
     middleware_classes = ()
 
-    def __init__(self, action_map):
+    #: Whether to add ETags computed from the rendered bodies to the
+    #: responses of GET and HEAD requests (see
+    #: :meth:`~restart.response.Response.add_etag`). If :attr:`None`,
+    #: the `AUTO_ETAG` configuration option will be used.
+    auto_etag = None
+
+    #: An optional method called before the action of a GET or HEAD
+    #: request, with the same arguments as the action. It should return
+    #: the current ETag of the resource (quoted or not), or :attr:`None`
+    #: if it is unknown. If the ETag matches the If-None-Match header of
+    #: the request, a 304 (Not Modified) response is returned without
+    #: calling the action. Example::
+    #:
+    #:     class Todo(Resource):
+    #:         name = 'todo'
+    #:
+    #:         def etag(self, request, pk):
+    #:             return str(get_version(pk))
+    etag = None
+
+    #: An optional method like :attr:`etag`, which returns the last
+    #: modification time (a datetime in UTC) of the resource, and is
+    #: checked against the If-Modified-Since header of the request.
+    last_modified = None
+
+    #: The number of seconds the responses of GET requests are cached by
+    #: :class:`~restart.cache.ResponseCacheMiddleware` (`0` disables
+    #: caching). If :attr:`None`, the `RESPONSE_CACHE_TTL` configuration
+    #: option will be used.
+    cache_ttl = None
+
+    #: Whether to coalesce concurrent identical GET (and HEAD) requests:
+    #: while the action of one request is in progress, the identical
+    #: requests wait for it and share its rendered response, instead of
+    #: calling the action again. Requests are identical if they have
+    #: the same method, path, query arguments, format suffix and values
+    #: of the :attr:`coalesce_vary` headers. Streamed responses are not
+    #: shared, so the waiting requests call the action themselves. If
+    #: middlewares have `process_response` methods, the return value of
+    #: the action is shared instead (a copy for each request), and it is
+    #: rendered for each request after being processed.
+    coalesce = False
+
+    #: The request headers that the responses vary on, whose values
+    #: must be the same for requests to be coalesced.
+    coalesce_vary = ('Accept', 'Accept-Language', 'Authorization', 'Cookie')
+
+    #: The maximum number of seconds a coalesced request waits for the
+    #: identical request in progress, before failing with a 503 (Service
+    #: Unavailable) response. If :attr:`None`, the `COALESCE_TIMEOUT`
+    #: configuration option will be used.
+    coalesce_timeout = None
+
+    #: The validator headers (ETag and Last-Modified) computed by
+    #: :attr:`etag` and :attr:`last_modified` for the current request.
+    validators = None
+
+    def __init__(self, action_map, actions=None):
         self.action_map = action_map
+        if actions is None:
+            actions = self.resolve_actions(action_map)
+        self.actions = actions
+
+    @classmethod
+    def resolve_actions(cls, action_map, methods=None):
+        """Resolve `action_map` into an action table, which is a mapping
+        from request methods to unbound actions, as found in the class
+        dictionaries (functions, or class or static methods). The value
+        is :attr:`None` if the action is not implemented, or if the
+        request method is not in `methods`.
+
+        :param action_map: the mapping of request methods to resource
+                           actions.
+        :param methods: a sequence of allowed HTTP methods (in any case).
+                        If not specified, all methods in `action_map` are
+                        allowed.
+        """
+        if methods is not None:
+            methods = set(method.upper() for method in methods)
+        actions = {}
+        for method, action_name in iteritems(action_map):
+            action = None
+            for klass in cls.__mro__:
+                if action_name in vars(klass):
+                    action = vars(klass)[action_name]
+                    break
+            if action is None or (methods is not None and
+                                  method not in methods):
+                actions[method] = None
+            else:
+                actions[method] = action
+        return actions
+
+    @classmethod
+    def get_allowed_methods(cls, actions):
+        """Return a sorted list of request methods whose actions are
+        implemented in the action table `actions`.
+
+        :param actions: the action table. See :meth:`resolve_actions`.
+        """
+        return sorted(
+            method for method, action in iteritems(actions)
+            if action is not None
+        )
+
+    @locked_cached_classproperty(name='_rejects_directly')
+    def rejects_directly(cls):
+        """Whether the requests whose actions are not implemented can be
+        answered by :meth:`make_method_not_allowed_response`, without
+        instantiating the resource. This is not the case if there are
+        middlewares (which may handle the requests by themselves, e.g.
+        for CORS), or if any of the :attr:`rejection_methods` is
+        overridden.
+        """
+        if cls.middlewares:
+            return False
+        for name in cls.rejection_methods:
+            owner = next(klass for klass in cls.__mro__
+                         if name in vars(klass))
+            if owner is not Resource:
+                return False
+        return True
+
+    @classmethod
+    def make_method_not_allowed_response(cls, request, allowed_methods):
+        """Return a rendered `405 Method Not Allowed` response, without
+        instantiating the resource. It is the same as the response
+        produced by :meth:`http_method_not_allowed` in the normal
+        dispatching flow (see :attr:`rejects_directly`).
+
+        :param request: the request object.
+        :param allowed_methods: the allowed methods used in the
+                                `Allow` header.
+        """
+        exc = exceptions.MethodNotAllowed(valid_methods=allowed_methods)
+        headers = dict(exc.get_headers(request.environ))
+        response = Response({'message': exc.description}, exc.code, headers)
+        if request.method in config.LOGGER_METHODS:
+            query_string = request.environ['QUERY_STRING']
+            separator = '?' if query_string else ''
+            global_logger.debug('[%s %s%s%s] <Response> %s %s' % (
+                request.method, request.path, separator, query_string,
+                response.status, response.data
+            ))
+        return response.render(cls.negotiator, cls.error_renderer_classes,
+                               None)
+
+    @property
+    def allowed_methods(self):
+        """A sorted list of request methods whose actions are
+        implemented.
+        """
+        return self.get_allowed_methods(self.actions)
 
     @locked_cached_classproperty(name='_middlewares')
     def middlewares(cls):
@@ -57,10 +235,55 @@ class Resource(object):
             for middleware_class in middleware_classes
         )
 
+    @locked_cached_classproperty(name='_flights')
+    def flights(cls):
+        """The :class:`~restart.utils.SingleFlight` object used to
+        coalesce the requests of the resource (see :attr:`coalesce`).
+        """
+        return SingleFlight()
+
+    @locked_cached_classproperty(name='_negotiator')
+    def negotiator(cls):
+        """The instance of :attr:`negotiator_class`, which is shared
+        across requests.
+        """
+        return cls.negotiator_class()
+
+    @locked_cached_classproperty(name='_request_processors')
+    def request_processors(cls):
+        """The prebuilt list of bound `process_request` methods of
+        :attr:`middlewares`, in order.
+        """
+        return [
+            middleware.process_request for middleware in cls.middlewares
+            if hasattr(middleware, 'process_request')
+        ]
+
+    @locked_cached_classproperty(name='_response_processors')
+    def response_processors(cls):
+        """The prebuilt list of bound `process_response` methods of
+        :attr:`middlewares`, in reverse order.
+        """
+        return [
+            middleware.process_response
+            for middleware in reversed(cls.middlewares)
+            if hasattr(middleware, 'process_response')
+        ]
+
+    @locked_cached_classproperty(name='_rendered_response_processors')
+    def rendered_response_processors(cls):
+        """The prebuilt list of bound `process_rendered_response` methods
+        of :attr:`middlewares`, in reverse order.
+        """
+        return [
+            middleware.process_rendered_response
+            for middleware in reversed(cls.middlewares)
+            if hasattr(middleware, 'process_rendered_response')
+        ]
+
     @property
     def logger(self):
         """A :class:`logging.Logger` object for this API."""
-        from .logging import global_logger
         return global_logger
 
     def _get_head(self):
@@ -79,6 +302,17 @@ class Resource(object):
         if self.request.method in config.LOGGER_METHODS:
             self.logger.debug('%s %s' % (self._get_head(), msg))
 
+    def log_request(self, request):
+        """Logs the request payload with `DEBUG` level, without parsing
+        it if nobody has accessed it.
+
+        :param request: the request object.
+        """
+        if request.is_parsed:
+            self.log_message('<Request> %s' % request.data)
+        else:
+            self.log_message('<Request> (payload not parsed)')
+
     def log_exception(self, exc):
         """Logs an exception with `ERROR` level.
 
@@ -124,27 +358,105 @@ class Resource(object):
         :param args: the positional arguments captured from the URI.
         :param kwargs: the keyword arguments captured from the URI.
         """
-        negotiator = self.negotiator_class()
+        negotiator = self.negotiator
         self.format_suffix = kwargs.pop('format', None)
 
         parser_context = self.get_parser_context(request, args, kwargs)
         self.request = request
+        request.resource = self
 
+        accept = request.environ.get('HTTP_ACCEPT')
         try:
             request.parse(negotiator, self.parser_classes, parser_context)
-            self.log_message('<Request> %s' % request.data)
-
             rv = self.perform_action(*args, **kwargs)
+            self.log_request(request)
         except Exception as exc:
             rv = self.handle_exception(exc)
+            # Error messages are always rendered, whatever is accepted
+            accept = None
+
+        return self.finalize_response(rv, request, args, kwargs, accept)
+
+    def finalize_response(self, rv, request, args, kwargs, accept=None):
+        """Convert the return value to a response object, and render it.
+        If content negotiation fails (e.g. no renderer is acceptable),
+        the error message is rendered instead.
+
+        For successful GET and HEAD requests, the validators computed by
+        :attr:`etag` and :attr:`last_modified` are added to the response,
+        as well as an ETag computed from the rendered body (see
+        :attr:`auto_etag`), and the response becomes a 304 (Not Modified)
+        response if the conditions of the request hold.
 
+        The :meth:`process_rendered_response` methods of middlewares are
+        then called on the rendered response, in reverse order. They work
+        like :meth:`process_response` methods, except that they must
+        return a :class:`~restart.response.Response` object, and they can
+        alter the rendered body (e.g. compress it).
+
+        :param rv: the return value of :meth:`perform_action`.
+        :param request: the request object.
+        :param args: the positional arguments captured from the URI.
+        :param kwargs: the keyword arguments captured from the URI.
+        :param accept: the value of the Accept header of the request.
+        """
         response = self.make_response(rv)
         self.log_message('<Response> %s %s' % (response.status, response.data))
 
-        renderer_context = self.get_renderer_context(request, args, kwargs,
-                                                     response)
-        return response.render(negotiator, self.renderer_classes,
-                               self.format_suffix, renderer_context)
+        status_code = response.status_code
+        if status_code == 304:
+            # There is no body to render
+            return self.postprocess_response(request, response)
+
+        # Responses rendered in advance (e.g. cached ones) are kept as is
+        if not response.is_rendered:
+            renderer_context = self.get_renderer_context(request, args,
+                                                         kwargs, response)
+            timer = request.timer
+            started = timer and clock()
+            try:
+                response = response.render(self.negotiator,
+                                           self.renderer_classes,
+                                           self.format_suffix,
+                                           renderer_context, accept)
+            except exceptions.HTTPException as exc:
+                if timer is not None:
+                    timer.record('render', started)
+                self.format_suffix = None
+                return self.finalize_response(self.handle_exception(exc),
+                                              request, args, kwargs)
+            if timer is not None:
+                timer.record('render', started)
+
+        if request.method in ('GET', 'HEAD') and 200 <= status_code < 300:
+            if self.validators:
+                for key, value in iteritems(self.validators):
+                    response.headers.setdefault(key, value)
+            auto_etag = self.auto_etag
+            if auto_etag is None:
+                auto_etag = config.AUTO_ETAG
+            if auto_etag:
+                response.add_etag()
+            response.make_conditional(request.environ)
+        return self.postprocess_response(request, response)
+
+    def postprocess_response(self, request, response):
+        """Call the :meth:`process_rendered_response` methods of
+        middlewares on the rendered `response`, in reverse order.
+
+        :param request: the request object.
+        :param response: the rendered response object.
+        """
+        processors = self.rendered_response_processors
+        if not processors:
+            return response
+        timer = request.timer
+        started = timer and clock()
+        for process_rendered_response in processors:
+            response = process_rendered_response(request, response)
+        if timer is not None:
+            timer.record('postprocess', started)
+        return response
 
     def http_method_not_allowed(self, request, *args, **kwargs):
         """The default action handler if the corresponding action for
@@ -152,7 +464,7 @@ class Resource(object):
 
         See :meth:`dispatch_request` for the meanings of the parameters.
         """
-        raise exceptions.MethodNotAllowed()
+        raise exceptions.MethodNotAllowed(valid_methods=self.allowed_methods)
 
     def find_action(self, request):
         """Find the appropriate action according to the request method.
@@ -160,15 +472,18 @@ class Resource(object):
         :param request: the request object.
         """
         try:
-            action_name = self.action_map[request.method]
+            action = self.actions[request.method]
         except KeyError as exc:
             exc.args = (
                 'Config `ACTION_MAP` has no mapping for %r' % request.method,
             )
             raise
 
-        action = getattr(self, action_name, self.http_method_not_allowed)
-        return action
+        if action is None:
+            return self.http_method_not_allowed
+        # Bind the action like `getattr` does (e.g. class methods are
+        # bound to the class)
+        return action.__get__(self, self.__class__)
 
     def perform_action(self, *args, **kwargs):
         """Perform the appropriate action. Also apply all possible `process_*`
@@ -177,7 +492,9 @@ class Resource(object):
         During request phase:
 
             :meth:`process_request` methods are called on each request,
-            before RESTArt calls the `action`, in order.
+            before RESTArt calls the `action`, in order. Then the
+            :attr:`etag` and :attr:`last_modified` methods (if any) are
+            called (see :meth:`check_not_modified`).
 
             It should return :attr:`None` or any other value that
             :attr:`~restart.resource.Resource.make_response` can recognize.
@@ -209,29 +526,269 @@ class Resource(object):
         :param kwargs: a dictionary of keyword arguments that will be passed
                        to the action.
         """
+        request = self.request
+        request_processors = self.request_processors
+        response_processors = self.response_processors
+
+        # Fast path for resources without middlewares
+        if not (request_processors or response_processors):
+            rv = self.check_not_modified(request, *args, **kwargs)
+            if rv is not None:
+                return rv
+            action = self.find_action(request)
+            return self.call_action(action, request, *args, **kwargs)
+
         rv = None
+        timer = request.timer
+        started = timer and clock()
 
         # Call possible `process_request` methods of middlewares
-        for middleware in self.middlewares:
-            if hasattr(middleware, 'process_request'):
-                rv = middleware.process_request(self.request)
-                if rv is not None:
-                    break
+        for process_request in request_processors:
+            rv = process_request(request)
+            if rv is not None:
+                break
+
+        if timer is not None:
+            timer.record('middleware', started)
+
+        # Answer 304 without calling the `action` if possible
+        if rv is None:
+            rv = self.check_not_modified(request, *args, **kwargs)
 
         # Call the `action`
         if rv is None:
-            action = self.find_action(self.request)
-            rv = action(self.request, *args, **kwargs)
+            action = self.find_action(request)
+            rv = self.call_action(action, request, *args, **kwargs)
+
+        # Call all `process_response` methods of middlewares. Ensure that
+        # the second parameter passed to each `process_response` method
+        # is a `Response` object, which is converted only if necessary.
+        started = timer and clock()
+        for process_response in response_processors:
+            if not isinstance(rv, Response):
+                rv = self.make_response(rv)
+            rv = process_response(request, rv)
+
+        if timer is not None:
+            timer.record('middleware', started)
+        return rv
 
-        # Call all `process_response` methods of middlewares
-        for middleware in reversed(self.middlewares):
-            if hasattr(middleware, 'process_response'):
-                # Ensure that the second parameter passed to the
-                # `process_response` method is a `Response` object
-                response = self.make_response(rv)
-                rv = middleware.process_response(self.request, response)
+    def call_action(self, action, request, *args, **kwargs):
+        """Call the `action`, coalescing the call with the identical
+        requests in progress if :attr:`coalesce` is enabled, in which
+        case a :class:`~restart.response.Response` object is returned
+        (see :meth:`share_result`).
 
-        return rv
+        :param action: the bound action.
+        :param request: the request object.
+        :param args: the positional arguments captured from the URI.
+        :param kwargs: the keyword arguments captured from the URI.
+        """
+        key = self.get_coalescing_key(request)
+        if key is None:
+            return self.invoke_action(action, request, *args, **kwargs)
+
+        def produce():
+            rv = self.invoke_action(action, request, *args, **kwargs)
+            return self.share_result(rv, request, args, kwargs)
+
+        (response, snapshot), shared = self.flights.run(
+            key, produce, self.get_coalescing_timeout()
+        )
+        if not shared:
+            return response
+        if snapshot is None:
+            return self.invoke_action(action, request, *args, **kwargs)
+        return self.make_shared_response(snapshot)
+
+    def invoke_action(self, action, request, *args, **kwargs):
+        """Call the `action`, recording its duration (excluding the time
+        spent parsing the request payload) if the request is timed.
+
+        See :meth:`call_action` for the meanings of the parameters.
+        """
+        timer = request.timer
+        if timer is None:
+            return action(request, *args, **kwargs)
+        parse = timer.phases.get('parse', 0)
+        started = clock()
+        try:
+            return action(request, *args, **kwargs)
+        finally:
+            timer.record('action', started)
+            timer.add('action', parse - timer.phases.get('parse', 0))
+
+    def get_coalescing_key(self, request):
+        """Return the key identifying the requests coalesced with
+        `request`, or :attr:`None` if `request` should not be coalesced.
+
+        :param request: the request object.
+        """
+        if not self.coalesce or request.method not in ('GET', 'HEAD'):
+            return None
+        args = tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in iteritems(request.args)
+        ))
+        environ = request.environ
+        headers = tuple(
+            environ.get('HTTP_' + header.upper().replace('-', '_'))
+            for header in self.coalesce_vary
+        )
+        return (request.method, request.path, args, self.format_suffix,
+                headers)
+
+    def get_coalescing_timeout(self):
+        """Return the maximum number of seconds a coalesced request waits
+        for the identical request in progress.
+        """
+        timeout = self.coalesce_timeout
+        if timeout is None:
+            timeout = config.COALESCE_TIMEOUT
+        return timeout
+
+    def share_result(self, rv, request, args, kwargs):
+        """Convert the return value of the action of a coalesced request
+        to a response, and return a tuple `(response, snapshot)`, where
+        the snapshot is shared with the waiting requests (see
+        :meth:`make_shared_response`). The response is rendered by
+        :meth:`render_shared`, unless middlewares have `process_response`
+        methods, which must get it before rendering (see
+        :meth:`copy_shared`).
+
+        :param rv: the return value of the action.
+        :param request: the request object.
+        :param args: the positional arguments captured from the URI.
+        :param kwargs: the keyword arguments captured from the URI.
+        """
+        if self.response_processors:
+            return self.copy_shared(rv)
+        return self.render_shared(rv, request, args, kwargs)
+
+    def render_shared(self, rv, request, args, kwargs):
+        """Convert the return value of the action of a coalesced request
+        to a rendered response, and return a tuple `(response, snapshot)`.
+        The snapshot `(status_code, headers, body, True)` is shared with
+        the waiting requests, or it is :attr:`None` if the response cannot
+        be shared (e.g. it is streamed, or it cannot be rendered). This is
+        only used if there are no `process_response` methods of
+        middlewares (see :meth:`copy_shared`).
+
+        :param rv: the return value of the action.
+        :param request: the request object.
+        :param args: the positional arguments captured from the URI.
+        :param kwargs: the keyword arguments captured from the URI.
+        """
+        response = self.make_response(rv)
+        renderer_context = self.get_renderer_context(request, args, kwargs,
+                                                     response)
+        timer = request.timer
+        started = timer and clock()
+        try:
+            rendered = response.render(self.negotiator,
+                                       self.renderer_classes,
+                                       self.format_suffix, renderer_context,
+                                       request.environ.get('HTTP_ACCEPT'))
+        except exceptions.HTTPException:
+            # Leave the error to `finalize_response`
+            return response, None
+        finally:
+            if timer is not None:
+                timer.record('render', started)
+        if rendered.is_streamed:
+            return rendered, None
+        return rendered, (rendered.status_code, dict(rendered.headers),
+                          rendered.data, True)
+
+    def copy_shared(self, rv):
+        """Convert the return value of the action of a coalesced request
+        to a response, which is left unrendered for the `process_response`
+        methods of middlewares, and return a tuple `(response, snapshot)`.
+        The snapshot `(status_code, headers, data, False)` holds a deep
+        copy of the response data, which is copied again for each waiting
+        request, so that the middlewares of each request can alter their
+        own data. It is :attr:`None` if the data cannot be copied (e.g.
+        it is an iterator).
+
+        :param rv: the return value of the action.
+        """
+        response = self.make_response(rv)
+        if isinstance(response.data, Iterator):
+            return response, None
+        try:
+            data = copy.deepcopy(response.data)
+        except Exception:
+            return response, None
+        return response, (response.status_code, dict(response.headers),
+                          data, False)
+
+    def make_shared_response(self, snapshot):
+        """Make a response from the `snapshot` shared by the identical
+        request in progress (see :meth:`render_shared` and
+        :meth:`copy_shared`).
+
+        :param snapshot: a tuple `(status_code, headers, data,
+                         is_rendered)`.
+        """
+        status_code, headers, data, is_rendered = snapshot
+        if not is_rendered:
+            data = copy.deepcopy(data)
+        response = Response(data, status_code, dict(headers))
+        response.is_rendered = is_rendered
+        return response
+
+    def has_validators(self, request):
+        """Whether the :attr:`etag` or :attr:`last_modified` methods
+        should be called for the request.
+
+        :param request: the request object.
+        """
+        return (request.method in ('GET', 'HEAD') and
+                (self.etag is not None or self.last_modified is not None))
+
+    def check_not_modified(self, request, *args, **kwargs):
+        """Call the :attr:`etag` and :attr:`last_modified` methods (if
+        any), and return a 304 (Not Modified) response if the resource
+        is not modified according to the request, otherwise return
+        :attr:`None`.
+
+        See :meth:`dispatch_request` for the meanings of the parameters.
+        """
+        if not self.has_validators(request):
+            return None
+        timer = request.timer
+        started = timer and clock()
+        etag = last_modified = None
+        if self.etag is not None:
+            etag = self.etag(request, *args, **kwargs)
+        if self.last_modified is not None:
+            last_modified = self.last_modified(request, *args, **kwargs)
+        if timer is not None:
+            timer.record('validate', started)
+        return self.make_not_modified(request, etag, last_modified)
+
+    def make_not_modified(self, request, etag, last_modified):
+        """Remember the validators for the response, and return a 304
+        (Not Modified) response if the resource is not modified according
+        to the request, otherwise return :attr:`None`.
+
+        :param request: the request object.
+        :param etag: the ETag returned by :attr:`etag`.
+        :param last_modified: the time returned by :attr:`last_modified`.
+        """
+        validators = {}
+        if etag is not None:
+            if not etag.endswith('"'):
+                etag = quote_etag(etag)
+            validators['ETag'] = etag
+        if last_modified is not None:
+            validators['Last-Modified'] = http_date(last_modified)
+        self.validators = validators
+
+        if is_not_modified(request.environ, validators.get('ETag'),
+                           last_modified):
+            return Response(b'', 304, dict(validators))
+        return None
 
     def handle_exception(self, exc):
         """Handle any exception that occurs, by returning an appropriate
@@ -240,9 +797,9 @@ class Resource(object):
         :param exc: the exception to be handled.
         """
         if isinstance(exc, exceptions.HTTPException):
-            # Always render `HTTPException` messages into JSON
-            from .renderers import JSONRenderer
-            self.renderer_classes = (JSONRenderer,)
+            # Always render `HTTPException` messages with the error
+            # renderers (JSON by default)
+            self.renderer_classes = self.error_renderer_classes
 
             headers = dict(exc.get_headers(self.request.environ))
             rv = ({'message': exc.description}, exc.code, headers)
@@ -1,9 +1,93 @@
 from __future__ import absolute_import
 
-from werkzeug.http import HTTP_STATUS_CODES
+try:
+    from collections.abc import Iterator
+except ImportError:  # Python 2
+    from collections import Iterator
+
+import zlib
+
+from six import string_types, text_type
+from werkzeug.http import (
+    HTTP_STATUS_CODES, parse_date, parse_etags, unquote_etag
+)
 from werkzeug.wrappers import Response as WerkzeugSpecificResponse
 
 
+#: The headers dropped from 304 (Not Modified) responses, since they
+#: describe the omitted body.
+ENTITY_HEADERS = frozenset([
+    'content-type', 'content-length', 'content-encoding',
+    'content-language', 'content-md5', 'content-range',
+])
+
+
+def make_etag(body):
+    """Make a strong ETag (quoted) for `body`, which is derived from the
+    size and the CRC-32 and Adler-32 checksums of `body`. The checksums
+    are much faster than cryptographic hashes, and collisions are
+    harmless as long as they are rare.
+
+    :param body: the response body as bytes.
+    """
+    return '"%x-%08x%08x"' % (len(body), zlib.crc32(body) & 0xffffffff,
+                              zlib.adler32(body) & 0xffffffff)
+
+
+def add_vary(headers, name):
+    """Add `name` to the Vary header in `headers` (a dictionary), unless
+    it is already listed.
+
+    :param headers: the response headers.
+    :param name: the name of the request header.
+    """
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = name
+        return
+    names = [item.strip().lower() for item in vary.split(',')]
+    if name.lower() not in names and '*' not in names:
+        headers['Vary'] = '%s, %s' % (vary, name)
+
+
+def _to_utc(value):
+    """Convert `value` (a datetime, or an HTTP date string) into a naive
+    datetime in UTC, truncated to seconds.
+    """
+    if isinstance(value, string_types):
+        value = parse_date(value)
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(environ, etag=None, last_modified=None):
+    """Check whether the representation identified by `etag` and
+    `last_modified` is not modified according to the If-None-Match and
+    If-Modified-Since headers of the request. As required by RFC 7232,
+    If-Modified-Since is ignored if If-None-Match is present, and ETags
+    are compared weakly.
+
+    :param environ: the WSGI environment of the request.
+    :param etag: the quoted ETag of the representation.
+    :param last_modified: the last modification time of the
+                          representation, as a datetime or an HTTP date.
+    """
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if etag is None:
+            return False
+        return parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0])
+
+    if_modified_since = _to_utc(environ.get('HTTP_IF_MODIFIED_SINCE'))
+    last_modified = _to_utc(last_modified)
+    if if_modified_since is None or last_modified is None:
+        return False
+    return last_modified <= if_modified_since
+
+
 class Response(object):
     """The base response class used in RESTArt.
 
@@ -12,6 +96,9 @@ class Response(object):
     :param headers: a dictionary with HTTP header values.
     """
 
+    #: Whether :attr:`data` has been rendered (see :meth:`render`).
+    is_rendered = False
+
     def __init__(self, data, status=200, headers=None):
         self.data = data
         self.status_code = status
@@ -27,7 +114,7 @@ class Response(object):
         return _status
 
     def render(self, negotiator, renderer_classes, format_suffix,
-               renderer_context=None):
+               renderer_context=None, accept=None):
         """Return a response object with the data rendered.
 
         :param negotiator: the negotiator object used to select
@@ -39,15 +126,100 @@ class Response(object):
         :param format_suffix: the format suffix of the request uri.
         :param renderer_context: a dictionary containing extra context
                                  data that can be useful to the renderer.
+        :param accept: the value of the Accept header of the request.
+
+        Unless the format suffix selects the renderer, `Accept` is added
+        to the Vary header if there is more than one renderer class.
         """
         renderer_class = negotiator.select_renderer(
-            renderer_classes, format_suffix
+            renderer_classes, format_suffix, accept
         )
         renderer = renderer_class()
         self.data = renderer.render(self.data, renderer_context)
         self.headers.update({'Content-Type': renderer.content_type})
+        if not format_suffix and len(renderer_classes) > 1:
+            # The renderer depends on the Accept header
+            add_vary(self.headers, 'Accept')
+        self.is_rendered = True
         return self
 
+    @property
+    def is_streamed(self):
+        """Whether the rendered response body is an iterator of chunks
+        (see :meth:`~restart.renderers.JSONRenderer.render_stream`),
+        instead of a single string.
+        """
+        return isinstance(self.data, Iterator)
+
+    def get_body(self):
+        """Get the rendered response body as bytes. Renderers may return
+        either bytes, which are used as they are, or text, which is
+        encoded in UTF-8 (only once).
+
+        Note that a streamed body is joined into a single string, so use
+        :meth:`iter_body` instead to keep the memory usage bounded.
+        """
+        if self.is_streamed:
+            return b''.join(self.iter_body())
+        data = self.data
+        if isinstance(data, text_type):
+            data = data.encode('utf-8')
+        return data
+
+    def iter_body(self):
+        """Iterate over the rendered response body as non-empty chunks
+        of bytes. A body that is not streamed is yielded as one chunk.
+        """
+        if not self.is_streamed:
+            yield self.get_body()
+            return
+        for chunk in self.data:
+            if isinstance(chunk, text_type):
+                chunk = chunk.encode('utf-8')
+            # An empty chunk would end a chunked transfer prematurely
+            if chunk:
+                yield chunk
+
+    def add_etag(self):
+        """Add a strong ETag computed from the rendered body (see
+        :func:`make_etag`), unless the response already has an ETag or
+        the response is streamed (which would require buffering it).
+        """
+        if self.is_streamed or 'ETag' in self.headers:
+            return
+        # Keep the encoded body, so that it is not encoded again
+        self.data = self.get_body()
+        self.headers['ETag'] = make_etag(self.data)
+
+    def make_conditional(self, environ):
+        """Turn the response into a 304 (Not Modified) response without
+        body, if it is a successful response to a GET or HEAD request
+        whose conditions (see :func:`is_not_modified`) hold.
+
+        :param environ: the WSGI environment of the request.
+        """
+        if (environ.get('REQUEST_METHOD') not in ('GET', 'HEAD') or
+                not 200 <= self.status_code < 300):
+            return self
+        if is_not_modified(environ, self.headers.get('ETag'),
+                           self.headers.get('Last-Modified')):
+            self.set_not_modified()
+        return self
+
+    def set_not_modified(self):
+        """Turn the response into a 304 (Not Modified) response, dropping
+        the body and the headers that describe it.
+        """
+        close = getattr(self.data, 'close', None)
+        if close is not None:
+            close()
+        self.status_code = 304
+        self.data = b''
+        self.headers = {
+            key: value for key, value in self.headers.items()
+            if key.lower() not in ENTITY_HEADERS
+        }
+
     def __str__(self):
         return '<{} [{}]>'.format(self.__class__.__name__, self.status)
 
@@ -63,5 +235,5 @@ class WerkzeugResponse(Response):
 
     def get_specific_response(self):
         """Get the Werkzeug-specific response."""
-        return WerkzeugSpecificResponse(self.data, self.status_code,
-                                        self.headers)
+        body = self.iter_body() if self.is_streamed else self.get_body()
+        return WerkzeugSpecificResponse(body, self.status_code, self.headers)
@@ -0,0 +1,209 @@
+from __future__ import absolute_import
+
+import re
+from operator import itemgetter
+
+from six import iteritems
+from werkzeug.routing import (
+    Map as WerkzeugMap, PathConverter, ValidationError,
+    parse_rule, parse_converter_args
+)
+
+from .exceptions import NotFound, MethodNotAllowed
+
+
+class _Node(object):
+    """A node of the segment trie used by :class:`Router`."""
+
+    __slots__ = ('static', 'dynamic', 'endpoints')
+
+    def __init__(self):
+        #: A mapping from literal segments to child nodes.
+        self.static = {}
+        #: A list of `(key, segment, regex, converters, child)` tuples,
+        #: sorted by key (see :meth:`Router._get_sort_key`).
+        self.dynamic = []
+        #: A list of `(endpoint, methods)` tuples ending at this node.
+        self.endpoints = []
+
+
+class Router(object):
+    """The class used to match request paths against the API rules.
+
+    The rules are compiled once: static URIs are stored in a dictionary
+    (O(1) lookup), URIs with segment-local converters (e.g.
+    `/lists/<int:list_id>/cards/<int:card_id>`) are stored in a segment
+    trie, and the few URIs whose converters may span several segments
+    (e.g. `<path:name>`) are matched by a full regular expression.
+
+    Like Werkzeug's routing, static segments take precedence over
+    converter segments, and converter segments are ordered like
+    Werkzeug's rules: the more complex ones first (e.g.
+    `<pk>.<format>` before `<pk>`), then converters with lower weights
+    (e.g. `int`) before those with higher weights (e.g. `default`).
+
+    :param rules: a dictionary mapping endpoints to
+                  :class:`~restart.api.Rule` objects.
+    """
+
+    def __init__(self, rules):
+        self._map = WerkzeugMap()
+        self._static = {}
+        self._root = _Node()
+        self._fallback = []
+        for endpoint, rule in iteritems(rules):
+            self.add(rule.uri, endpoint, rule.methods)
+
+    def _get_methods(self, methods):
+        methods = set(method.upper() for method in methods)
+        # Keep consistent with Werkzeug, which allows `HEAD` implicitly
+        # if `GET` is allowed
+        if 'GET' in methods:
+            methods.add('HEAD')
+        return frozenset(methods)
+
+    def _compile(self, uri):
+        """Compile `uri` into a regular expression. Return a tuple in the
+        form `(regex, converters, weights, local)`, where `weights` are
+        computed as by Werkzeug's rules, and `local` indicates whether all
+        converters match within a single segment.
+        """
+        parts = []
+        converters = {}
+        weights = []
+        local = True
+        for converter, arguments, variable in parse_rule(uri):
+            if converter is None:
+                parts.append(re.escape(variable))
+                weights.extend((0, -len(part))
+                               for part in variable.split('/') if part)
+                continue
+            if arguments:
+                c_args, c_kwargs = parse_converter_args(arguments)
+            else:
+                c_args, c_kwargs = (), {}
+            converter_class = self._map.converters[converter]
+            converter_obj = converter_class(self._map, *c_args, **c_kwargs)
+            if isinstance(converter_obj, PathConverter):
+                local = False
+            parts.append('(?P<%s>%s)' % (variable, converter_obj.regex))
+            converters[variable] = converter_obj
+            weights.append((1, converter_obj.weight))
+        regex = re.compile(r'^%s$' % ''.join(parts))
+        return regex, converters, weights, local
+
+    def _get_sort_key(self, weights):
+        """Return the key ordering converter segments with `weights`,
+        like Werkzeug's `Rule.match_compare_key`.
+        """
+        return -len(weights), weights
+
+    def add(self, uri, endpoint, methods):
+        """Add a URI rule to the router.
+
+        :param uri: the URI with possible Werkzeug-style converters.
+        :param endpoint: the endpoint for the URI.
+        :param methods: the allowed HTTP methods for the URI.
+        """
+        methods = self._get_methods(methods)
+
+        if '<' not in uri:
+            self._static.setdefault(uri, []).append((endpoint, methods))
+            return
+
+        regex, converters, _, local = self._compile(uri)
+        if not local:
+            self._fallback.append((regex, converters, endpoint, methods))
+            return
+
+        node = self._root
+        for segment in uri[1:].split('/'):
+            if '<' not in segment:
+                node = node.static.setdefault(segment, _Node())
+                continue
+            for _, child_segment, _, _, child in node.dynamic:
+                if child_segment == segment:
+                    break
+            else:
+                regex, converters, weights, _ = self._compile(segment)
+                child = _Node()
+                node.dynamic.append((self._get_sort_key(weights), segment,
+                                     regex, converters, child))
+                # The sort is stable, so segments with the same key are
+                # matched in the order of registration
+                node.dynamic.sort(key=itemgetter(0))
+            node = child
+        node.endpoints.append((endpoint, methods))
+
+    def _convert(self, match, converters):
+        return {
+            name: converters[name].to_python(value)
+            for name, value in iteritems(match.groupdict())
+        }
+
+    def _walk(self, node, segments, index, kwargs):
+        """Yield all `(endpoint, methods, kwargs)` tuples matching
+        `segments[index:]` under `node`, in order of precedence.
+        """
+        if index == len(segments):
+            for endpoint, methods in node.endpoints:
+                yield endpoint, methods, kwargs
+            return
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            for found in self._walk(child, segments, index + 1, kwargs):
+                yield found
+
+        for _, _, regex, converters, child in node.dynamic:
+            match = regex.match(segment)
+            if match is None:
+                continue
+            try:
+                values = self._convert(match, converters)
+            except ValidationError:
+                continue
+            values.update(kwargs)
+            for found in self._walk(child, segments, index + 1, values):
+                yield found
+
+    def _iter_matches(self, path):
+        for found in self._walk(self._root, path[1:].split('/'), 0, {}):
+            yield found
+        for regex, converters, endpoint, methods in self._fallback:
+            match = regex.match(path)
+            if match is None:
+                continue
+            try:
+                kwargs = self._convert(match, converters)
+            except ValidationError:
+                continue
+            yield endpoint, methods, kwargs
+
+    def match(self, path, method):
+        """Match the request `path` and `method`. Return a tuple in the
+        form `(endpoint, kwargs)`, just as Werkzeug's `MapAdapter.match()`.
+
+        :param path: the request path, with a leading slash.
+        :param method: the request method.
+
+        Raise :class:`~werkzeug.exceptions.NotFound` if no rule matches
+        the `path`, or :class:`~werkzeug.exceptions.MethodNotAllowed` if
+        some rules match the `path` but none of them allows the `method`.
+        """
+        allowed = set()
+
+        for endpoint, methods in self._static.get(path, ()):
+            if method in methods:
+                return endpoint, {}
+            allowed.update(methods)
+
+        for endpoint, methods, kwargs in self._iter_matches(path):
+            if method in methods:
+                return endpoint, kwargs
+            allowed.update(methods)
+
+        if allowed:
+            raise MethodNotAllowed(valid_methods=sorted(allowed))
+        raise NotFound()
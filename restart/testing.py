@@ -4,6 +4,7 @@ from six import iteritems
 from werkzeug.test import Client as WerkzeugClient, EnvironBuilder
 from werkzeug.wrappers import Request as WerkzeugSpecificRequest
 
+from .adapter import WerkzeugAdapter
 from .serving import Service
 from .request import WerkzeugRequest
 from .response import Response
@@ -22,10 +23,13 @@ class Client(WerkzeugClient):
                                content_type='application/json')
 
     :param api: the RESTArt API object.
+    :param adapter_class: the class that is used to adapt the api object.
+                          Defaults to
+                          :class:`~restart.adapter.WerkzeugAdapter`.
     """
 
-    def __init__(self, api):
-        service = Service(api)
+    def __init__(self, api, adapter_class=WerkzeugAdapter):
+        service = Service(api, adapter_class)
         super(Client, self).__init__(service)
 
     def wrap_response(self, response):
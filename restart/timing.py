@@ -0,0 +1,249 @@
+from __future__ import absolute_import
+
+import time
+from threading import Lock
+
+from six import iteritems
+
+from .config import config
+from .logging import global_logger
+from .response import Response
+
+# `time.perf_counter` is not available on Python 2
+clock = getattr(time, 'perf_counter', time.time)
+
+#: The key of the :class:`Timer` object in the WSGI environment.
+ENVIRON_KEY = 'restart.timer'
+
+#: The endpoint of the requests matching no URI rule, which are answered
+#: with 404 (Not Found) or 405 (Method Not Allowed) by the router.
+UNROUTED_ENDPOINT = '-'
+
+#: The phases of a request, in the order they are reported:
+#:
+#: - `routing`: matching the URI to an endpoint.
+#: - `middleware`: the `process_request` and `process_response` methods
+#:   of middlewares.
+#: - `parse`: parsing the request payload (when it is accessed).
+#: - `validate`: the `etag` and `last_modified` methods of the resource.
+#: - `action`: the action, excluding the parsing of the payload.
+#: - `render`: rendering the response.
+#: - `postprocess`: the `process_rendered_response` methods of
+#:   middlewares (e.g. compression).
+PHASES = ('routing', 'middleware', 'parse', 'validate', 'action', 'render',
+          'postprocess')
+
+_subscribers = ()
+_start_subscribers = ()
+_subscribers_lock = Lock()
+
+
+class Timer(object):
+    """The durations of the phases of a request (see :data:`PHASES`),
+    measured with a monotonic clock.
+
+    :param method: the request method.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.started = clock()
+        #: The endpoint matched by the request, or :attr:`None` if the
+        #: URI was not matched.
+        self.endpoint = None
+        #: The status code of the response.
+        self.status_code = None
+        #: The total duration (in seconds) of the request, until the
+        #: response is ready to be sent.
+        self.total = None
+        #: A dictionary mapping phases to their durations (in seconds).
+        self.phases = {}
+
+    def add(self, phase, duration):
+        """Add `duration` (in seconds) to the duration of `phase`."""
+        self.phases[phase] = self.phases.get(phase, 0) + duration
+
+    def record(self, phase, started):
+        """Add the time elapsed since `started` (a value of :func:`clock`)
+        to the duration of `phase`, and return the current time, which
+        is the start of the next phase.
+        """
+        now = clock()
+        self.phases[phase] = self.phases.get(phase, 0) + (now - started)
+        return now
+
+    def get_server_timing(self):
+        """Return the value of the Server-Timing header, with the
+        durations in milliseconds.
+        """
+        phases = self.phases
+        metrics = [
+            '%s;dur=%.3f' % (phase, phases[phase] * 1000)
+            for phase in PHASES if phase in phases
+        ]
+        if self.total is not None:
+            metrics.append('total;dur=%.3f' % (self.total * 1000))
+        return ', '.join(metrics)
+
+
+def subscribe(subscriber):
+    """Subscribe to the timers of requests. Once subscribed, every
+    request is timed, and `subscriber` is called with the :class:`Timer`
+    object of each routed request, right before its response is sent.
+    If `subscriber` has a `start` method, it is also called with the
+    timer once the request is routed. Exceptions raised by subscribers
+    are logged and ignored.
+
+    Without subscribers (and with the `SERVER_TIMING` configuration
+    option disabled), requests are not timed at all.
+
+    :param subscriber: a callable accepting a :class:`Timer` object.
+    """
+    global _subscribers, _start_subscribers
+    with _subscribers_lock:
+        if subscriber not in _subscribers:
+            _subscribers = _subscribers + (subscriber,)
+            start = getattr(subscriber, 'start', None)
+            if start is not None:
+                _start_subscribers = _start_subscribers + (start,)
+
+
+def unsubscribe(subscriber):
+    """Unsubscribe `subscriber` from the timers of requests, if it is
+    subscribed.
+
+    :param subscriber: the subscribed callable.
+    """
+    global _subscribers, _start_subscribers
+    start = getattr(subscriber, 'start', None)
+    with _subscribers_lock:
+        _subscribers = tuple(item for item in _subscribers
+                             if item != subscriber)
+        _start_subscribers = tuple(item for item in _start_subscribers
+                                   if item != start)
+
+
+def _notify(subscribers, timer):
+    for subscriber in subscribers:
+        try:
+            subscriber(timer)
+        except Exception:
+            global_logger.exception('Exception in timing subscriber %r'
+                                    % subscriber)
+
+
+def start_timer(method):
+    """Return a new :class:`Timer` object for a request, or :attr:`None`
+    if requests are not timed.
+
+    :param method: the request method.
+    """
+    if not (_subscribers or config.SERVER_TIMING):
+        return None
+    return Timer(method.upper())
+
+
+def route_timer(timer, endpoint, environ=None):
+    """Record the routing phase of the request, which matched
+    `endpoint`, store `timer` in `environ` (see :data:`ENVIRON_KEY`),
+    and call the `start` methods of the subscribers.
+
+    :param timer: the :class:`Timer` object of the request.
+    :param endpoint: the endpoint matched by the request.
+    :param environ: the WSGI environment. If not specified (e.g. it is
+                    not made yet), the adapter must store `timer` in the
+                    environment itself.
+    """
+    timer.endpoint = endpoint
+    timer.record('routing', timer.started)
+    if environ is not None:
+        environ[ENVIRON_KEY] = timer
+    _notify(_start_subscribers, timer)
+
+
+def finish_timer(timer, response):
+    """Record the total duration of the request, add the Server-Timing
+    header to `response` if the `SERVER_TIMING` configuration option is
+    enabled, and call the subscribers.
+
+    :param timer: the :class:`Timer` object of the request.
+    :param response: the rendered response object, or :attr:`None` if
+                     an exception escaped from the dispatching (in which
+                     case the status code is recorded as 500).
+    """
+    timer.total = clock() - timer.started
+    if response is None:
+        timer.status_code = 500
+    else:
+        timer.status_code = response.status_code
+        if config.SERVER_TIMING:
+            response.headers['Server-Timing'] = timer.get_server_timing()
+    _notify(_subscribers, timer)
+
+
+def finish_unrouted_timer(timer, status_code):
+    """Record a request matching no URI rule, which the router answered
+    with `status_code`, under the :data:`UNROUTED_ENDPOINT` endpoint,
+    and call the subscribers (see :func:`route_timer` and
+    :func:`finish_timer`).
+
+    :param timer: the :class:`Timer` object of the request.
+    :param status_code: the status code of the response.
+    """
+    route_timer(timer, UNROUTED_ENDPOINT)
+    finish_timer(timer, Response(b'', status_code))
+
+
+class EndpointTimings(object):
+    """A subscriber, which aggregates the timers of requests by endpoint
+    and request method. Example::
+
+        from restart import timing
+
+        timings = timing.EndpointTimings()
+        timing.subscribe(timings)
+        ...
+        print(timings.get_stats())
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._stats = {}
+
+    def __call__(self, timer):
+        key = (timer.endpoint, timer.method)
+        durations = list(iteritems(timer.phases))
+        durations.append(('total', timer.total))
+        with self.lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {}
+            for phase, duration in durations:
+                item = stats.get(phase)
+                if item is None:
+                    stats[phase] = [1, duration, duration]
+                else:
+                    item[0] += 1
+                    item[1] += duration
+                    if duration > item[2]:
+                        item[2] = duration
+
+    def get_stats(self):
+        """Return a dictionary mapping `(endpoint, method)` tuples to
+        dictionaries, which map phases (and `total`) to dictionaries of
+        `count`, `total`, `mean` and `max` durations (in seconds).
+        """
+        with self.lock:
+            return dict(
+                (key, dict(
+                    (phase, dict(count=count, total=total,
+                                 mean=total / count, max=maximum))
+                    for phase, (count, total, maximum) in iteritems(stats)
+                ))
+                for key, stats in iteritems(self._stats)
+            )
+
+    def reset(self):
+        """Discard the aggregated timings."""
+        with self.lock:
+            self._stats.clear()
@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+
+from tempfile import SpooledTemporaryFile
+
+from werkzeug.datastructures import FileStorage
+
+from .config import config
+
+
+class UploadHandler(object):
+    """The base class for streaming upload handlers.
+
+    For each file in a multipart request, the
+    :class:`~restart.parsers.MultiPartParser` creates an upload handler
+    object, and feeds the file content to it chunk by chunk as soon as
+    the content is read from the request stream. Thus checksums, size
+    limits or writes to the final storage can be done on the fly, without
+    holding the whole file anywhere.
+
+    Example::
+
+        import hashlib
+
+        class HashingUploadHandler(SpooledUploadHandler):
+
+            def __init__(self, *args, **kwargs):
+                super(HashingUploadHandler, self).__init__(*args, **kwargs)
+                self.sha256 = hashlib.sha256()
+
+            def receive_chunk(self, chunk):
+                self.sha256.update(chunk)
+                super(HashingUploadHandler, self).receive_chunk(chunk)
+
+            def file_complete(self, size):
+                storage = super(HashingUploadHandler, self).file_complete(size)
+                storage.sha256 = self.sha256.hexdigest()
+                return storage
+
+    :param name: the name of the form field.
+    :param filename: the filename sent by the client.
+    :param content_type: the content type of the file.
+    :param headers: the headers of the multipart part.
+    :param context: the parser context (see
+                    :meth:`~restart.resource.Resource.get_parser_context`).
+    """
+
+    def __init__(self, name, filename, content_type, headers, context=None):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers
+        self.context = context
+
+    def receive_chunk(self, chunk):
+        """Receive a chunk of the file content.
+
+        :param chunk: the chunk as bytes.
+        """
+        raise NotImplementedError()
+
+    def file_complete(self, size):
+        """Called when the whole file has been received. Return the object
+        that will be stored in `request.files`.
+
+        :param size: the size of the file in bytes.
+        """
+        raise NotImplementedError()
+
+    def abort(self):
+        """Called if the upload fails (e.g. the request payload is
+        invalid), even after the file is complete, or if the file is
+        discarded (e.g. it has the same field name as a previous file).
+        It is meant for releasing the resources held by the handler.
+        """
+
+
+class SpooledUploadHandler(UploadHandler):
+    """The default upload handler, which keeps small files in memory and
+    spools larger ones to temporary files on disk. The file content is
+    written only once, and the resulting
+    :class:`~werkzeug.datastructures.FileStorage` object wraps the
+    spooled file directly.
+
+    See :class:`UploadHandler` for the meanings of the parameters.
+    """
+
+    #: The maximum size of a file kept in memory, in bytes. If
+    #: :attr:`None`, the `UPLOAD_SPOOL_SIZE` configuration option
+    #: will be used.
+    spool_size = None
+
+    def __init__(self, *args, **kwargs):
+        super(SpooledUploadHandler, self).__init__(*args, **kwargs)
+        spool_size = self.spool_size
+        if spool_size is None:
+            spool_size = config.UPLOAD_SPOOL_SIZE
+        self.file = SpooledTemporaryFile(max_size=spool_size,
+                                         dir=config.UPLOAD_TEMP_DIR)
+
+    def receive_chunk(self, chunk):
+        self.file.write(chunk)
+
+    def file_complete(self, size):
+        self.file.seek(0)
+        return FileStorage(self.file, self.filename, self.name,
+                           self.content_type, size, headers=self.headers)
+
+    def abort(self):
+        self.file.close()
@@ -4,10 +4,13 @@ import re
 import os
 import sys
 import glob
-from threading import RLock
+from collections import OrderedDict
+from threading import Event, Lock, RLock
 
 from werkzeug.utils import import_string
 
+from .exceptions import RequestEntityTooLarge, ServiceUnavailable
+
 
 def load_resources(module_names):
     """Import all modules in ``module_names`` to load resources.
@@ -163,6 +166,162 @@ class locked_cached_classproperty(locked_cached_property):
             return value
 
 
+class BoundedCache(object):
+    """A thread-safe mapping with a bounded size, which is used to
+    memoize the results of parsing a few distinct values (e.g. header
+    strings). When the cache is full, the oldest item is evicted.
+
+    Lookups do not acquire the lock, since reading a dictionary is
+    atomic in CPython.
+
+    :param maxsize: the maximum number of items in the cache.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.lock = Lock()
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value for `key` if `key` is in the cache,
+        else `default`.
+        """
+        return self._data.get(key, default)
+
+    def set(self, key, value):
+        """Set the value for `key`, evicting the oldest item if the
+        cache is full.
+        """
+        with self.lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+            self._data[key] = value
+
+    def clear(self):
+        """Remove all items from the cache."""
+        with self.lock:
+            self._data.clear()
+
+
+class SizeLimitedStream(object):
+    """A read-only file-like object, which reads from `stream` until its
+    end, and raises :exc:`~werkzeug.exceptions.RequestEntityTooLarge` as
+    soon as more than `max_size` bytes have been read. It is meant for
+    request payloads whose length is unknown in advance (e.g. those sent
+    with chunked transfer encoding).
+
+    :param stream: the request stream, which must be terminated (i.e.
+                   reading from it returns no data at its end).
+    :param max_size: the maximum size (in bytes) of the payload.
+    :param chunk_size: the size (in bytes) of each read from `stream`
+                       when the whole payload is read at once.
+    """
+
+    def __init__(self, stream, max_size, chunk_size=65536):
+        self.stream = stream
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+
+    def _count(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise RequestEntityTooLarge(
+                'The request payload is too large'
+            )
+        return data
+
+    def _limit(self, size):
+        # Never read more than one byte past the maximum size
+        limit = self.max_size - self.size + 1
+        if size is None or size < 0:
+            return limit
+        return min(size, limit)
+
+    def read(self, size=-1):
+        if size is not None and size >= 0:
+            return self._count(self.stream.read(self._limit(size)))
+        chunks = []
+        while True:
+            chunk = self._count(self.stream.read(
+                self._limit(self.chunk_size)
+            ))
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def readline(self, size=-1):
+        return self._count(self.stream.readline(self._limit(size)))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+
+class _Flight(object):
+    """A call in flight of :class:`SingleFlight`."""
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """A thread-safe helper, which coalesces concurrent calls with the
+    same key: the first call (the leader) calls the function, while the
+    others wait for it to finish and share its result, or its exception.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._flights = {}
+
+    def run(self, key, func, timeout=None):
+        """Call `func` without arguments, or wait for the call in flight
+        with the same `key`. Return a tuple `(result, shared)`, where
+        `shared` is :attr:`True` if `result` comes from the call of
+        another thread.
+
+        :param key: a hashable key.
+        :param func: the function to be called.
+        :param timeout: the maximum number of seconds to wait for the
+                        call in flight. If it is exceeded,
+                        :exc:`~werkzeug.exceptions.ServiceUnavailable`
+                        will be raised. If :attr:`None`, wait forever.
+        """
+        with self.lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as exc:
+                flight.error = exc
+                raise
+            finally:
+                with self.lock:
+                    del self._flights[key]
+                flight.event.set()
+            return flight.result, False
+
+        if not flight.event.wait(timeout):
+            raise ServiceUnavailable(
+                'Timed out waiting for an identical request in progress'
+            )
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+
 def make_location_header(request, pk):
     """Make the Location header for the newly-created resource.
 
@@ -0,0 +1,8 @@
+import sys
+
+
+collect_ignore = []
+
+# The ASGI support relies on the `async`/`await` syntax
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_asgi.py')
@@ -6,8 +6,8 @@ from werkzeug.wrappers import Response as WerkzeugSpecificResponse
 from restart.api import RESTArt
 from restart.resource import Resource
 from restart.response import Response
-from restart.adapter import Adapter, WerkzeugAdapter
-from restart.testing import RequestFactory
+from restart.adapter import Adapter, WerkzeugAdapter, WSGIAdapter
+from restart.testing import Client, RequestFactory
 
 factory = RequestFactory()
 
@@ -22,6 +22,17 @@ class Demo(Resource):
         return "I'm a demo"
 
 
+stream_api = RESTArt()
+
+
+@stream_api.route(uri='/stream', methods=['GET'])
+class Stream(Resource):
+    name = 'stream'
+
+    def read(self, request):
+        return (i for i in range(3))
+
+
 def dummy_handler(*args, **kwargs):
     return Response('dummy')
 
@@ -64,3 +75,102 @@ class TestWerkzeugAdapter(object):
         request = factory.get('/demo')
         response = adapter.adapt_handler(dummy_handler, request)
         assert isinstance(response, WerkzeugSpecificResponse)
+
+
+class TestWSGIAdapter(object):
+
+    def test_adapt_handler(self):
+        adapter = WSGIAdapter(api)
+        request = factory.get('/demo')
+        response = adapter.adapt_handler(dummy_handler, request.environ)
+        assert isinstance(response, Response)
+
+    def test_send_response(self):
+        adapter = WSGIAdapter(api)
+        request = factory.get('/demo')
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        response = Response(b'bytes', 201, {'Content-Type': 'text/plain'})
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert body == [b'bytes']
+        assert started[-1] == ('201 CREATED', {'Content-Type': 'text/plain',
+                                               'Content-Length': '5'})
+
+        response = Response(u'\u4e2d', 200)
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert body == [b'\xe4\xb8\xad']
+        assert started[-1] == ('200 OK', {'Content-Length': '3'})
+
+        response = Response(b'', 204)
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert body == [b'']
+        assert started[-1] == ('204 NO CONTENT', {})
+
+    def test_send_response_to_head_request(self):
+        adapter = WSGIAdapter(api)
+        request = factory.head('/demo')
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        response = Response(b'bytes', 200)
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert body == [b'']
+        assert started[-1] == ('200 OK', {'Content-Length': '5'})
+
+    def test_send_streamed_response(self):
+        adapter = WSGIAdapter(stream_api)
+        request = factory.get('/stream')
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        response = Response(iter([b'[1', b',2]']), 200)
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert not isinstance(body, list)
+        assert started[-1] == ('200 OK', {})
+        assert list(body) == [b'[1', b',2]']
+
+        request = factory.head('/stream')
+        response = Response(iter([b'[1', b',2]']), 200)
+        body = adapter.send_response(response, request.environ,
+                                     start_response)
+        assert body == [b'']
+
+    def test_wsgi_app_streamed(self):
+        for adapter_class in (WerkzeugAdapter, WSGIAdapter):
+            client = Client(stream_api, adapter_class)
+            response = client.get('/stream')
+            assert response.data == b'[0,1,2]'
+            assert response.headers['Content-Type'] == 'application/json'
+            assert 'Content-Length' not in response.headers
+
+    def test_wsgi_app(self):
+        client = Client(api, WSGIAdapter)
+
+        response = client.get('/demo')
+        assert response.data == b'"I\'m a demo"'
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.headers['Content-Length'] == '12'
+
+        response = client.post('/demo')
+        assert response.status_code == 405
+
+        response = client.get('/unknown')
+        assert response.status_code == 404
+
+    def test_get_embedded_rules(self):
+        adapter = WSGIAdapter(api)
+        with pytest.raises(NotImplementedError):
+            adapter.get_embedded_rules()
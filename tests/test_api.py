@@ -5,6 +5,7 @@ import pytest
 from restart.api import RESTArt
 from restart.resource import Resource
 from restart.config import config
+from restart.testing import RequestFactory
 
 
 class TestAPI(object):
@@ -109,3 +110,113 @@ class TestAPI(object):
             item_rule,
             ('/users/<pk>', ['OPTIONS', 'GET', 'PUT', 'PATCH', 'DELETE'], User)
         )
+
+    def test_handler_actions(self):
+        api = RESTArt()
+
+        @api.register
+        class User(Resource):
+            name = 'users'
+
+            def index(self, request):
+                pass
+
+        list_handler = api.rules['users_list'].handler
+        assert list_handler.actions['GET'] is User.__dict__['index']
+        assert list_handler.actions['POST'] is None
+        # Not allowed by the rule, although it's in the action map
+        assert list_handler.actions['DELETE'] is None
+        assert list_handler.allowed_methods == ['GET']
+
+        item_handler = api.rules['users_item'].handler
+        assert item_handler.allowed_methods == []
+
+    def test_handler_rejects_without_instantiating_resource(self):
+        api = RESTArt()
+
+        @api.register
+        class User(Resource):
+            name = 'users'
+
+            def __init__(self, *args, **kwargs):
+                raise AssertionError('Should not be instantiated')
+
+            def index(self, request):
+                pass
+
+        request = RequestFactory().post('/users')
+        response = api.rules['users_list'].handler(request)
+        assert response.status_code == 405
+        assert response.headers['Allow'] == 'GET'
+        assert response.data == (b'{"message":"The method is not allowed '
+                                 b'for the requested URL."}')
+
+    def test_handler_with_lowercase_methods(self):
+        api = RESTArt()
+
+        @api.route(uri='/users', methods=['get'])
+        class User(Resource):
+            name = 'users'
+
+            def read(self, request):
+                return []
+
+        handler = api.rules['users'].handler
+        assert handler.allowed_methods == ['GET']
+        response = handler(RequestFactory().get('/users'))
+        assert response.status_code == 200
+
+    def test_handler_with_class_and_static_actions(self):
+        api = RESTArt()
+
+        @api.register
+        class User(Resource):
+            name = 'users'
+
+            @classmethod
+            def index(cls, request):
+                return [cls.name]
+
+            @staticmethod
+            def create(request):
+                return {'id': 1}, 201
+
+        handler = api.rules['users_list'].handler
+        response = handler(RequestFactory().get('/users'))
+        assert response.data == b'["users"]'
+        response = handler(RequestFactory().post('/users'))
+        assert response.status_code == 201
+
+    def test_handler_dispatches_with_overridden_rejection(self):
+        api = RESTArt()
+
+        @api.register
+        class User(Resource):
+            name = 'users'
+
+            def index(self, request):
+                pass
+
+            def http_method_not_allowed(self, request, *args, **kwargs):
+                return {'message': 'Read-only'}, 405
+
+        @api.register
+        class Group(Resource):
+            name = 'groups'
+
+            def index(self, request):
+                pass
+
+            def handle_exception(self, exc):
+                return {'error': exc.description}, exc.code
+
+        assert not User.rejects_directly
+        assert not Group.rejects_directly
+        request = RequestFactory().post('/users')
+        response = api.rules['users_list'].handler(request)
+        assert response.status_code == 405
+        assert response.data == b'{"message":"Read-only"}'
+        request = RequestFactory().post('/groups')
+        response = api.rules['groups_list'].handler(request)
+        assert response.status_code == 405
+        assert response.data.startswith(b'{"error":')
@@ -0,0 +1,314 @@
+from __future__ import absolute_import
+
+import asyncio
+import threading
+
+from restart.api import RESTArt
+from restart.asgi import ASGIAdapter, ASGIService
+from restart.config import config
+from restart.resource import Resource
+from restart.testing import Client
+
+import test_testing
+from test_testing import TestClient as _TestClient
+
+
+api = RESTArt()
+
+
+class AsyncMiddleware(object):
+
+    async def process_request(self, request):
+        if request.args.get('refuse'):
+            return 'You are refused'
+
+    async def process_response(self, request, response):
+        response.headers['X-Async'] = 'yes'
+        return response
+
+
+@api.register
+class Things(Resource):
+    name = 'things'
+
+    middleware_classes = (AsyncMiddleware,)
+
+    async def index(self, request):
+        await asyncio.sleep(0)
+        return [{'name': 'thing_1'}]
+
+    async def create(self, request):
+        return request.data, 201
+
+    def read(self, request, pk):
+        return {'pk': pk, 'thread': threading.current_thread().name}
+
+
+@api.route(uri='/numbers', methods=['GET'])
+class Numbers(Resource):
+    name = 'numbers'
+
+    async def etag(self, request):
+        await asyncio.sleep(0)
+        return 'v1'
+
+    def read(self, request):
+        return iter(range(3))
+
+
+@api.route(uri='/slow', methods=['GET'])
+class Slow(Resource):
+    name = 'slow'
+    coalesce = True
+    calls = []
+
+    async def read(self, request):
+        self.calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'calls': len(self.calls)}
+
+
+class MarkMiddleware(object):
+
+    def process_response(self, request, response):
+        response.data['mw'] = True
+        return response
+
+
+@api.route(uri='/slow-marked', methods=['GET'])
+class SlowMarked(Resource):
+    name = 'slow_marked'
+    coalesce = True
+    middleware_classes = (MarkMiddleware,)
+    calls = []
+
+    async def read(self, request):
+        self.calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'calls': len(self.calls)}
+
+
+class TestASGIClient(_TestClient):
+    """Run the existing test client suite against the ASGI path."""
+
+    client = Client(test_testing.api, ASGIAdapter)
+
+
+class TestASGIAdapter(object):
+
+    client = Client(api, ASGIAdapter)
+
+    def test_async_action(self):
+        response = self.client.get('/things')
+        assert response.data == b'[{"name":"thing_1"}]'
+        assert response.status_code == 200
+        assert response.headers['Content-Length'] == '20'
+
+    def test_async_action_with_data(self):
+        response = self.client.post('/things', data='{"name": "thing_2"}',
+                                    content_type='application/json')
+        assert response.data == b'{"name":"thing_2"}'
+        assert response.status_code == 201
+
+    def test_sync_action_runs_in_thread_pool(self):
+        response = self.client.get('/things/1')
+        assert response.status_code == 200
+        assert b'"pk":"1"' in response.data
+        assert b'MainThread' not in response.data
+
+    def test_async_middlewares(self):
+        response = self.client.get('/things?refuse=1')
+        assert response.data == b'"You are refused"'
+        assert response.headers['X-Async'] == 'yes'
+
+    def test_not_found_and_method_not_allowed(self):
+        assert self.client.get('/unknown').status_code == 404
+
+        response = self.client.delete('/things')
+        assert response.status_code == 405
+        assert 'GET' in response.headers['Allow']
+
+
+class TestASGIService(object):
+
+    def call(self, service, scope, body=b''):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body,
+                    'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(service(scope, receive, send))
+        finally:
+            loop.close()
+        return messages
+
+    def test_call(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/things',
+            'query_string': b'',
+            'headers': [(b'content-type', b'application/json')],
+        }
+        start, body = self.call(service, scope, b'{"name": "thing_3"}')
+        assert start['status'] == 201
+        assert (b'Content-Length', b'18') in start['headers']
+        assert body['body'] == b'{"name":"thing_3"}'
+
+    def test_call_with_chunked_body_too_large(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/things',
+            'query_string': b'',
+            'headers': [(b'content-type', b'application/json'),
+                        (b'transfer-encoding', b'chunked')],
+        }
+        initial_max_size = config.REQUEST_MAX_CHUNKED_SIZE
+        config.REQUEST_MAX_CHUNKED_SIZE = 10
+        try:
+            start, _ = self.call(service, scope, b'{"name": "thing_3"}')
+        finally:
+            config.REQUEST_MAX_CHUNKED_SIZE = initial_max_size
+        assert start['status'] == 413
+
+    def test_call_with_body_too_large(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/things',
+            'query_string': b'',
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', b'19')],
+        }
+        receive_calls = []
+
+        async def receive():
+            receive_calls.append(True)
+            return {'type': 'http.request', 'body': b'{"name": "thing_3"}',
+                    'more_body': False}
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        initial_max_size = config.REQUEST_MAX_CHUNKED_SIZE
+        config.REQUEST_MAX_CHUNKED_SIZE = 10
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(service(scope, receive, send))
+        finally:
+            loop.close()
+            config.REQUEST_MAX_CHUNKED_SIZE = initial_max_size
+        assert messages[0]['status'] == 413
+        # Rejected before reading the body
+        assert receive_calls == []
+
+    def test_call_with_body_longer_than_declared(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/things',
+            'query_string': b'',
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', b'2')],
+        }
+        initial_max_size = config.REQUEST_MAX_CHUNKED_SIZE
+        config.REQUEST_MAX_CHUNKED_SIZE = 10
+        try:
+            start, _ = self.call(service, scope, b'{"name": "thing_3"}')
+        finally:
+            config.REQUEST_MAX_CHUNKED_SIZE = initial_max_size
+        assert start['status'] == 413
+
+    def test_call_not_modified(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/numbers',
+            'query_string': b'',
+            'headers': [(b'if-none-match', b'"v1"')],
+        }
+        start, body = self.call(service, scope)
+        assert start['status'] == 304
+        assert (b'ETag', b'"v1"') in start['headers']
+        assert body['body'] == b''
+
+    def test_call_streamed(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/numbers',
+            'query_string': b'',
+            'headers': [],
+        }
+        messages = self.call(service, scope)
+        start, chunks = messages[0], messages[1:]
+        assert start['status'] == 200
+        assert not any(key == b'Content-Length'
+                       for key, _ in start['headers'])
+        assert chunks[0] == {'type': 'http.response.body',
+                             'body': b'[0,1,2]', 'more_body': True}
+        assert chunks[-1] == {'type': 'http.response.body', 'body': b''}
+
+    def call_concurrently(self, service, scope, count):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'',
+                    'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async def main():
+            await asyncio.gather(*[service(dict(scope), receive, send)
+                                   for _ in range(count)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(main())
+        finally:
+            loop.close()
+        return [message['body'] for message in messages
+                if message['type'] == 'http.response.body']
+
+    def test_call_coalesced(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/slow',
+            'query_string': b'',
+            'headers': [],
+        }
+        bodies = self.call_concurrently(service, scope, 3)
+        assert Slow.calls == [1]
+        assert bodies == [b'{"calls":1}'] * 3
+
+    def test_call_coalesced_with_middlewares(self):
+        service = ASGIService(api)
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/slow-marked',
+            'query_string': b'',
+            'headers': [],
+        }
+        bodies = self.call_concurrently(service, scope, 3)
+        # The middleware processes the data of each request, unrendered
+        assert SlowMarked.calls == [1]
+        assert bodies == [b'{"calls":1,"mw":true}'] * 3
@@ -0,0 +1,332 @@
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+
+import pytest
+
+from restart import cache as cache_module
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.cache import FileCache, MemoryCache, ResponseCacheMiddleware
+from restart.renderers import JSONRenderer, Renderer
+from restart.resource import Resource
+from restart.testing import RequestFactory
+
+
+class TestMemoryCache(object):
+
+    def test_get_and_set(self):
+        cache = MemoryCache(1024, shards=4)
+        assert cache.get('a') is None
+        cache.set('a', 1, 10)
+        assert cache.get('a') == 1
+        cache.delete('a')
+        assert cache.get('a') is None
+        assert cache.stats() == dict(hits=1, misses=2, evictions=0,
+                                     items=0, size=0)
+
+    def test_ttl(self, monkeypatch):
+        now = [100]
+        monkeypatch.setattr(cache_module, '_monotonic', lambda: now[0])
+        cache = MemoryCache(1024)
+        cache.set('a', 1, 10, ttl=5)
+        assert cache.get('a') == 1
+        now[0] = 105
+        assert cache.get('a') is None
+        assert cache.stats()['size'] == 0
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(30, shards=1)
+        cache.set('a', 1, 10)
+        cache.set('b', 2, 10)
+        cache.set('c', 3, 10)
+        cache.get('a')
+        cache.set('d', 4, 10)
+        assert cache.get('b') is None
+        assert [cache.get(key) for key in 'acd'] == [1, 3, 4]
+        # Values larger than the budget are not cached
+        cache.set('e', 5, 31)
+        assert cache.get('e') is None
+
+        stats = cache.stats()
+        assert stats['evictions'] == 1
+        assert stats['items'] == 3
+        assert stats['size'] == 30
+
+        cache.clear()
+        assert cache.stats()['items'] == 0
+
+    def test_generation(self):
+        cache = MemoryCache(1024)
+        generation = cache.generation('todos')
+        assert cache.generation('todos') == generation
+        cache.bump('todos')
+        assert cache.generation('todos') != generation
+
+
+def set_in_child(directory):
+    FileCache(1024, directory).set(('todos', 1), {'id': 1}, 10)
+
+
+class TestFileCache(object):
+
+    def test_get_and_set(self, tmpdir):
+        cache = FileCache(1024, str(tmpdir))
+        assert cache.get(('todos', 1)) is None
+        cache.set(('todos', 1), (200, {'ETag': '"x"'}, b'body'), 10)
+        assert cache.get(('todos', 1)) == (200, {'ETag': '"x"'}, b'body')
+        cache.delete(('todos', 1))
+        assert cache.get(('todos', 1)) is None
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['items']) == (1, 2, 0)
+
+    def test_ttl(self, tmpdir, monkeypatch):
+        now = [100]
+        monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+        cache = FileCache(1024, str(tmpdir))
+        cache.set('a', 1, 10, ttl=5)
+        assert cache.get('a') == 1
+        now[0] = 105
+        assert cache.get('a') is None
+        assert cache.stats()['items'] == 0
+
+    def test_cull(self, tmpdir):
+        cache = FileCache(1024, str(tmpdir))
+        for i in range(3):
+            cache.set(i, b'x' * 300, 300)
+            # Make the modification times distinct and increasing
+            os.utime(cache._get_path(cache.items_dir, i), (i + 1, i + 1))
+        assert cache.stats()['items'] == 3
+        os.utime(cache._get_path(cache.items_dir, 0), (10, 10))
+        # Exceeding the budget evicts the least recently used item
+        cache.set(3, b'x' * 300, 300)
+        assert [cache.get(i) is not None for i in range(4)] == \
+            [True, False, True, True]
+        assert cache.stats()['evictions'] == 1
+        # Values larger than the budget are not cached
+        cache.set('large', b'x' * 2000, 2000)
+        assert cache.get('large') is None
+
+        cache.clear()
+        assert cache.stats()['items'] == 0
+
+    def test_shared_between_processes(self, tmpdir):
+        process = multiprocessing.Process(target=set_in_child,
+                                          args=(str(tmpdir),))
+        process.start()
+        process.join()
+        cache = FileCache(1024, str(tmpdir))
+        assert cache.get(('todos', 1)) == {'id': 1}
+
+    def test_directory_permissions(self, tmpdir):
+        directory = tmpdir.join('cache')
+        FileCache(1024, str(directory))
+        assert directory.stat().mode & 0o777 == 0o700
+        # Directories writable by others are refused
+        directory.chmod(0o777)
+        with pytest.raises(RuntimeError):
+            FileCache(1024, str(directory))
+
+    def test_secret(self, tmpdir):
+        cache = FileCache(1024, str(tmpdir), secret='secret')
+        cache.set('a', 1, 10)
+        assert cache.get('a') == 1
+        # Items written with another key are ignored
+        FileCache(1024, str(tmpdir), secret='other').set('a', 2, 10)
+        assert cache.get('a') is None
+        FileCache(1024, str(tmpdir)).set('a', 3, 10)
+        assert cache.get('a') is None
+
+    def test_generation(self, tmpdir):
+        first = FileCache(1024, str(tmpdir))
+        second = FileCache(1024, str(tmpdir))
+        generation = first.generation('todos')
+        assert second.generation('todos') == generation
+        second.bump('todos')
+        assert first.generation('todos') != generation
+
+
+class TextRenderer(Renderer):
+    content_type = 'text/plain'
+    format_suffix = 'txt'
+
+    def render(self, data, context=None):
+        return repr(data)
+
+
+class TestResponseCacheMiddleware(object):
+
+    def make_adapter(self, calls, cache_ttl=None, backend_class=None):
+        class Middleware(ResponseCacheMiddleware):
+            pass
+        Middleware.backend_class = backend_class
+
+        api = RESTArt()
+
+        @api.register(pk='<int:todo_id>')
+        class Todos(Resource):
+            name = 'todos'
+            middleware_classes = (Middleware,)
+
+            def index(self, request):
+                calls.append('index')
+                return [{'id': 1}], 200, {'Vary': 'Accept-Language'}
+
+            def read(self, request, todo_id):
+                calls.append('read')
+                return {'id': todo_id}
+
+            def create(self, request):
+                return {'id': 2}, 201
+
+        @api.register
+        class Notes(Resource):
+            name = 'notes'
+            renderer_classes = (JSONRenderer, TextRenderer)
+            middleware_classes = (Middleware,)
+
+            def index(self, request):
+                calls.append('notes')
+                return ['note']
+
+        @api.route
+        class Pages(Resource):
+            name = 'pages'
+            middleware_classes = (Middleware,)
+
+            def read(self, request):
+                calls.append('read')
+                return {'id': 1}
+
+            def head(self, request):
+                calls.append('head')
+                return {}
+
+        Todos.cache_ttl = cache_ttl
+        self.middleware_class = Middleware
+        return WSGIAdapter(api)
+
+    def request(self, adapter, method, path, **kwargs):
+        environ = getattr(RequestFactory(), method)(path, **kwargs).environ
+        statuses = []
+
+        def start_response(status, headers):
+            statuses.append((status, dict(headers)))
+
+        body = b''.join(adapter.wsgi_app(environ, start_response))
+        status, headers = statuses[0]
+        return status, headers, body
+
+    def test_cache_hit(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        first = self.request(adapter, 'get', '/todos/1')
+        assert self.request(adapter, 'get', '/todos/1') == first
+        assert calls == ['read']
+        self.request(adapter, 'get', '/todos/2')
+        self.request(adapter, 'get', '/todos/1?x=1')
+        assert calls == ['read', 'read', 'read']
+        # Conditional requests are answered from the cache too
+        status, _, _ = self.request(
+            adapter, 'get', '/todos/1',
+            headers={'If-None-Match': first[1]['ETag']}
+        )
+        assert status == '304 NOT MODIFIED'
+        assert calls == ['read', 'read', 'read']
+
+        # Each hit looks up the Vary headers of the key, then the response
+        stats = self.middleware_class.cache.stats()
+        assert stats['hits'] == 4
+        assert stats['misses'] == 3
+
+    def test_head_and_get(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        status, _, body = self.request(adapter, 'head', '/pages')
+        assert status == '200 OK'
+        assert body == b''
+        _, _, body = self.request(adapter, 'get', '/pages')
+        assert body == b'{"id":1}'
+        assert self.request(adapter, 'head', '/pages')[2] == b''
+        assert self.request(adapter, 'get', '/pages')[2] == b'{"id":1}'
+        assert calls == ['head', 'read']
+
+    def test_vary(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        for language in ('en', 'fr', 'en', 'fr'):
+            self.request(adapter, 'get', '/todos',
+                         headers={'Accept-Language': language})
+        assert calls == ['index', 'index']
+
+    def test_vary_per_key(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        # The Vary headers of the list do not apply to the items
+        for path in ('/todos', '/todos/1', '/todos', '/todos/1'):
+            self.request(adapter, 'get', path)
+        assert calls == ['index', 'read']
+
+    def test_accept(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        responses = [
+            self.request(adapter, 'get', '/notes',
+                         headers={'Accept': accept})
+            for accept in ('text/plain', 'application/json', 'text/plain')
+        ]
+        assert calls == ['notes', 'notes']
+        assert responses[0][2] == b"['note']"
+        assert responses[1][2] == b'["note"]'
+        assert responses[2] == responses[0]
+
+    def test_private_requests(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        _, _, alice = self.request(adapter, 'get', '/todos/1',
+                                   headers={'Authorization': 'Bearer alice'})
+        self.request(adapter, 'get', '/todos/1',
+                     headers={'Authorization': 'Bearer bob'})
+        self.request(adapter, 'get', '/todos/1',
+                     headers={'Cookie': 'session=carol'})
+        assert calls == ['read', 'read', 'read']
+        # Nor are they answered with the responses of anonymous requests
+        self.request(adapter, 'get', '/todos/1')
+        self.request(adapter, 'get', '/todos/1',
+                     headers={'Authorization': 'Bearer alice'})
+        assert calls == ['read', 'read', 'read', 'read', 'read']
+
+    def test_invalidate_on_write(self):
+        calls = []
+        adapter = self.make_adapter(calls)
+        self.request(adapter, 'get', '/todos')
+        self.request(adapter, 'get', '/todos/1')
+        self.request(adapter, 'post', '/todos', data='{}',
+                     content_type='application/json')
+        self.request(adapter, 'get', '/todos')
+        self.request(adapter, 'get', '/todos/1')
+        assert calls == ['index', 'read', 'index', 'read']
+
+    def test_cache_disabled(self):
+        calls = []
+        adapter = self.make_adapter(calls, cache_ttl=0)
+        self.request(adapter, 'get', '/todos/1')
+        self.request(adapter, 'get', '/todos/1')
+        assert calls == ['read', 'read']
+
+    def test_file_cache_shared_by_workers(self, tmpdir):
+        def backend_class(max_size):
+            return FileCache(max_size, str(tmpdir))
+
+        calls = []
+        workers = [self.make_adapter(calls, backend_class=backend_class)
+                   for _ in range(2)]
+        first = self.request(workers[0], 'get', '/todos/1')
+        assert self.request(workers[1], 'get', '/todos/1') == first
+        assert calls == ['read']
+        # A write to one worker invalidates the responses in all of them
+        self.request(workers[0], 'post', '/todos', data='{}',
+                     content_type='application/json')
+        self.request(workers[1], 'get', '/todos/1')
+        assert calls == ['read', 'read']
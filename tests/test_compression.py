@@ -0,0 +1,194 @@
+from __future__ import absolute_import
+
+import gzip
+import io
+import zlib
+
+import pytest
+
+from restart.compression import (
+    CompressionMiddleware, DecompressingStream, add_vary, decompress_stream
+)
+from restart.exceptions import (
+    BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+)
+from restart.request import WSGIRequest
+from restart.response import Response
+from restart.testing import RequestFactory
+
+
+factory = RequestFactory(keep_initial_request=True)
+
+
+def gzip_compress(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def raw_deflate_compress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class TestDecompressingStream(object):
+
+    data = b'{"hello": "world"}' * 1000
+
+    def test_decompress_gzip(self):
+        stream = DecompressingStream(io.BytesIO(gzip_compress(self.data)),
+                                     'gzip', chunk_size=7)
+        assert stream.read() == self.data
+        assert stream.size == len(self.data)
+
+    @pytest.mark.parametrize('compress', [zlib.compress, raw_deflate_compress])
+    def test_decompress_deflate(self, compress):
+        stream = DecompressingStream(io.BytesIO(compress(self.data)),
+                                     'deflate')
+        assert stream.read() == self.data
+
+    def test_decompress_concatenated_gzip_members(self):
+        compressed = gzip_compress(b'hello ') + gzip_compress(b'world')
+        stream = DecompressingStream(io.BytesIO(compressed), 'gzip')
+        assert stream.read() == b'hello world'
+
+    def test_read_is_bounded(self):
+        stream = DecompressingStream(io.BytesIO(gzip_compress(self.data)),
+                                     'gzip')
+        assert len(stream.read(10)) == 10
+
+    def test_max_size(self):
+        # A zip bomb: 100 MB of zeros compressed into about 100 KB
+        compressed = zlib.compress(b'\0' * 100 * 1024 * 1024)
+        stream = DecompressingStream(io.BytesIO(compressed), 'deflate',
+                                     max_size=1024 * 1024)
+        with pytest.raises(RequestEntityTooLarge):
+            stream.read()
+        assert stream.size <= 1024 * 1024 + 65536
+
+    def test_invalid_data(self):
+        stream = DecompressingStream(io.BytesIO(b'not compressed'), 'gzip')
+        with pytest.raises(BadRequest):
+            stream.read()
+
+    def test_incomplete_data(self):
+        compressed = gzip_compress(self.data)[:-10]
+        stream = DecompressingStream(io.BytesIO(compressed), 'gzip')
+        with pytest.raises(BadRequest):
+            stream.read()
+
+
+class TestDecompressStream(object):
+
+    def test_identity(self):
+        stream = io.BytesIO(b'data')
+        assert decompress_stream(stream, 'identity') is stream
+
+    def test_multiple_encodings(self):
+        compressed = gzip_compress(zlib.compress(b'data'))
+        stream = decompress_stream(io.BytesIO(compressed), 'deflate, gzip')
+        assert stream.readline() == b'data'
+
+    def test_unsupported_encoding(self):
+        with pytest.raises(UnsupportedMediaType):
+            decompress_stream(io.BytesIO(b'data'), 'br')
+
+
+class TestCompressionMiddleware(object):
+
+    body = b'{"hello": "world"}' * 100
+
+    def process(self, response, accept_encoding='gzip, deflate',
+                middleware=None):
+        headers = {'Accept-Encoding': accept_encoding}
+        request = WSGIRequest(factory.get('/', headers=headers).environ)
+        middleware = middleware or CompressionMiddleware()
+        return middleware.process_rendered_response(request, response)
+
+    def make_response(self, data=None, headers=None):
+        headers = dict({'Content-Type': 'application/json'}, **headers or {})
+        return Response(self.body if data is None else data,
+                        headers=headers)
+
+    def test_select_encoding(self):
+        middleware = CompressionMiddleware()
+        assert middleware.select_encoding('gzip, deflate') == 'gzip'
+        assert middleware.select_encoding('deflate;q=1, gzip;q=0.5') == \
+            'deflate'
+        assert middleware.select_encoding('*') == 'gzip'
+        assert middleware.select_encoding('*, gzip;q=0') == 'deflate'
+        assert middleware.select_encoding('br, identity') is None
+        assert middleware.select_encoding('') is None
+
+    def test_get_level(self):
+        middleware = CompressionMiddleware()
+        assert middleware.get_level('application/json') == 6
+        assert middleware.get_level('text/html; charset=utf-8') == 6
+        assert middleware.get_level('image/png') == 0
+
+    def test_compress(self):
+        response = self.process(self.make_response())
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert gzip.GzipFile(fileobj=io.BytesIO(response.data)).read() == \
+            self.body
+
+        response = self.process(self.make_response(), 'deflate')
+        assert zlib.decompress(response.data) == self.body
+
+    def test_not_compressed(self):
+        # Not acceptable
+        response = self.process(self.make_response(), 'identity')
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        # Too small
+        response = self.process(self.make_response(b'{}'))
+        assert response.data == b'{}'
+        # Not compressible
+        response = self.process(self.make_response(
+            headers={'Content-Type': 'image/png'}
+        ))
+        assert response.data == self.body
+        assert 'Vary' not in response.headers
+
+    def test_compress_stream(self):
+        response = self.process(self.make_response(iter([b'[1', u',2]'])))
+        assert response.headers['Content-Encoding'] == 'gzip'
+        chunks = list(response.iter_body())
+        # Each chunk is flushed to be decompressed as soon as it arrives
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decompressor.decompress(chunks[0]) == b'[1'
+        assert decompressor.decompress(b''.join(chunks[1:])) == b',2]'
+
+    def test_compressed_body_cached_by_etag(self):
+        class CountingMiddleware(CompressionMiddleware):
+            calls = 0
+
+            def compress(self, *args):
+                self.calls += 1
+                return super(CountingMiddleware, self).compress(*args)
+
+        middleware = CountingMiddleware()
+        for _ in range(2):
+            response = self.process(
+                self.make_response(headers={'ETag': '"v1"'}),
+                middleware=middleware
+            )
+            assert response.headers['ETag'] == 'W/"v1"'
+        assert middleware.calls == 1
+
+        # Weak ETags are not used for caching
+        for _ in range(2):
+            self.process(self.make_response(headers={'ETag': 'W/"v1"'}),
+                         middleware=middleware)
+        assert middleware.calls == 3
+
+    def test_add_vary(self):
+        headers = {}
+        add_vary(headers, 'Accept-Encoding')
+        add_vary(headers, 'Accept-Encoding')
+        assert headers['Vary'] == 'Accept-Encoding'
+        headers = {'Vary': 'Accept'}
+        add_vary(headers, 'Accept-Encoding')
+        assert headers['Vary'] == 'Accept, Accept-Encoding'
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import collections
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+
+from restart.json_backends import (
+    TypeEncoderRegistry, type_encoders, get_backend,
+    StdlibBackend, OrjsonBackend, UjsonBackend
+)
+
+
+def make_backends():
+    backends = []
+    for backend_class in (StdlibBackend, OrjsonBackend, UjsonBackend):
+        try:
+            backends.append(backend_class())
+        except ImportError:
+            pass
+    return backends
+
+
+class TestTypeEncoderRegistry(object):
+
+    def test_default_encoders(self):
+        assert type_encoders.default(datetime.date(2016, 1, 2)) == \
+            '2016-01-02'
+        assert type_encoders.default(decimal.Decimal('1.10')) == '1.10'
+        assert type_encoders.default(
+            uuid.UUID('12345678123456781234567812345678')
+        ) == '12345678-1234-5678-1234-567812345678'
+        assert type_encoders.default(set([1])) == [1]
+
+    def test_register_and_resolve(self):
+        class Base(object):
+            pass
+
+        class Derived(Base):
+            pass
+
+        registry = TypeEncoderRegistry()
+
+        @registry.register(Base)
+        def encode_base(obj):
+            return 'base'
+
+        assert registry.default(Derived()) == 'base'
+        assert registry.resolve(Derived) is encode_base
+
+        # Registering invalidates the cached dispatch
+        registry.register(Derived, lambda obj: 'derived')
+        assert registry.default(Derived()) == 'derived'
+
+    def test_unknown_type(self):
+        registry = TypeEncoderRegistry()
+        with pytest.raises(TypeError):
+            registry.default(object())
+        assert registry.resolve(object) is None
+
+
+class TestJSONBackends(object):
+
+    @pytest.mark.parametrize('backend', make_backends(),
+                             ids=lambda backend: backend.name)
+    def test_dumps(self, backend):
+        data = {
+            'name': u'中文',
+            'price': decimal.Decimal('9.99'),
+            'tags': frozenset(['a']),
+        }
+        assert backend.dumps(data) == \
+            u'{"name":"中文","price":"9.99","tags":["a"]}'.encode('utf-8')
+
+    def test_registered_encoders(self):
+        registry = TypeEncoderRegistry()
+        registry.register(datetime.datetime, lambda obj: obj.strftime('%Y'))
+        registry.register(datetime.date, lambda obj: 'date')
+        data = {
+            'created': datetime.datetime(2016, 1, 2, 3, 4, 5),
+            'due': datetime.date(2016, 1, 2),
+        }
+        expected = {'created': '2016', 'due': 'date'}
+        try:
+            import dataclasses
+        except ImportError:  # Python 3.6 and earlier versions
+            pass
+        else:
+            Point = dataclasses.make_dataclass('Point', ['x', 'y'])
+            registry.register(Point, lambda obj: [obj.x, obj.y])
+            data['point'] = Point(1, 2)
+            expected['point'] = [1, 2]
+
+        # The registered encoders win over native support in all backends
+        for backend_class in (StdlibBackend, OrjsonBackend, UjsonBackend):
+            try:
+                backend = backend_class(registry)
+            except ImportError:
+                continue
+            assert json.loads(backend.dumps(data).decode('utf-8')) == \
+                expected
+
+    @pytest.mark.parametrize('backend', make_backends(),
+                             ids=lambda backend: backend.name)
+    def test_loads(self, backend):
+        data = u'{"name": "中文", "items": [1, 2.5, null]}'.encode('utf-8')
+        assert backend.loads(data) == {'name': u'中文',
+                                       'items': [1, 2.5, None]}
+        with pytest.raises(ValueError):
+            backend.loads(b'{invalid')
+
+    @pytest.mark.parametrize('backend', make_backends(),
+                             ids=lambda backend: backend.name)
+    def test_dumps_with_fallback(self, backend):
+        Point = collections.namedtuple('Point', ['x', 'y'])
+        data = {'point': Point(1, 2), 'big': 2 ** 70}
+        assert json.loads(backend.dumps(data).decode('utf-8')) == \
+            {'point': [1, 2], 'big': 2 ** 70}
+        with pytest.raises(TypeError):
+            backend.dumps(object())
+
+    def test_dumps_nan(self):
+        assert StdlibBackend().dumps(float('nan')) == b'NaN'
+
+    def test_get_backend(self):
+        assert isinstance(get_backend(), StdlibBackend)
+        assert isinstance(get_backend('json'), StdlibBackend)
+        assert get_backend('auto').name in ('orjson', 'ujson', 'json')
+
+    def test_get_backend_with_fallback(self):
+        try:
+            import ujson  # noqa
+        except ImportError:
+            assert get_backend('ujson').name != 'ujson'
+        else:
+            assert get_backend('ujson').name == 'ujson'
+
+    def test_get_backend_with_invalid_name(self):
+        with pytest.raises(AssertionError):
+            get_backend('simplejson')
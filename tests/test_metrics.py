@@ -0,0 +1,268 @@
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from restart import timing
+from restart.adapter import WSGIAdapter
+from restart.api import RESTArt
+from restart.config import config
+from restart.exceptions import NotFound
+from restart.metrics import (
+    Counter, Histogram, MetricsRegistry, MmapStore, RequestMetrics,
+    enable_metrics
+)
+from restart.resource import Resource
+from restart.testing import Client
+
+
+class TestMetrics(object):
+
+    def test_counter_sharded_by_thread(self):
+        counter = Counter('hits_total', 'Hits.', ('path',))
+
+        def record():
+            for _ in range(1000):
+                counter.inc(('/a',))
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        counter.inc(('/b',), 2)
+        assert counter.collect()[('/b',)] == 2
+        for thread in threads:
+            thread.join()
+        assert counter.collect() == {('/a',): 4000, ('/b',): 2}
+        # The shards of finished threads are folded
+        assert len(counter.store._shards) == 1
+        assert counter.collect() == {('/a',): 4000, ('/b',): 2}
+
+    def test_histogram(self):
+        histogram = Histogram('latency_seconds', 'Latency.', ('endpoint',),
+                              buckets=(0.1, 1))
+        histogram.touch(('idle',))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, ('todos',))
+        assert histogram.expose() == [
+            'latency_seconds_bucket{endpoint="idle",le="0.1"} 0',
+            'latency_seconds_bucket{endpoint="idle",le="1.0"} 0',
+            'latency_seconds_bucket{endpoint="idle",le="+Inf"} 0',
+            'latency_seconds_sum{endpoint="idle"} 0.0',
+            'latency_seconds_count{endpoint="idle"} 0',
+            'latency_seconds_bucket{endpoint="todos",le="0.1"} 2',
+            'latency_seconds_bucket{endpoint="todos",le="1.0"} 3',
+            'latency_seconds_bucket{endpoint="todos",le="+Inf"} 4',
+            'latency_seconds_sum{endpoint="todos"} 3.65',
+            'latency_seconds_count{endpoint="todos"} 4',
+        ]
+
+    def test_registry(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('hits_total', 'Hits.', ('path',))
+        assert registry.counter('hits_total', 'Hits.', ('path',)) is counter
+        with pytest.raises(ValueError):
+            registry.gauge('hits_total', 'Hits.', ('path',))
+
+        counter.inc(('say "hi"\n',))
+        registry.gauge('in_flight', 'In flight.').inc()
+        assert registry.expose() == (
+            '# HELP hits_total Hits.\n'
+            '# TYPE hits_total counter\n'
+            'hits_total{path="say \\"hi\\"\\n"} 1\n'
+            '# HELP in_flight In flight.\n'
+            '# TYPE in_flight gauge\n'
+            'in_flight 1\n'
+        )
+
+    def test_quantile(self):
+        histogram = Histogram('latency_seconds', 'Latency.',
+                              buckets=(0.1, 0.2, 1))
+        assert histogram.quantile(0.5) is None
+        for value in [0.05] * 50 + [0.15] * 49 + [5]:
+            histogram.observe(value)
+        assert histogram.quantile(0.5) == 0.1
+        assert abs(histogram.quantile(0.99) - 0.2) < 1e-9
+        assert histogram.quantile(1) == 1.0
+
+
+def record_in_worker(directory, started, stop):
+    registry = MetricsRegistry(MmapStore(directory))
+    registry.counter('hits_total', 'Hits.', ('path',)).inc(('/a',), 2)
+    registry.histogram('latency_seconds', 'Latency.',
+                       buckets=(0.1, 1)).observe(0.5)
+    registry.gauge('in_flight', 'In flight.').inc()
+    started.set()
+    stop.wait()
+
+
+class TestMmapStore(object):
+
+    def make_registry(self, directory):
+        registry = MetricsRegistry(MmapStore(str(directory)))
+        counter = registry.counter('hits_total', 'Hits.', ('path',))
+        histogram = registry.histogram('latency_seconds', 'Latency.',
+                                       buckets=(0.1, 1))
+        return registry, counter, histogram
+
+    def test_threads(self, tmpdir):
+        registry, counter, histogram = self.make_registry(tmpdir)
+
+        def record():
+            for _ in range(1000):
+                counter.inc(('/a',))
+            histogram.observe(0.25)
+
+        for _ in range(2):
+            # The slots of finished threads are reused
+            threads = [threading.Thread(target=record) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        counter.inc(('/b',), 0.5)
+        assert counter.collect() == {('/a',): 8000, ('/b',): 0.5}
+        assert histogram.collect() == {(): [0, 8, 0, 2, 8]}
+        assert registry.store._next_id <= 5
+        assert tmpdir.listdir('metrics-*.db') == \
+            [tmpdir.join('metrics-%d.db' % os.getpid())]
+
+    def test_metrics_dir(self, tmpdir):
+        initial = config.METRICS_DIR
+        config.METRICS_DIR = str(tmpdir)
+        try:
+            registry = MetricsRegistry()
+            # The store is chosen when the first metric is created
+            registry.counter('hits_total', 'Hits.')
+        finally:
+            config.METRICS_DIR = initial
+        assert isinstance(registry.store, MmapStore)
+        assert registry.store.directory == str(tmpdir)
+
+    def test_grow(self, tmpdir):
+        _, counter, _ = self.make_registry(tmpdir)
+        for i in range(5000):
+            counter.inc(('/todos/%d' % i,))
+        values = counter.collect()
+        assert len(values) == 5000
+        assert values[('/todos/4999',)] == 1
+
+    def test_processes(self, tmpdir):
+        registry, counter, histogram = self.make_registry(tmpdir)
+        gauge = registry.gauge('in_flight', 'In flight.')
+        counter.inc(('/a',))
+        counter.inc(('/b',))
+        started = multiprocessing.Event()
+        stop = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=record_in_worker, args=(str(tmpdir), started, stop)
+        )
+        process.start()
+        try:
+            started.wait(10)
+            assert counter.collect() == {('/a',): 3, ('/b',): 1}
+            assert histogram.collect() == {(): [0, 1, 0, 0.5, 1]}
+            assert gauge.collect() == {(): 1}
+            assert 'hits_total{path="/a"} 3' in registry.expose()
+        finally:
+            stop.set()
+            process.join()
+
+        # The file of the dead process is removed, but its counters and
+        # histograms are retired instead of going backwards
+        counter.inc(('/a',))
+        assert counter.collect() == {('/a',): 4, ('/b',): 1}
+        assert histogram.collect() == {(): [0, 1, 0, 0.5, 1]}
+        assert gauge.collect() == {}
+        assert tmpdir.listdir('metrics-*.db') == \
+            [tmpdir.join('metrics-%d.db' % os.getpid())]
+        # Retired only once
+        assert counter.collect() == {('/a',): 4, ('/b',): 1}
+
+    def test_killed_process(self, tmpdir):
+        _, counter, _ = self.make_registry(tmpdir)
+        counter.inc(('/a',))
+        started = multiprocessing.Event()
+        stop = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=record_in_worker, args=(str(tmpdir), started, stop)
+        )
+        process.start()
+        started.wait(10)
+        before = counter.collect()
+        process.terminate()
+        process.join()
+        after = counter.collect()
+        assert before == after == {('/a',): 3}
+
+
+class TestRequestMetrics(object):
+
+    def test_enable_metrics(self):
+        api = RESTArt()
+
+        @api.register
+        class Todos(Resource):
+            name = 'todos'
+
+            def index(self, request):
+                return []
+
+            def read(self, request, pk):
+                raise NotFound()
+
+        registry = MetricsRegistry()
+        metrics = enable_metrics(api, registry=registry)
+        try:
+            client = Client(api, WSGIAdapter)
+            client.get('/todos')
+            client.get('/todos/1')
+            client.get('/unknown')
+            client.post('/metrics')
+            response = client.get('/metrics')
+        finally:
+            timing.unsubscribe(metrics)
+
+        assert isinstance(metrics, RequestMetrics)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/plain')
+        lines = response.data.decode('utf-8').splitlines()
+        assert ('restart_requests_total{endpoint="todos_list",method="GET",'
+                'status="200"} 1') in lines
+        assert ('restart_request_errors_total{endpoint="todos_item",'
+                'status="404"} 1') in lines
+        # The requests answered by the router have no endpoint
+        assert ('restart_requests_total{endpoint="-",method="GET",'
+                'status="404"} 1') in lines
+        assert ('restart_requests_total{endpoint="-",method="POST",'
+                'status="405"} 1') in lines
+        assert 'restart_requests_in_flight{endpoint="-"} 0' in lines
+        # The metrics request itself is in progress
+        assert 'restart_requests_in_flight{endpoint="metrics"} 1' in lines
+        assert 'restart_requests_in_flight{endpoint="todos_list"} 0' in lines
+        assert ('restart_request_duration_seconds_count'
+                '{endpoint="todos_item"} 1') in lines
+
+    def test_enable_metrics_twice(self):
+        api = RESTArt()
+
+        @api.register
+        class Todos(Resource):
+            name = 'todos'
+
+            def index(self, request):
+                return []
+
+        registry = MetricsRegistry()
+        metrics = enable_metrics(api, registry=registry)
+        try:
+            assert enable_metrics(api, registry=registry) is metrics
+            client = Client(api, WSGIAdapter)
+            client.get('/todos')
+        finally:
+            timing.unsubscribe(metrics)
+
+        requests = registry.get('restart_requests_total')
+        assert requests.collect() == {('todos_list', 'GET', '200'): 1}
@@ -3,11 +3,19 @@ from __future__ import absolute_import
 import pytest
 
 from restart.parsers import JSONParser, MultiPartParser, URLEncodedParser
-from restart.renderers import JSONRenderer
+from restart.renderers import Renderer, JSONRenderer
 from restart.negotiator import Negotiator
 from restart.exceptions import UnsupportedMediaType, NotFound, NotAcceptable
 
 
+class TextRenderer(Renderer):
+    content_type = 'text/plain'
+    format_suffix = 'txt'
+
+    def render(self, data, context=None):
+        return str(data)
+
+
 class TestNegotiator(object):
 
     negotiator = Negotiator()
@@ -80,3 +88,97 @@ class TestNegotiator(object):
             self.negotiator.select_renderer(
                 (), None
             )
+
+    def test_select_parser_caches_raw_content_type(self):
+        negotiator = Negotiator()
+        content_type = 'application/json; charset=utf-8'
+        assert negotiator.select_parser(
+            self.parser_classes, content_type
+        ) is JSONParser
+
+        _, cache = negotiator._parser_tables[self.parser_classes]
+        assert cache.get(content_type) is JSONParser
+
+    def test_select_parser_with_bounded_cache(self):
+        negotiator = Negotiator()
+        negotiator.cache_size = 2
+        for charset in ('utf-8', 'latin-1', 'ascii'):
+            negotiator.select_parser(
+                self.parser_classes, 'application/json; charset=%s' % charset
+            )
+
+        _, cache = negotiator._parser_tables[self.parser_classes]
+        assert len(cache) == 2
+        assert 'application/json; charset=utf-8' not in cache
+
+    def test_select_parser_with_unhashable_parser_classes(self):
+        negotiator = Negotiator()
+        assert negotiator.select_parser(
+            list(self.parser_classes), 'application/json'
+        ) is JSONParser
+        assert negotiator._parser_tables == {}
+
+    def assert_selected_renderer_class(self, accept, renderer_class,
+                                       renderer_classes=None):
+        renderer_classes = renderer_classes or (JSONRenderer, TextRenderer)
+        selected_renderer_class = Negotiator().select_renderer(
+            renderer_classes, None, accept
+        )
+        assert selected_renderer_class is renderer_class
+
+    def test_select_renderer_by_accept(self):
+        self.assert_selected_renderer_class('text/plain', TextRenderer)
+        self.assert_selected_renderer_class('application/json', JSONRenderer)
+
+    def test_select_renderer_by_accept_with_wildcards(self):
+        self.assert_selected_renderer_class('*/*', JSONRenderer)
+        self.assert_selected_renderer_class('*', JSONRenderer)
+        self.assert_selected_renderer_class('text/*', TextRenderer)
+        self.assert_selected_renderer_class('text/html, */*;q=0.1',
+                                            JSONRenderer)
+
+    def test_select_renderer_by_accept_with_qualities(self):
+        self.assert_selected_renderer_class(
+            'application/json;q=0.5, text/plain', TextRenderer
+        )
+        self.assert_selected_renderer_class(
+            'text/plain;q=0.5, application/json;q=0.8', JSONRenderer
+        )
+        # The most specific media range determines the quality
+        self.assert_selected_renderer_class(
+            'application/json;q=0, */*', TextRenderer
+        )
+
+    def test_select_renderer_by_accept_with_equal_qualities(self):
+        # On ties, the renderer class listed first is preferred
+        self.assert_selected_renderer_class(
+            'text/plain, application/json', JSONRenderer
+        )
+        self.assert_selected_renderer_class(
+            'text/plain, application/json', TextRenderer,
+            (TextRenderer, JSONRenderer)
+        )
+
+    def test_select_renderer_by_format_suffix_over_accept(self):
+        selected_renderer_class = Negotiator().select_renderer(
+            (JSONRenderer, TextRenderer), 'json', 'text/plain'
+        )
+        assert selected_renderer_class is JSONRenderer
+
+    def test_select_renderer_by_unacceptable_accept(self):
+        with pytest.raises(NotAcceptable):
+            self.assert_selected_renderer_class('text/html', None)
+        with pytest.raises(NotAcceptable):
+            self.assert_selected_renderer_class(
+                'application/json;q=0, text/plain;q=0', None
+            )
+        with pytest.raises(NotAcceptable):
+            Negotiator().select_renderer((), None, '*/*')
+
+    def test_parse_accept_is_memoized(self):
+        negotiator = Negotiator()
+        accept = 'text/plain;q=0.5, application/json'
+        media_ranges = negotiator.parse_accept(accept)
+        assert media_ranges == [('text/plain', 0.5),
+                                ('application/json', 1)]
+        assert negotiator.parse_accept(accept) is media_ranges
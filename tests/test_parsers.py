@@ -5,10 +5,11 @@ from io import BytesIO
 
 from werkzeug.datastructures import FileStorage
 from restart.parsers import (
-    Parser, JSONParser,
+    Parser, JSONParser, StreamingJSONParser,
     MultiPartParser, URLEncodedParser
 )
-from restart.exceptions import BadRequest
+from restart.exceptions import BadRequest, RequestEntityTooLarge
+from restart.uploads import UploadHandler
 from restart.testing import RequestFactory
 
 
@@ -44,6 +45,55 @@ class TestParsers(object):
         with pytest.raises(BadRequest):
             self.parse(parser, data, 'application/json')
 
+    def test_streaming_json_parser(self):
+        parser = StreamingJSONParser()
+        data = '{"hello": ["world", {"nested": "\\"]"}]}'
+        parsed = self.parse(parser, data, 'application/json')
+
+        assert parsed == {'hello': ['world', {'nested': '"]'}]}
+
+    def test_streaming_json_parser_with_array(self):
+        class SmallChunkParser(StreamingJSONParser):
+            chunk_size = 4
+
+        parser = SmallChunkParser()
+        data = ' [1, {"a": [2, "x,]"]}, []] '
+        parsed = self.parse(parser, data, 'application/json')
+
+        assert not isinstance(parsed, list)
+        assert next(parsed) == 1
+        assert list(parsed) == [{'a': [2, 'x,]']}, []]
+
+        parser.lazy = False
+        parsed = self.parse(parser, '[]', 'application/json')
+        assert parsed == []
+
+    def test_streaming_json_parser_with_invalid_data(self):
+        parser = StreamingJSONParser()
+
+        for data in ('[1,,2]', '[1,]', '[1}', '[1] 2', '[1, 2',
+                     '{"a": 1', '"abc', ']', '[1, x]'):
+            with pytest.raises(BadRequest):
+                list(self.parse(parser, data, 'application/json'))
+
+    def test_streaming_json_parser_limits(self):
+        class LimitedParser(StreamingJSONParser):
+            chunk_size = 4
+            max_body_size = 16
+            max_depth = 2
+            max_string_length = 4
+
+        parser = LimitedParser()
+        assert list(self.parse(parser, '[["abcd"]]', 'application/json')) \
+            == [['abcd']]
+
+        with pytest.raises(RequestEntityTooLarge):
+            self.parse(parser, '[' + '1,' * 8 + '1]', 'application/json')
+        with pytest.raises(BadRequest):
+            list(self.parse(parser, '[[[1]]]', 'application/json'))
+        with pytest.raises(BadRequest):
+            list(self.parse(parser, '["abcde"]', 'application/json'))
+
     def test_multi_part_parser(self):
         parser = MultiPartParser()
         data = {
@@ -57,6 +107,122 @@ class TestParsers(object):
         assert parsed_files['file'].filename == 'test.txt'
         assert parsed_files['file'].stream.read() == b'this is the file'
 
+    def test_multi_part_parser_with_unknown_length(self):
+        parser = MultiPartParser()
+        data = {
+            'text': 'this is some text',
+            'file': (BytesIO(b'this is the file'), 'test.txt')
+        }
+        request = self.factory.get('/', data=data)
+        parsed_data, parsed_files = parser.parse(request.stream,
+                                                 request.content_type, None)
+        assert parsed_data['text'] == 'this is some text'
+        assert parsed_files['file'].stream.read() == b'this is the file'
+
+    def test_multi_part_parser_streams_to_upload_handler(self):
+        events = []
+
+        class RecordingUploadHandler(UploadHandler):
+            def receive_chunk(self, chunk):
+                events.append(chunk)
+
+            def file_complete(self, size):
+                return (self.name, self.filename, self.content_type, size)
+
+        class SmallChunkParser(MultiPartParser):
+            chunk_size = 8
+            upload_handler_class = RecordingUploadHandler
+
+        parser = SmallChunkParser()
+        content = b'line 1\r\n--line 2\r\n' * 4
+        data = {
+            'text': u'\u4e2d\u6587',
+            'file': (BytesIO(content), 'test.txt', 'text/plain')
+        }
+        parsed_data, parsed_files = self.parse(parser, data)
+
+        assert parsed_data == {'text': u'\u4e2d\u6587'}
+        assert parsed_files == {
+            'file': ('file', 'test.txt', 'text/plain', len(content))
+        }
+        assert len(events) > 1
+        assert b''.join(events) == content
+
+    def test_multi_part_parser_with_max_file_size(self):
+        aborted = []
+
+        class AbortingUploadHandler(UploadHandler):
+            def receive_chunk(self, chunk):
+                pass
+
+            def abort(self):
+                aborted.append(self.filename)
+
+        class LimitedParser(MultiPartParser):
+            max_file_size = 16
+            upload_handler_class = AbortingUploadHandler
+
+        data = {'file': (BytesIO(b'x' * 17), 'big.txt')}
+        with pytest.raises(RequestEntityTooLarge):
+            self.parse(LimitedParser(), data)
+        assert aborted == ['big.txt']
+
+    def test_multi_part_parser_with_max_field_size(self):
+        class LimitedParser(MultiPartParser):
+            max_field_size = 16
+
+        # The limit does not apply to files
+        data = {'text': 'x' * 16, 'file': (BytesIO(b'x' * 17), 'test.txt')}
+        parsed_data, _ = self.parse(LimitedParser(), data)
+        assert parsed_data == {'text': 'x' * 16}
+        data = {'text': 'x' * 17, 'file': (BytesIO(b''), 'test.txt')}
+        with pytest.raises(RequestEntityTooLarge):
+            self.parse(LimitedParser(), data)
+
+    def test_multi_part_parser_aborts_upload_handlers(self):
+        aborted = []
+
+        class AbortingUploadHandler(UploadHandler):
+            def receive_chunk(self, chunk):
+                pass
+
+            def file_complete(self, size):
+                return self.filename
+
+            def abort(self):
+                aborted.append(self.filename)
+
+        class AbortingParser(MultiPartParser):
+            upload_handler_class = AbortingUploadHandler
+
+        parser = AbortingParser()
+        content_type = 'multipart/form-data; boundary=b'
+        part = (b'--b\r\nContent-Disposition: form-data; name="file"; '
+                b'filename="%s"\r\n\r\ncontent\r\n')
+
+        # Only the first file with the same name is kept
+        data = part % b'a.txt' + part % b'b.txt' + b'--b--'
+        _, files = parser.parse(BytesIO(data), content_type, len(data))
+        assert files == {'file': 'a.txt'}
+        assert aborted == ['b.txt']
+
+        # The complete files are released if a later part is invalid
+        del aborted[:]
+        data = part % b'a.txt' + b'--b\r\nBad header\r\n\r\n\r\n--b--'
+        with pytest.raises(BadRequest):
+            parser.parse(BytesIO(data), content_type, len(data))
+        assert aborted == ['a.txt']
+
+    def test_multi_part_parser_with_invalid_data(self):
+        parser = MultiPartParser()
+        content_type = 'multipart/form-data; boundary=b'
+
+        for data in (b'', b'--b\r\n', b'--b\r\nBad header\r\n\r\n\r\n--b--',
+                     b'--b\r\nContent-Disposition: form-data; name="a"'
+                     b'\r\n\r\nno close delimiter'):
+            with pytest.raises(BadRequest):
+                parser.parse(BytesIO(data), content_type, len(data))
+
     def test_urlencoded_parser(self):
         parser = URLEncodedParser()
         data = {'hello': 'world'}
@@ -0,0 +1,275 @@
+from __future__ import absolute_import
+
+import cProfile
+import gc
+import os
+import pstats
+import sys
+import threading
+import time
+
+from restart import timing
+from restart.api import RESTArt
+from restart.config import config
+from restart.exceptions import NotFound
+from restart.profiling import (
+    ENVIRON_KEY, PROFILE_HEADER, ProfilerMiddleware, RollingProfile,
+    SamplingProfiler, check_profile_token, enable_sampling_profiler,
+    make_profile_token
+)
+from restart.request import WSGIRequest
+from restart.resource import Resource
+from restart.response import Response
+from restart.testing import Client, RequestFactory
+
+
+def slow_read():
+    return {'id': 1}
+
+
+def busy_wait(event):
+    while not event.is_set():
+        time.sleep(0.001)
+
+
+class TestProfileToken(object):
+
+    def test_check(self):
+        token = make_profile_token('secret', timestamp=1000)
+        assert check_profile_token(token, 'secret', 300, now=1100)
+        assert not check_profile_token(token, 'other', 300, now=1100)
+        assert not check_profile_token(token, 'secret', 300, now=1400)
+        assert not check_profile_token('1000:bad', 'secret', 300, now=1100)
+        assert not check_profile_token('garbage', 'secret', 300, now=1100)
+
+
+class TestRollingProfile(object):
+
+    def make_profile(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        slow_read()
+        profile.disable()
+        return profile
+
+    def test_window(self):
+        merged = RollingProfile(2)
+        for _ in range(5):
+            merged.add(self.make_profile())
+        stats = merged.get_stats()
+        # The previous generation has 2 profiles, the current one has 1
+        calls = [value[1] for key, value in stats.stats.items()
+                 if key[2] == 'slow_read']
+        assert calls == [3]
+
+
+class TestProfilerMiddleware(object):
+
+    def make_client(self, tmpdir, **attrs):
+        attrs.setdefault('directory', str(tmpdir))
+        middleware_class = type('Profiler', (ProfilerMiddleware,), attrs)
+        api = RESTArt()
+
+        @api.register
+        class Todos(Resource):
+            name = 'todos'
+            middleware_classes = (middleware_class,)
+
+            def read(self, request, pk):
+                return slow_read()
+
+            def delete(self, request, pk):
+                raise NotFound()
+
+        return Client(api)
+
+    def make_request(self):
+        request = WSGIRequest(RequestFactory().get('/todos/1').environ)
+        request.resource = Resource(config.ACTION_MAP)
+        request.resource.name = 'todos'
+        return request
+
+    def get_dumps(self, tmpdir):
+        return sorted(filename for filename in os.listdir(str(tmpdir))
+                      if 'merged' not in filename)
+
+    def test_sampling(self, tmpdir):
+        client = self.make_client(tmpdir, sample_every=2)
+        for _ in range(5):
+            assert client.get('/todos/1').status_code == 200
+        dumps = self.get_dumps(tmpdir)
+        assert len(dumps) == 2
+        # Without timing, the profiles are named by the resource
+        assert all(filename.startswith('todos.') for filename in dumps)
+        assert all(filename.endswith('.%d.prof' % os.getpid())
+                   for filename in dumps)
+
+        stats = pstats.Stats(str(tmpdir.join(dumps[0])))
+        assert any(key[2] == 'slow_read' for key in stats.stats)
+        merged = pstats.Stats(str(tmpdir.join(
+            'todos.merged.%d.prof' % os.getpid()
+        )))
+        calls = [value[1] for key, value in merged.stats.items()
+                 if key[2] == 'slow_read']
+        assert calls == [2]
+
+    def test_named_by_endpoint(self, tmpdir):
+        client = self.make_client(tmpdir, sample_every=1)
+        timings = timing.EndpointTimings()
+        timing.subscribe(timings)
+        try:
+            client.get('/todos/1')
+        finally:
+            timing.unsubscribe(timings)
+        assert self.get_dumps(tmpdir)[0].startswith('todos_item.')
+
+    def test_signed_header(self, tmpdir):
+        client = self.make_client(tmpdir, sample_every=0, secret='secret')
+        response = client.get('/todos/1')
+        assert PROFILE_HEADER not in response.headers
+        response = client.get('/todos/1', headers={
+            PROFILE_HEADER: make_profile_token('other')
+        })
+        assert PROFILE_HEADER not in response.headers
+        assert self.get_dumps(tmpdir) == []
+
+        response = client.get('/todos/1', headers={
+            PROFILE_HEADER: make_profile_token('secret')
+        })
+        assert self.get_dumps(tmpdir) == [response.headers[PROFILE_HEADER]]
+
+    def test_max_dumps(self, tmpdir):
+        client = self.make_client(tmpdir, sample_every=1, max_dumps=3)
+        for _ in range(5):
+            client.get('/todos/1')
+        assert len(self.get_dumps(tmpdir)) == 3
+
+    def test_concurrent_requests(self, tmpdir):
+        middleware = type('Profiler', (ProfilerMiddleware,), {
+            'directory': str(tmpdir), 'sample_every': 1
+        })()
+        first, second = self.make_request(), self.make_request()
+        middleware.process_request(first)
+        try:
+            # Like the requests served by the event loop of ASGI, the
+            # second request is not profiled, and the first one still is
+            middleware.process_request(second)
+            assert ENVIRON_KEY not in second.environ
+            profile, _ = first.environ[ENVIRON_KEY]
+            assert sys.getprofile() in (profile, None)
+        finally:
+            middleware.process_rendered_response(first, Response(b''))
+        assert sys.getprofile() is None
+        assert len(self.get_dumps(tmpdir)) == 1
+
+    def test_leaked_profile(self, tmpdir):
+        middleware = type('Profiler', (ProfilerMiddleware,), {
+            'directory': str(tmpdir), 'sample_every': 1
+        })()
+        middleware.process_request(self.make_request())
+        # The request was dropped before its profile was saved
+        gc.collect()
+        request = self.make_request()
+        middleware.process_request(request)
+        try:
+            assert ENVIRON_KEY in request.environ
+        finally:
+            middleware.process_rendered_response(request, Response(b''))
+        assert sys.getprofile() is None
+        assert len(self.get_dumps(tmpdir)) == 1
+
+    def test_exception(self, tmpdir):
+        client = self.make_client(tmpdir, sample_every=1)
+        assert client.get('/todos/1').status_code == 200
+        # Profiles of failed requests are saved too
+        assert client.delete('/todos/1').status_code == 404
+        assert len(self.get_dumps(tmpdir)) == 2
+
+
+class TestSamplingProfiler(object):
+
+    def test_sample(self):
+        def wsgi_app(event, started):
+            # Like the adapters, which hold the endpoints of requests
+            endpoint = 'todos_list'
+            started.set()
+            busy_wait(event)
+            return endpoint
+
+        profiler = SamplingProfiler(interval=1)
+        event = threading.Event()
+        started = threading.Event()
+        serving = threading.Thread(target=wsgi_app, args=(event, started))
+        idle = threading.Thread(target=busy_wait, args=(event,))
+        serving.start()
+        idle.start()
+        try:
+            started.wait()
+            profiler.sample()
+            profiler.sample()
+        finally:
+            event.set()
+            serving.join()
+            idle.join()
+
+        assert profiler.samples == 2
+        lines = profiler.get_collapsed().splitlines()
+        # The idle threads are not sampled
+        assert len(lines) == 1
+        stack, count = lines[0].rsplit(' ', 1)
+        frames = stack.split(';')
+        assert count == '2'
+        assert frames[0] == 'todos_list'
+        assert frames[-1].startswith('busy_wait (%s:' % __file__.rstrip('c'))
+        assert frames[-2].startswith('wsgi_app (')
+
+        profiler.reset()
+        assert profiler.get_collapsed() == ''
+
+    def test_all_threads(self):
+        profiler = SamplingProfiler(interval=1, all_threads=True)
+        profiler.sample()
+        lines = profiler.get_collapsed().splitlines()
+        assert all(line.startswith('-;') for line in lines)
+        assert any(';test_all_threads (' in line for line in lines)
+
+    def test_enable_sampling_profiler(self):
+        api = RESTArt()
+
+        @api.register
+        class Todos(Resource):
+            name = 'todos'
+
+            def index(self, request):
+                busy_wait(event)
+                return []
+
+        event = threading.Event()
+        profiler = enable_sampling_profiler(api, interval=0.001)
+        try:
+            client = Client(api)
+            timer = threading.Timer(0.05, event.set)
+            timer.start()
+            assert client.get('/todos').status_code == 200
+            timer.join()
+
+            # Without a secret, the stacks are never exported
+            assert client.get('/profile/stacks').status_code == 403
+
+            initial = config.PROFILER_SECRET
+            config.PROFILER_SECRET = 'secret'
+            try:
+                assert client.get('/profile/stacks').status_code == 403
+                response = client.get('/profile/stacks', headers={
+                    PROFILE_HEADER: make_profile_token('secret')
+                })
+            finally:
+                config.PROFILER_SECRET = initial
+            assert response.status_code == 200
+            assert response.headers['Content-Type'].startswith('text/plain')
+            lines = response.data.decode('utf-8').splitlines()
+            assert any(line.startswith('todos_list;') and
+                       ';index (' in line for line in lines)
+        finally:
+            profiler.stop()
+        assert profiler._thread is None
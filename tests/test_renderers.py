@@ -17,4 +17,25 @@ class TestRenderers(object):
         renderer = JSONRenderer()
         rendered = renderer.render({'hello': 'world'})
 
-        assert rendered == '{"hello": "world"}'
+        assert rendered == b'{"hello":"world"}'
+
+    def test_json_renderer_stream(self):
+        renderer = JSONRenderer()
+        rendered = renderer.render(({'id': i} for i in range(3)))
+
+        assert not isinstance(rendered, bytes)
+        assert b''.join(rendered) == b'[{"id":0},{"id":1},{"id":2}]'
+
+        rendered = renderer.render({1: 'a', 2: 'b'}.values())
+        assert b''.join(rendered) == b'["a","b"]'
+
+        assert list(renderer.render(iter([]))) == [b'[]']
+
+    def test_json_renderer_stream_flush_size(self):
+        class SmallChunkJSONRenderer(JSONRenderer):
+            flush_size = 10
+
+        renderer = SmallChunkJSONRenderer()
+        chunks = list(renderer.render(iter(['abcdefgh', 'ijklmnop', 'q'])))
+
+        assert chunks == [b'["abcdefgh"', b',"ijklmnop"', b',"q"]']
@@ -1,9 +1,15 @@
 from __future__ import absolute_import
 
+import zlib
+
 import pytest
 
-from restart.request import Request, WerkzeugRequest
+from restart.request import Request, WerkzeugRequest, WSGIRequest
 from restart.parsers import JSONParser
+from restart.config import config
+from restart.exceptions import (
+    BadRequest, LengthRequired, RequestEntityTooLarge
+)
 from restart.negotiator import Negotiator
 from restart.testing import RequestFactory
 
@@ -124,6 +130,34 @@ class TestWerkzeugRequest(object):
         assert parsed_request.data == {'hello': 'world'}
         assert request.stream.read() == b''
 
+    def test_parsed_request_is_lazy(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": "world"}',
+            content_type='application/json'
+        )
+        request = WerkzeugRequest(initial_request)
+        request.parse(Negotiator(), [JSONParser])
+        assert not request.is_parsed
+        assert request.stream.tell() == 0
+
+        assert request.files == {}
+        assert request.is_parsed
+        assert request.data == {'hello': 'world'}
+
+    def test_parsed_request_with_invalid_data(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": ',
+            content_type='application/json'
+        )
+        request = WerkzeugRequest(initial_request)
+        request.parse(Negotiator(), [JSONParser])
+        for _ in range(2):
+            with pytest.raises(BadRequest):
+                request.data
+        assert not request.is_parsed
+
     def test_normal_request_with_empty_data(self):
         initial_request = factory.get('/')
         request = WerkzeugRequest(initial_request)
@@ -137,3 +171,119 @@ class TestWerkzeugRequest(object):
         assert request.scheme == 'http'
         assert request.headers['Host'] == 'localhost'
         assert_environ(request.environ)
+
+
+class TestWSGIRequest(object):
+
+    def test_normal_request(self):
+        initial_request = factory.post('/sample?x=1&y=2&y=3',
+                                       data='{"hello": "world"}',
+                                       content_type='application/json',
+                                       headers={'X-Token': 'secret'})
+        request = WSGIRequest(initial_request.environ)
+        assert (str(request) ==
+                "<WSGIRequest [POST 'http://localhost/sample?x=1&y=2&y=3']>")
+        assert request.data == {}
+        assert request.stream.read() == b'{"hello": "world"}'
+        assert request.method == 'POST'
+        assert request.uri == 'http://localhost/sample?x=1&y=2&y=3'
+        assert request.path == '/sample'
+        assert request.args == {'x': '1', 'y': ['2', '3']}
+        assert request.auth is None
+        assert request.scheme == 'http'
+        assert request.headers['Host'] == 'localhost'
+        assert request.headers['Content-Type'] == 'application/json'
+        assert request.headers['X-Token'] == 'secret'
+        assert request.content_length == 18
+        assert_environ(request.environ)
+
+    def test_parsed_request(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": "world"}',
+            content_type='application/json'
+        )
+        request = WSGIRequest(initial_request.environ)
+        parsed_request = request.parse(Negotiator(), [JSONParser])
+        assert parsed_request.data == {'hello': 'world'}
+        assert request.stream.read() == b''
+
+    def test_request_with_auth(self):
+        initial_request = factory.get(
+            '/', headers={'Authorization': 'Basic dXNlcjpwYXNz'}
+        )
+        request = WSGIRequest(initial_request.environ)
+        assert request.auth['username'] == 'user'
+        assert request.auth['password'] == 'pass'
+
+    def test_request_with_compressed_data(self):
+        initial_request = factory.post(
+            '/sample',
+            data=zlib.compress(b'{"hello": "world"}'),
+            content_type='application/json',
+            headers={'Content-Encoding': 'deflate'}
+        )
+        request = WSGIRequest(initial_request.environ)
+        assert request.content_encoding == 'deflate'
+        request.parse(Negotiator(), [JSONParser])
+        assert request.data == {'hello': 'world'}
+
+    def test_chunked_request(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": "world"}',
+            content_type='application/json',
+            headers={'Transfer-Encoding': 'chunked'}
+        )
+        # The WSGI server decodes the chunks, and the length is unknown
+        del initial_request.environ['CONTENT_LENGTH']
+        initial_request.environ['wsgi.input_terminated'] = True
+        for request_class in (WSGIRequest, WerkzeugRequest):
+            initial_request.environ['wsgi.input'].seek(0)
+            if request_class is WSGIRequest:
+                request = request_class(initial_request.environ)
+            else:
+                request = request_class(initial_request)
+            assert request.content_length is None
+            assert request.is_chunked
+            request.parse(Negotiator(), [JSONParser])
+            assert request.data == {'hello': 'world'}
+
+    def test_chunked_request_not_terminated(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": "world"}',
+            content_type='application/json',
+            headers={'Transfer-Encoding': 'chunked'}
+        )
+        # Without `wsgi.input_terminated`, the end of the payload is unknown
+        del initial_request.environ['CONTENT_LENGTH']
+        for request_class in (WSGIRequest, WerkzeugRequest):
+            if request_class is WSGIRequest:
+                request = request_class(initial_request.environ)
+            else:
+                request = request_class(initial_request)
+            assert request.stream.read() == b''
+            request.parse(Negotiator(), [JSONParser])
+            with pytest.raises(LengthRequired):
+                request.data
+
+    def test_chunked_request_too_large(self):
+        initial_request = factory.post(
+            '/sample',
+            data='{"hello": "world"}',
+            content_type='application/json',
+            headers={'Transfer-Encoding': 'chunked'}
+        )
+        del initial_request.environ['CONTENT_LENGTH']
+        initial_request.environ['wsgi.input_terminated'] = True
+        request = WSGIRequest(initial_request.environ)
+
+        initial_max_size = config.REQUEST_MAX_CHUNKED_SIZE
+        config.REQUEST_MAX_CHUNKED_SIZE = 10
+        try:
+            request.parse(Negotiator(), [JSONParser])
+            with pytest.raises(RequestEntityTooLarge):
+                request.data
+        finally:
+            config.REQUEST_MAX_CHUNKED_SIZE = initial_max_size
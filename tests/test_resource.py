@@ -1,9 +1,13 @@
 from __future__ import absolute_import
 
+import threading
+from datetime import datetime
+
 import pytest
 
 from restart.config import config
-from restart.parsers import JSONParser
+from restart.parsers import JSONParser, StreamingJSONParser
+from restart.renderers import JSONRenderer, Renderer
 from restart.resource import Resource
 from restart.response import Response, WerkzeugResponse
 from restart.exceptions import HTTPException, BadRequest
@@ -32,6 +36,13 @@ class AlterResponseMiddleware(object):
         return response
 
 
+class AlterRenderedResponseMiddleware(object):
+
+    def process_rendered_response(self, request, response):
+        response.data = response.get_body().upper()
+        return response
+
+
 class Echo(Resource):
 
     name = 'echo'
@@ -56,7 +67,7 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert response.data == '{"hello": "world"}'
+        assert response.data == b'{"hello":"world"}'
         assert response.status_code == 200
 
     def test_dispatch_request_with_invalid_action_map(self):
@@ -76,9 +87,17 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert response.data == ('{"message": "The method is not allowed '
-                                 'for the requested URL."}')
+        assert response.data == (b'{"message":"The method is not allowed '
+                                 b'for the requested URL."}')
         assert response.status_code == 405
+        assert response.headers['Allow'] == 'GET, POST'
+
+    def test_resolve_actions(self):
+        actions = Echo.resolve_actions(config.ACTION_MAP, ['GET', 'PATCH'])
+        assert actions['GET'] is Echo.__dict__['read']
+        assert actions['POST'] is None
+        assert actions['PATCH'] is None
+        assert Echo.get_allowed_methods(actions) == ['GET']
 
     def test_dispatch_request_with_parser_httpexception_rendered_into_json(self):
         class ExcParser(JSONParser):
@@ -89,7 +108,7 @@ class TestResource(object):
             parser_classes = (ExcParser,)
 
             def replace(self, request):
-                pass
+                return request.data
 
         data = '{"hello": "world"}'
         request = factory.put('/', data=data, content_type='application/json')
@@ -97,9 +116,33 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert response.data == '{"message": "Invalid request data."}'
+        assert response.data == b'{"message":"Invalid request data."}'
         assert response.status_code == 400
 
+    def test_dispatch_request_with_streaming_parser(self):
+        class LimitedParser(StreamingJSONParser):
+            chunk_size = 4
+            max_body_size = 8
+
+        class Demo(Echo):
+            parser_classes = (LimitedParser,)
+
+            def create(self, request):
+                return {'total': sum(request.data)}, 201
+
+        request = factory.post('/', data='[1, 2]',
+                               content_type='application/json')
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(request)
+        assert response.data == b'{"total":3}'
+        assert response.status_code == 201
+
+        request = factory.post('/', data='[1, 2, 3]',
+                               content_type='application/json')
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(request)
+        assert response.status_code == 413
+
     def test_dispatch_request_with_action_httpexception_rendered_into_json(self):
         class Demo(Echo):
             renderer_classes = ()  # No renderer class provided
@@ -113,9 +156,65 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert response.data == '{"message": "Invalid request data."}'
+        assert response.data == b'{"message":"Invalid request data."}'
         assert response.status_code == 400
 
+    def test_dispatch_request_with_accept(self):
+        request = factory.get('/', data={'hello': 'world'},
+                              headers={'Accept': 'application/*'})
+        resource = self.make_resource()
+        response = resource.dispatch_request(request)
+
+        assert response.data == b'{"hello":"world"}'
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.status_code == 200
+
+    def test_dispatch_request_with_vary_accept(self):
+        class TextRenderer(Renderer):
+            content_type = 'text/plain'
+            format_suffix = 'txt'
+
+            def render(self, data, context=None):
+                return repr(data)
+
+        class MultiEcho(Echo):
+            renderer_classes = (JSONRenderer, TextRenderer)
+
+        request = factory.get('/', headers={'Accept': 'text/plain'})
+        resource = self.make_resource(resource_class=MultiEcho)
+        response = resource.dispatch_request(request)
+        assert response.headers['Content-Type'] == 'text/plain'
+        assert response.headers['Vary'] == 'Accept'
+
+        # The format suffix selects the renderer, whatever is accepted
+        request = factory.get('/', headers={'Accept': 'text/plain'})
+        resource = self.make_resource(resource_class=MultiEcho)
+        response = resource.dispatch_request(request, format='json')
+        assert response.headers['Content-Type'] == 'application/json'
+        assert 'Vary' not in response.headers
+
+        # So does a single renderer
+        request = factory.get('/')
+        response = self.make_resource().dispatch_request(request)
+        assert 'Vary' not in response.headers
+
+    def test_dispatch_request_with_unacceptable_accept(self):
+        request = factory.get('/', data={'hello': 'world'},
+                              headers={'Accept': 'text/csv'})
+        resource = self.make_resource()
+        response = resource.dispatch_request(request)
+
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.status_code == 406
+
+    def test_dispatch_request_with_error_and_unacceptable_accept(self):
+        request = factory.patch('/', headers={'Accept': 'text/csv'})
+        resource = self.make_resource()
+        response = resource.dispatch_request(request)
+
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.status_code == 405
+
     def test_dispatch_request_with_action_exception(self):
         data = {'hello': 'world'}
         request = factory.post('/', data=data)
@@ -154,6 +253,55 @@ class TestResource(object):
         # Retrieve global middleware_classes
         config.MIDDLEWARE_CLASSES = initial_global_middleware_classes
 
+    def test_middleware_processors(self):
+        class Demo(Echo):
+            middleware_classes = (
+                RefuseRequestMiddleware,
+                AlterRequestMiddleware,
+                AlterResponseMiddleware
+            )
+
+        refuse, alter_request, alter_response = Demo.middlewares
+        assert Demo.request_processors == [refuse.process_request,
+                                           alter_request.process_request]
+        assert Demo.response_processors == [alter_response.process_response]
+        assert Echo.request_processors == []
+        assert Echo.response_processors == []
+
+    def test_dispatch_request_with_rendered_response_middleware(self):
+        class Demo(Echo):
+            middleware_classes = (AlterRenderedResponseMiddleware,)
+
+        alter_rendered_response, = Demo.middlewares
+        assert Demo.rendered_response_processors == [
+            alter_rendered_response.process_rendered_response
+        ]
+
+        request = factory.get('/', data={'hello': 'world'})
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(request)
+        assert response.data == b'{"HELLO":"WORLD"}'
+
+    def test_perform_action_with_response_middleware_returning_tuple(self):
+        class TupleResponseMiddleware(object):
+
+            def process_response(self, request, response):
+                return response.data, 202
+
+        class Demo(Echo):
+            middleware_classes = (
+                AlterResponseMiddleware,
+                TupleResponseMiddleware
+            )
+
+        request = factory.get('/', data={'hello': 'world'})
+        resource = self.make_resource(resource_class=Demo)
+        response = resource.dispatch_request(request)
+
+        assert isinstance(response, Response)
+        assert response.data == b'{"hello":"world"}'
+        assert response.status_code == 201
+
     def test_perform_action_with_request_middlewares(self):
         class Demo(Echo):
             middleware_classes = (
@@ -167,8 +315,23 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert response.data == '"You are refused"'
+        assert response.data == b'"You are refused"'
+        assert response.status_code == 200
+        assert not request.is_parsed
+
+    def test_dispatch_request_without_accessing_data(self):
+        class Demo(Echo):
+            def replace(self, request):
+                return 'ignored'
+
+        request = factory.put('/', data='{"hello": ',
+                              content_type='application/json')
+        resource = self.make_resource(resource_class=Demo)
+        response = resource.dispatch_request(request)
+
+        assert response.data == b'"ignored"'
         assert response.status_code == 200
+        assert not request.is_parsed
 
     def test_perform_action_with_alter_middlewares(self):
         class Demo(Echo):
@@ -183,9 +346,166 @@ class TestResource(object):
         response = resource.dispatch_request(request)
 
         assert isinstance(response, Response)
-        assert 'tag' in response.data
+        assert b'tag' in response.data
         assert response.status_code == 201
 
+    def test_dispatch_request_with_auto_etag(self):
+        request = factory.get('/', data={'hello': 'world'})
+        response = self.make_resource().dispatch_request(request)
+        etag = response.headers['ETag']
+
+        request = factory.get('/', data={'hello': 'world'},
+                              headers={'If-None-Match': etag})
+        response = self.make_resource().dispatch_request(request)
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers == {'ETag': etag}
+
+        class Demo(Echo):
+            auto_etag = False
+
+        request = factory.get('/', data={'hello': 'world'})
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(request)
+        assert 'ETag' not in response.headers
+
+    def test_dispatch_request_with_validators(self):
+        calls = []
+
+        class RecordResponseMiddleware(object):
+            def process_response(self, request, response):
+                calls.append(response.status_code)
+                return response
+
+        class Demo(Resource):
+            name = 'demo'
+
+            middleware_classes = (RecordResponseMiddleware,)
+
+            def etag(self, request):
+                return 'v1'
+
+            def last_modified(self, request):
+                return datetime(2020, 1, 1)
+
+            def read(self, request):
+                calls.append('read')
+                return {'hello': 'world'}
+
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(factory.get('/'))
+        assert response.headers['ETag'] == '"v1"'
+        assert response.headers['Last-Modified'] == \
+            'Wed, 01 Jan 2020 00:00:00 GMT'
+        assert calls == ['read', 200]
+
+        for headers in ({'If-None-Match': 'W/"v1"'},
+                        {'If-Modified-Since': 'Wed, 01 Jan 2020 00:00:00 GMT'}):
+            request = factory.get('/', headers=headers)
+            response = self.make_resource(resource_class=Demo) \
+                .dispatch_request(request)
+            assert response.status_code == 304
+            assert response.headers['ETag'] == '"v1"'
+        # The action is not called (nor the response rendered) for 304
+        assert calls == ['read', 200, 304, 304]
+
+        request = factory.get('/', headers={'If-None-Match': '"v0"'})
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(request)
+        assert response.status_code == 200
+        assert calls == ['read', 200, 304, 304, 'read', 200]
+
+    def test_dispatch_request_with_coalescing(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        class Demo(Echo):
+            coalesce = True
+
+            def read(self, request):
+                calls.append(request.args.get('x'))
+                started.set()
+                release.wait()
+                return {'x': request.args.get('x')}
+
+        responses = []
+
+        def dispatch(path):
+            request = factory.get(path)
+            responses.append(self.make_resource(resource_class=Demo)
+                             .dispatch_request(request))
+
+        threads = [threading.Thread(target=dispatch, args=('/?x=1',))
+                   for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        # Give the others time to join the request in progress
+        threading.Timer(0.1, release.set).start()
+        dispatch('/?x=2')
+        for thread in threads:
+            thread.join()
+
+        assert sorted(calls) == ['1', '2']
+        bodies = sorted(response.data for response in responses)
+        assert bodies == [b'{"x":"1"}'] * 4 + [b'{"x":"2"}']
+
+    def test_dispatch_request_with_coalescing_and_middlewares(self):
+        started, release = threading.Event(), threading.Event()
+        calls, seen = [], []
+
+        class CountMiddleware(object):
+
+            def process_response(self, request, response):
+                # Each request gets its own copy of the data
+                seen.append(type(response.data))
+                response.data['count'] = response.data.get('count', 0) + 1
+                return response
+
+        class Demo(Echo):
+            coalesce = True
+            middleware_classes = (CountMiddleware,)
+
+            def read(self, request):
+                calls.append('read')
+                started.set()
+                release.wait()
+                return {'x': '1'}
+
+        responses = []
+
+        def dispatch():
+            request = factory.get('/?x=1')
+            responses.append(self.make_resource(resource_class=Demo)
+                             .dispatch_request(request))
+
+        threads = [threading.Thread(target=dispatch) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        threading.Timer(0.1, release.set).start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == ['read']
+        assert seen == [dict] * 4
+        bodies = [response.data for response in responses]
+        assert bodies == [b'{"x":"1","count":1}'] * 4
+
+    def test_dispatch_request_with_coalescing_exception(self):
+        class Demo(Echo):
+            coalesce = True
+
+            def read(self, request):
+                raise BadRequest('Invalid')
+
+        response = self.make_resource(resource_class=Demo) \
+            .dispatch_request(factory.get('/'))
+        assert response.status_code == 400
+        assert response.data == b'{"message":"Invalid"}'
+
     def test_make_response_with_data(self):
         rv = {'hello': 'world'}
         resource = self.make_resource()
@@ -1,9 +1,13 @@
 from __future__ import absolute_import
 
+from datetime import datetime
+
 import pytest
 from werkzeug.wrappers import Response as WerkzeugSpecificResponse
 
-from restart.response import Response, WerkzeugResponse
+from restart.response import (
+    Response, WerkzeugResponse, is_not_modified, make_etag
+)
 from restart.renderers import JSONRenderer
 from restart.negotiator import Negotiator
 
@@ -23,7 +27,81 @@ class TestResponse(object):
             Negotiator(), (JSONRenderer,), 'json'
         )
 
-        assert rendered_response.data == '{"hello": "world"}'
+        assert rendered_response.data == b'{"hello":"world"}'
+
+    def test_get_body(self):
+        assert Response(b'bytes').get_body() == b'bytes'
+        assert Response(u'text').get_body() == b'text'
+
+    def test_iter_body(self):
+        response = Response(b'bytes')
+        assert not response.is_streamed
+        assert list(response.iter_body()) == [b'bytes']
+
+        response = Response(iter([b'a', u'\u4e2d', b'']))
+        assert response.is_streamed
+        assert list(response.iter_body()) == [b'a', b'\xe4\xb8\xad']
+
+    def test_rendered_streamed_response(self):
+        response = Response(iter([{'hello': 'world'}]))
+        rendered_response = response.render(
+            Negotiator(), (JSONRenderer,), 'json'
+        )
+
+        assert rendered_response.is_streamed
+        assert rendered_response.get_body() == b'[{"hello":"world"}]'
+
+    def test_add_etag(self):
+        response = Response(u'text')
+        response.add_etag()
+        assert response.data == b'text'
+        assert response.headers['ETag'] == make_etag(b'text')
+        assert make_etag(b'text') != make_etag(b'texts')
+
+        response = Response(u'text', headers={'ETag': '"v1"'})
+        response.add_etag()
+        assert response.headers['ETag'] == '"v1"'
+
+        response = Response(iter([b'chunk']))
+        response.add_etag()
+        assert 'ETag' not in response.headers
+
+    def test_is_not_modified(self):
+        assert is_not_modified({'HTTP_IF_NONE_MATCH': '"a", "b"'}, '"b"')
+        assert is_not_modified({'HTTP_IF_NONE_MATCH': 'W/"b"'}, '"b"')
+        assert is_not_modified({'HTTP_IF_NONE_MATCH': '*'}, '"b"')
+        assert not is_not_modified({'HTTP_IF_NONE_MATCH': '"a"'}, '"b"')
+        assert not is_not_modified({'HTTP_IF_NONE_MATCH': '"a"'})
+
+        environ = {'HTTP_IF_MODIFIED_SINCE': 'Sun, 06 Nov 1994 08:49:37 GMT'}
+        assert is_not_modified(environ, None,
+                               datetime(1994, 11, 6, 8, 49, 37, 500))
+        assert not is_not_modified(environ, None,
+                                   datetime(1994, 11, 6, 8, 49, 38))
+        assert not is_not_modified(environ)
+        # If-None-Match takes precedence over If-Modified-Since
+        environ['HTTP_IF_NONE_MATCH'] = '"a"'
+        assert not is_not_modified(environ, '"b"',
+                                   datetime(1994, 11, 6, 8, 49, 37))
+
+    def test_make_conditional(self):
+        environ = {'REQUEST_METHOD': 'GET', 'HTTP_IF_NONE_MATCH': '"v1"'}
+        response = Response(b'body', headers={
+            'ETag': '"v1"', 'Content-Type': 'application/json',
+            'Cache-Control': 'max-age=60'
+        })
+        response.make_conditional(environ)
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers == {'ETag': '"v1"',
+                                    'Cache-Control': 'max-age=60'}
+
+        response = Response(b'body', headers={'ETag': '"v2"'})
+        assert response.make_conditional(environ).status_code == 200
+
+        environ['REQUEST_METHOD'] = 'POST'
+        response = Response(b'body', headers={'ETag': '"v1"'})
+        assert response.make_conditional(environ).status_code == 200
 
     def test_specific_response(self):
         response = Response({'hello': 'world'})
@@ -43,7 +121,7 @@ class TestWerkzeugResponse(object):
 
         assert isinstance(specific_response, WerkzeugSpecificResponse)
         assert str(response) == '<WerkzeugResponse [200 OK]>'
-        assert specific_response.data == b'{"hello": "world"}'
+        assert specific_response.data == b'{"hello":"world"}'
         assert specific_response.status_code == 200
         assert specific_response.status == '200 OK'
         assert specific_response.headers['Content-Type'] == 'application/json'
@@ -0,0 +1,108 @@
+from __future__ import absolute_import
+
+import pytest
+from werkzeug.routing import Map, Rule
+
+from restart.api import RESTArt
+from restart.resource import Resource
+from restart.routing import Router
+from restart.exceptions import NotFound, MethodNotAllowed
+
+
+api = RESTArt()
+
+
+@api.register(pk='<int:todo_id>', format_suffix='optional')
+class Todos(Resource):
+    name = 'todos'
+
+
+@api.route(uri='/lists/<int:list_id>/cards/<int:card_id>', methods=['GET'])
+class Card(Resource):
+    name = 'card'
+
+
+@api.route(uri='/lists/<int:list_id>/cards/first', methods=['GET'])
+class FirstCard(Resource):
+    name = 'first_card'
+
+
+@api.route(uri='/lists/<name>/cards', methods=['GET'])
+class NamedCards(Resource):
+    name = 'named_cards'
+
+
+@api.route(uri='/files/<path:filename>', methods=['GET'])
+class Files(Resource):
+    name = 'files'
+
+
+class TestRouter(object):
+
+    router = Router(api.rules)
+
+    def test_match_static_uri(self):
+        assert self.router.match('/todos', 'GET') == ('todos_list', {})
+
+    def test_match_converter_uri(self):
+        assert self.router.match('/todos/1', 'GET') == \
+            ('todos_item', {'todo_id': 1})
+
+    def test_match_format_suffix(self):
+        assert self.router.match('/todos/1.json', 'GET') == \
+            ('todos_item_format', {'todo_id': 1, 'format': 'json'})
+        assert self.router.match('/todos.json', 'POST') == \
+            ('todos_list_format', {'format': 'json'})
+
+    def test_match_multiple_converters(self):
+        assert self.router.match('/lists/1/cards/2', 'GET') == \
+            ('card', {'list_id': 1, 'card_id': 2})
+
+    def test_match_static_segment_first(self):
+        assert self.router.match('/lists/1/cards/first', 'GET') == \
+            ('first_card', {'list_id': 1})
+
+    def test_match_with_backtracking(self):
+        assert self.router.match('/lists/abc/cards', 'GET') == \
+            ('named_cards', {'name': 'abc'})
+
+    def test_match_path_converter(self):
+        assert self.router.match('/files/a/b/c.txt', 'GET') == \
+            ('files', {'filename': 'a/b/c.txt'})
+
+    def test_match_head_implicitly(self):
+        assert self.router.match('/todos', 'HEAD') == ('todos_list', {})
+
+    def test_match_not_found(self):
+        with pytest.raises(NotFound):
+            self.router.match('/todos/abc', 'GET')
+        with pytest.raises(NotFound):
+            self.router.match('/todos/', 'GET')
+
+    def test_match_method_not_allowed(self):
+        with pytest.raises(MethodNotAllowed) as exc:
+            self.router.match('/todos', 'DELETE')
+        assert exc.value.valid_methods == ['GET', 'HEAD', 'OPTIONS', 'POST']
+
+    def test_match_like_werkzeug(self):
+        suffix_api = RESTArt()
+
+        @suffix_api.register(format_suffix='optional')
+        class Notes(Resource):
+            name = 'notes'
+
+        @suffix_api.register(pk='<int:tag_id>', format_suffix='mandatory')
+        class Tags(Resource):
+            name = 'tags'
+
+        router = Router(suffix_api.rules)
+        url_map = Map([
+            Rule(rule.uri, endpoint=endpoint, methods=rule.methods)
+            for endpoint, rule in suffix_api.rules.items()
+        ])
+        adapter = url_map.bind('localhost')
+        for path in ('/notes', '/notes.json', '/notes/1', '/notes/1.json',
+                     '/notes/a.b.json', '/tags.json', '/tags/1.json'):
+            assert router.match(path, 'GET') == adapter.match(path, 'GET')
+        assert router.match('/notes/1.json', 'GET') == \
+            ('notes_item_format', {'pk': '1', 'format': 'json'})
@@ -42,7 +42,7 @@ class TestClient(object):
 
     def test_get_cases(self):
         response = self.client.get('/cases')
-        assert response.data == b'[{"name": "case_1"}]'
+        assert response.data == b'[{"name":"case_1"}]'
         assert response.status_code == 200
 
     def test_post_cases(self):
@@ -52,7 +52,7 @@ class TestClient(object):
 
     def test_get_case(self):
         response = self.client.get('/cases/1')
-        assert response.data == b'{"name": "case_1"}'
+        assert response.data == b'{"name":"case_1"}'
         assert response.status_code == 200
 
     def test_put_case(self):
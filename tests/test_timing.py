@@ -0,0 +1,158 @@
+from __future__ import absolute_import
+
+import time
+
+from restart import timing
+from restart.adapter import WerkzeugAdapter, WSGIAdapter
+from restart.api import RESTArt
+from restart.asgi import ASGIAdapter
+from restart.config import config
+from restart.parsers import Parser
+from restart.resource import Resource
+from restart.routing import Router
+from restart.testing import Client
+
+
+class SlowParser(Parser):
+
+    content_type = 'text/plain'
+
+    def parse(self, stream, content_type, content_length, context=None):
+        time.sleep(0.02)
+        return stream.read()
+
+
+class RecordMiddleware(object):
+
+    def process_request(self, request):
+        return None
+
+
+api = RESTArt()
+
+
+@api.register
+class Things(Resource):
+    name = 'things'
+    middleware_classes = (RecordMiddleware,)
+
+    def index(self, request):
+        return [{'name': 'thing_1'}]
+
+    def create(self, request):
+        return {'size': len(request.data)}, 201
+
+
+class TestTiming(object):
+
+    def setup_method(self, method):
+        self.timers = []
+        timing.subscribe(self.timers.append)
+
+    def teardown_method(self, method):
+        timing.unsubscribe(self.timers.append)
+
+    def test_not_timed_without_subscribers(self):
+        timing.unsubscribe(self.timers.append)
+        assert timing.start_timer('GET') is None
+        response = Client(api, WSGIAdapter).get('/things')
+        assert 'Server-Timing' not in response.headers
+        assert self.timers == []
+
+    def test_subscribe(self):
+        for adapter_class in (WerkzeugAdapter, WSGIAdapter, ASGIAdapter):
+            response = Client(api, adapter_class).get('/things')
+            assert response.status_code == 200
+            assert 'Server-Timing' not in response.headers
+        assert len(self.timers) == 3
+        for timer in self.timers:
+            assert (timer.endpoint, timer.method) == ('things_list', 'GET')
+            assert timer.status_code == 200
+            assert set(timer.phases) == set(['routing', 'middleware',
+                                             'action', 'render'])
+            assert timer.total >= sum(timer.phases.values())
+
+        # Subscribing twice has no effect
+        timing.subscribe(self.timers.append)
+        Client(api, WSGIAdapter).get('/things')
+        assert len(self.timers) == 4
+
+    def test_unrouted(self):
+        for adapter_class in (WerkzeugAdapter, WSGIAdapter, ASGIAdapter):
+            client = Client(api, adapter_class)
+            assert client.get('/unknown').status_code == 404
+        assert [(timer.endpoint, timer.status_code)
+                for timer in self.timers] == [('-', 404)] * 3
+
+    def test_routing(self, monkeypatch):
+        match = Router.match
+
+        def slow_match(self, path, method):
+            time.sleep(0.01)
+            return match(self, path, method)
+
+        monkeypatch.setattr(Router, 'match', slow_match)
+        for adapter_class in (WerkzeugAdapter, WSGIAdapter, ASGIAdapter):
+            Client(api, adapter_class).get('/things')
+        assert len(self.timers) == 3
+        for timer in self.timers:
+            assert timer.phases['routing'] >= 0.01
+
+    def test_parse_excluded_from_action(self):
+        class Demo(Things):
+            parser_classes = (SlowParser,)
+
+        demo_api = RESTArt()
+        demo_api.register(Demo)
+        Client(demo_api, WSGIAdapter).post('/things', data='hello',
+                                           content_type='text/plain')
+        phases = self.timers[0].phases
+        assert phases['parse'] >= 0.02
+        assert phases['action'] < 0.02
+
+    def test_server_timing(self):
+        initial = config.SERVER_TIMING
+        config.SERVER_TIMING = True
+        try:
+            response = Client(api, WSGIAdapter).get('/things')
+        finally:
+            config.SERVER_TIMING = initial
+        metrics = [item.split(';')[0] for item in
+                   response.headers['Server-Timing'].split(', ')]
+        assert metrics == ['routing', 'middleware', 'action', 'render',
+                           'total']
+
+    def test_subscriber_exception(self):
+        def fail(timer):
+            raise ValueError('failed')
+
+        timing.subscribe(fail)
+        try:
+            response = Client(api, WSGIAdapter).get('/things')
+        finally:
+            timing.unsubscribe(fail)
+        assert response.status_code == 200
+        assert len(self.timers) == 1
+
+
+class TestEndpointTimings(object):
+
+    def test_get_stats(self):
+        timings = timing.EndpointTimings()
+        for duration in (0.1, 0.3):
+            timer = timing.Timer('GET')
+            timer.endpoint = 'things'
+            timer.add('action', duration)
+            timer.total = duration * 2
+            timings(timer)
+
+        stats = timings.get_stats()
+        assert list(stats) == [('things', 'GET')]
+        action = stats[('things', 'GET')]['action']
+        assert action['count'] == 2
+        assert abs(action['mean'] - 0.2) < 1e-9
+        assert action['max'] == 0.3
+        assert stats[('things', 'GET')]['total']['max'] == 0.6
+
+        timings.reset()
+        assert timings.get_stats() == {}
@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+
+import pytest
+from werkzeug.datastructures import FileStorage, Headers
+
+from restart.uploads import UploadHandler, SpooledUploadHandler
+
+
+def make_handler(handler_class):
+    headers = Headers([('Content-Type', 'text/plain')])
+    return handler_class('file', 'test.txt', 'text/plain', headers)
+
+
+class TestUploadHandler(object):
+
+    def test_upload_handler(self):
+        handler = make_handler(UploadHandler)
+
+        with pytest.raises(NotImplementedError):
+            handler.receive_chunk(b'chunk')
+        with pytest.raises(NotImplementedError):
+            handler.file_complete(5)
+
+
+class TestSpooledUploadHandler(object):
+
+    def test_small_file_in_memory(self):
+        handler = make_handler(SpooledUploadHandler)
+        handler.receive_chunk(b'hello ')
+        handler.receive_chunk(b'world')
+        storage = handler.file_complete(11)
+
+        assert isinstance(storage, FileStorage)
+        assert storage.name == 'file'
+        assert storage.filename == 'test.txt'
+        assert storage.content_type == 'text/plain'
+        assert storage.content_length == 11
+        assert storage.read() == b'hello world'
+        assert not handler.file._rolled
+
+    def test_large_file_spooled_to_disk(self):
+        class SmallSpoolUploadHandler(SpooledUploadHandler):
+            spool_size = 8
+
+        handler = make_handler(SmallSpoolUploadHandler)
+        handler.receive_chunk(b'0123456789')
+        storage = handler.file_complete(10)
+
+        assert handler.file._rolled
+        assert storage.read() == b'0123456789'
+
+    def test_abort(self):
+        handler = make_handler(SpooledUploadHandler)
+        handler.receive_chunk(b'partial')
+        handler.abort()
+
+        assert handler.file.closed
@@ -1,10 +1,12 @@
 from __future__ import absolute_import
 
+import io
 import os
 import sys
 import uuid
 import shutil
 import tempfile
+import threading
 
 import six
 import pytest
@@ -12,8 +14,10 @@ import pytest
 from restart.utils import (
     load_resources, expand_wildcards,
     locked_cached_property, classproperty,
-    locked_cached_classproperty, make_location_header
+    locked_cached_classproperty, BoundedCache, SizeLimitedStream,
+    SingleFlight, make_location_header
 )
+from restart.exceptions import RequestEntityTooLarge, ServiceUnavailable
 
 
 def mkdir(path):
@@ -180,3 +184,117 @@ class TestUtils(object):
         assert 'http://localhost/tests/1' == make_location_header(request, 1)
         assert ('http://localhost/tests/id' ==
                 make_location_header(request, 'id'))
+
+
+class TestBoundedCache(object):
+
+    def test_get_and_set(self):
+        cache = BoundedCache(2)
+        assert cache.get('a') is None
+        assert cache.get('a', 0) == 0
+
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert 'a' in cache
+        assert len(cache) == 1
+
+    def test_evict_oldest(self):
+        cache = BoundedCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('a', 3)
+        cache.set('c', 4)
+        assert 'a' not in cache
+        assert cache.get('b') == 2
+        assert cache.get('c') == 4
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestSizeLimitedStream(object):
+
+    def test_read(self):
+        stream = SizeLimitedStream(io.BytesIO(b'a\nbc\n'), 5, chunk_size=2)
+        assert stream.readline() == b'a\n'
+        assert stream.read(1) == b'b'
+        assert stream.read() == b'c\n'
+        assert stream.size == 5
+
+    def test_max_size(self):
+        stream = SizeLimitedStream(io.BytesIO(b'abcdef'), 5)
+        assert stream.read(5) == b'abcde'
+        with pytest.raises(RequestEntityTooLarge):
+            stream.read(5)
+
+    def test_reads_at_most_one_byte_past_max_size(self):
+        raw = io.BytesIO(b'a' * 100)
+        stream = SizeLimitedStream(raw, 5)
+        with pytest.raises(RequestEntityTooLarge):
+            stream.read()
+        assert raw.tell() == 6
+
+
+class TestSingleFlight(object):
+
+    def test_run(self):
+        flight = SingleFlight()
+        assert flight.run('key', lambda: 1) == (1, False)
+
+    def test_run_concurrently(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'result'
+
+        flight = SingleFlight()
+        results = []
+
+        def target():
+            results.append(flight.run('key', func))
+
+        threads = [threading.Thread(target=target) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == [1]
+        assert sorted(results) == [('result', False)] + [('result', True)] * 4
+
+    def test_run_with_exception_and_timeout(self):
+        started, release = threading.Event(), threading.Event()
+
+        def func():
+            started.set()
+            release.wait()
+            raise ValueError('failed')
+
+        flight = SingleFlight()
+        errors = []
+
+        def target(timeout=None):
+            try:
+                flight.run('key', func, timeout)
+            except Exception as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=target)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=target)
+        follower.start()
+        target(timeout=0.01)
+        assert isinstance(errors[0], ServiceUnavailable)
+        release.set()
+        leader.join()
+        follower.join()
+        assert [type(exc) for exc in errors[1:]] == [ValueError, ValueError]
+        # The next call is not coalesced with the finished one
+        assert flight.run('key', lambda: 2) == (2, False)